@@ -1,4 +1,7 @@
 import streamlit as st
+
+from fitsmart.assets import asset_path
+from fitsmart.ui import asset_image
 # from st_pages import Page, show_pages
 
 # show_pages(
@@ -15,17 +18,14 @@ import streamlit as st
 
 st.set_page_config(
     page_title="FitSmart",
-    page_icon="https://raw.githubusercontent.com/darigain/fitsmart/main/visuals/favicon.png"  # Update this URL
+    page_icon=asset_path("favicon.png") or "🏋️"
 )
 
-
-# GitHub raw URL of your logo (replace with your actual repo URL)
-GITHUB_USERNAME = "darigain"
-REPO_NAME = "fitsmart"
-LOGO_URL = f"https://raw.githubusercontent.com/{GITHUB_USERNAME}/{REPO_NAME}/main/visuals/logo.png"
+# Images are served from the app's visuals/ directory (see fitsmart.assets), so the page
+# renders without requests to GitHub and works offline
 
 # Display the logo at the top of the page
-st.image(LOGO_URL, width=250)
+asset_image("logo.png", width=250)
 
 # # Sidebar Navigation
 # st.sidebar.title("📍 Navigation")
@@ -45,9 +45,9 @@ FitSmart helps you **analyze your workout videos**, **count your reps**, and **t
 # Display GIFs as instructions
 col1, col2 = st.columns(2)
 with col1:
-    st.image("https://media.giphy.com/media/eVCEGG1uKPPpcaDoFN/giphy.gif", caption="Squats", use_container_width=True)
+    asset_image("squat.gif", fallback="🏋️ Squats", caption="Squats", use_container_width=True)
 with col2:
-    st.image("https://media.giphy.com/media/rHGjuFX5FBRxn6AdCU/giphy.gif", caption="Push-ups", use_container_width=True)
+    asset_image("pushup.gif", fallback="💪 Push-ups", caption="Push-ups", use_container_width=True)
 
 st.markdown("""
 # How to Get Started?  
@@ -91,4 +91,4 @@ with col4:
 # st.link_button("📊 Go to Statistics", "https://fitsmart.streamlit.app/%F0%9F%93%8A%20Statistics")
 # st.link_button("🏆 Go to Leaderboard", "https://fitsmart.streamlit.app/%F0%9F%8F%86%20Leaderboard")
 
-st.image("https://raw.githubusercontent.com/darigain/fitsmart/main/visuals/qrcode.png", width=250)
+asset_image("qrcode.png", width=250)
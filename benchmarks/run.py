@@ -0,0 +1,279 @@
+"""
+Per-stage performance benchmarks for the analysis pipeline.
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --output new.json --compare bench.json --threshold 0.10
+
+Every stage runs on deterministic synthetic input (see benchmarks.synthetic) and reports
+its best-of-N throughput and the peak resident memory seen while it ran. With --compare,
+stages whose throughput dropped by more than --threshold are listed and the exit code is 1.
+Stages whose dependencies are missing (MediaPipe, ffmpeg) are recorded as skipped.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import make_trace, make_video
+from fitsmart.features import analyze_points, to_points
+from fitsmart.instrument import current_rss_mb
+from fitsmart.traces import read_trace, rescore, write_trace
+from fitsmart.video import ENCODE_PRESETS, FRAME_SIZE, FFmpegVideoWriter
+
+
+class PeakMemory:
+    """
+    Samples resident memory on a background thread while the block runs.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_mb = current_rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+
+def measure(func, items, repeat):
+    """
+    Run `func` `repeat` times; return its best wall time, throughput and peak memory.
+    """
+    best = float("inf")
+    with PeakMemory() as memory:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - started)
+    return {
+        "seconds": best,
+        "items": items,
+        "items_per_second": items / best if best > 0 else None,
+        "peak_rss_mb": memory.peak_mb,
+    }
+
+
+def decoded_frames(video_path):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run_stages(workdir, video_frames, trace_frames, repeat):
+    stages = {}
+
+    # `setup()`, when given, runs once untimed and its result is passed to `func`
+    def stage(name, func, items, setup=None):
+        try:
+            if setup is not None:
+                state = setup()
+                stages[name] = measure(lambda: func(state), items, repeat)
+            else:
+                stages[name] = measure(func, items, repeat)
+        except ImportError as e:
+            stages[name] = {"skipped": f"missing dependency: {e.name}"}
+        except FileNotFoundError as e:
+            stages[name] = {"skipped": f"missing executable: {e.filename}"}
+        print(f"{name:>20}: {format_stage(stages[name])}", file=sys.stderr)
+
+    video_path = make_video(os.path.join(workdir, "synthetic.mp4"), frames=video_frames)
+    trace = make_trace(trace_frames)
+    frames = decoded_frames(video_path)
+
+    stage("decode_opencv", lambda: decoded_frames(video_path), len(frames))
+
+    def decode_ffmpeg():
+        from fitsmart.video import FFmpegFrameReader
+
+        reader = FFmpegFrameReader(video_path)
+        try:
+            for _ in reader:
+                pass
+        finally:
+            reader.close()
+
+    stage("decode_ffmpeg", decode_ffmpeg, len(frames))
+
+    def prepare():
+        from fitsmart.video import prepare_frame
+
+        return [prepare_frame(frame) for frame in frames]
+
+    stage("orient_resize", prepare, len(frames))
+
+    def pose_inference():
+        from fitsmart.analysis import mp_pose
+        from fitsmart.video import prepare_frame
+        from fitsmart.pipeline import infer_pose
+
+        prepared = [prepare_frame(frame) for frame in frames[::3]]
+        with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+            for frame in prepared:
+                infer_pose(pose, frame)
+
+    stage("pose_inference", pose_inference, len(frames[::3]))
+
+    # Time to a usable estimator: loading a new model vs. checking one out of a warm pool
+    def pose_init():
+        from fitsmart.analysis import mp_pose
+
+        mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5).close()
+
+    stage("pose_init_cold", pose_init, 1)
+
+    def warm_pool():
+        from fitsmart.posepool import PosePool
+
+        pool = PosePool()
+        pool.warm()
+        return pool
+
+    def pose_checkout(pool):
+        with pool.checkout():
+            pass
+
+    stage("pose_checkout_warm", pose_checkout, 1, setup=warm_pool)
+
+    points = to_points(trace.landmarks)
+    stage("reps_vectorized", lambda: analyze_points(points), len(trace))
+
+    # Re-scoring a stored float16 trace file, memory-mapped (see fitsmart.traces)
+    def stored_trace():
+        trace_path = os.path.join(workdir, "synthetic.fstrace")
+        write_trace(trace_path, trace, fps=10.0)
+        return [read_trace(trace_path)]
+
+    stage("rescore_trace", rescore, len(trace), setup=stored_trace)
+
+    def reps_per_frame():
+        from fitsmart.features import LANDMARK_INDEX, RepCounter
+
+        counter = RepCounter()
+        for row in points:
+            counter.update({name: [float(row[i, 0]), float(row[i, 1])] for name, i in LANDMARK_INDEX.items()})
+
+    stage("reps_per_frame", reps_per_frame, len(trace))
+
+    def annotate():
+        from fitsmart.analysis import annotate_frame, array_to_landmarks
+        from fitsmart.features import RepCounter
+        from fitsmart.video import prepare_frame
+
+        counter = RepCounter()
+        for frame, landmarks in zip(frames, trace.landmarks):
+            annotate_frame(prepare_frame(frame), array_to_landmarks(landmarks), "squat", counter)
+
+    stage("annotate", annotate, len(frames))
+
+    small = [cv2.resize(frame, FRAME_SIZE) for frame in frames]
+
+    def encode_h264(preset):
+        if shutil.which("ffmpeg") is None:
+            raise FileNotFoundError(2, "not found", "ffmpeg")
+        writer = FFmpegVideoWriter(os.path.join(workdir, f"annotated_{preset}.mp4"), preset=preset)
+        for frame in small:
+            writer.write(frame)
+        writer.release()
+
+    for preset in ENCODE_PRESETS:
+        stage(f"encode_h264_{preset}", lambda: encode_h264(preset), len(small))
+    return stages
+
+
+def format_stage(result):
+    if "skipped" in result:
+        return f"skipped ({result['skipped']})"
+    return f"{result['items_per_second']:>12,.0f} items/s  {result['seconds'] * 1000:9.1f} ms  " \
+           f"peak {result['peak_rss_mb']:.0f} MB"
+
+
+def compare(current, baseline, threshold):
+    """
+    Names of the stages whose throughput fell by more than `threshold` (a fraction).
+    """
+    regressions = []
+    for name, result in current["stages"].items():
+        before = baseline.get("stages", {}).get(name, {})
+        if "items_per_second" not in result or not before.get("items_per_second"):
+            continue
+        change = result["items_per_second"] / before["items_per_second"] - 1
+        print(f"{name:>20}: {change:+.1%}", file=sys.stderr)
+        if change < -threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the stages of the video analysis pipeline.")
+    parser.add_argument("-o", "--output", default="-", help="JSON results file (default: stdout)")
+    parser.add_argument("--video-frames", type=int, default=300, help="frames in the synthetic 1080x1920 video")
+    parser.add_argument("--trace-frames", type=int, default=100_000, help="frames in the synthetic landmark trace")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the best one is reported")
+    parser.add_argument("--compare", metavar="BASELINE", help="results file of an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="throughput drop (fraction) counted as a regression")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="fitsmart-bench-") as workdir:
+        stages = run_stages(workdir, args.video_frames, args.trace_frames, args.repeat)
+
+    results = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "video_frames": args.video_frames,
+            "trace_frames": args.trace_frames,
+            "repeat": args.repeat,
+        },
+        "stages": stages,
+    }
+    text = json.dumps(results, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"Regressions over {args.threshold:.0%}: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Deterministic synthetic inputs for the benchmarks: landmark traces of squats and push-ups
+with a known number of reps, and videos of a stick figure performing them.
+"""
+import cv2
+import numpy as np
+
+from fitsmart.features import LANDMARK_INDEX
+from fitsmart.tracks import LANDMARK_FIELDS, NUM_LANDMARKS, LandmarkTrack
+
+
+# Keypoints (x, y) of a side-view squat or push-up, `depth` 0 at the top and 1 at the bottom
+def _keypoints(exercise, depth):
+    if exercise == "squat":
+        ankle = np.array([0.5, 0.9])
+        knee = ankle + [0.02 + 0.15 * depth, -0.2 + 0.08 * depth]
+        hip = knee + [-0.05 - 0.2 * depth, -0.2 + 0.14 * depth]
+        shoulder = hip + [0.03 + 0.12 * depth, -0.25 + 0.03 * depth]
+        elbow = shoulder + [0.05, 0.1]
+        wrist = elbow + [0.1, 0.0]
+    else:
+        ankle = np.array([0.9, 0.8])
+        knee = ankle + [-0.15, -0.02 - 0.01 * depth]
+        hip = knee + [-0.15, -0.03 - 0.02 * depth]
+        shoulder = hip + [-0.25, -0.07 + 0.05 * depth]
+        wrist = np.array([shoulder[0] - 0.02, 0.85])
+        elbow = (shoulder + wrist) / 2 + [0.12 * depth, 0.0]
+    return {
+        "RIGHT_SHOULDER": shoulder, "RIGHT_ELBOW": elbow, "RIGHT_WRIST": wrist,
+        "RIGHT_HIP": hip, "RIGHT_KNEE": knee, "RIGHT_ANKLE": ankle,
+    }
+
+
+def _schedule(frames, reps_per_set):
+    """
+    Exercise and depth of every frame: alternating sets of squats and push-ups, each rep a
+    full cosine down/up cycle, separated by short rests.
+    """
+    period = 30
+    rest = 20
+    exercises, depths = [], []
+    exercise = "squat"
+    while len(depths) < frames:
+        t = np.arange(reps_per_set * period)
+        depths.extend((1 - np.cos(2 * np.pi * t / period)) / 2)
+        exercises.extend([exercise] * len(t))
+        depths.extend([0.0] * rest)
+        exercises.extend([exercise] * rest)
+        exercise = "pushup" if exercise == "squat" else "squat"
+    return exercises[:frames], np.array(depths[:frames])
+
+
+def make_trace(frames=10_000, reps_per_set=10, noise=0.002, seed=0):
+    """
+    A recorded-landmark stand-in: a `LandmarkTrack` of `frames` sampled frames.
+    """
+    rng = np.random.default_rng(seed)
+    exercises, depths = _schedule(frames, reps_per_set)
+    landmarks = np.zeros((frames, NUM_LANDMARKS, len(LANDMARK_FIELDS)), dtype=np.float32)
+    landmarks[:, :, 2:] = 1.0  # visibility and presence
+    for i, (exercise, depth) in enumerate(zip(exercises, depths)):
+        for name, point in _keypoints(exercise, depth).items():
+            landmarks[i, LANDMARK_INDEX[name], :2] = point
+    landmarks[:, :, :2] += rng.normal(0, noise, size=(frames, NUM_LANDMARKS, 2)).astype(np.float32)
+    frame_counts = np.arange(frames, dtype=np.int32) * 3 + 1
+    return LandmarkTrack(frame_counts, landmarks)
+
+
+def make_video(path, frames=300, size=(1080, 1920), fps=30, reps_per_set=4, seed=0):
+    """
+    Write an mp4v video of a stick figure doing squats and push-ups; `size` is (width, height).
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    background = rng.integers(40, 90, size=(height, width, 3), dtype=np.uint8)
+    exercises, depths = _schedule(frames, reps_per_set)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    try:
+        for exercise, depth in zip(exercises, depths):
+            frame = background.copy()
+            points = {name: (int(x * width), int(y * height))
+                      for name, (x, y) in _keypoints(exercise, depth).items()}
+            for a, b in [("RIGHT_SHOULDER", "RIGHT_ELBOW"), ("RIGHT_ELBOW", "RIGHT_WRIST"),
+                         ("RIGHT_SHOULDER", "RIGHT_HIP"), ("RIGHT_HIP", "RIGHT_KNEE"),
+                         ("RIGHT_KNEE", "RIGHT_ANKLE")]:
+                cv2.line(frame, points[a], points[b], (230, 230, 230), max(4, width // 60))
+            cv2.circle(frame, points["RIGHT_SHOULDER"], width // 20, (200, 180, 160), -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
@@ -0,0 +1,3 @@
+"""
+FitSmart analysis package: pose-based squat and push-up counting shared by the Streamlit pages.
+"""
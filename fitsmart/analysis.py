@@ -0,0 +1,54 @@
+import cv2
+import mediapipe as mp
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+from fitsmart.rules import DEFAULT_RULES
+from fitsmart.tracks import LANDMARK_FIELDS
+
+# Initialize Mediapipe Pose
+mp_pose = mp.solutions.pose
+mp_drawing = mp.solutions.drawing_utils
+
+# Angle thresholds (degrees) of the "down" phases, e.g. {"knee": 90, "hip": 100, ...}
+PHASE_THRESHOLDS = DEFAULT_RULES.thresholds()
+
+# Landmarks used by the exercise logic
+KEYPOINT_NAMES = DEFAULT_RULES.landmarks
+
+# Pull the keypoints used by the exercise logic out of a Mediapipe result
+def extract_keypoints(pose_landmarks):
+    landmarks = pose_landmarks.landmark
+    keypoints = {}
+    for name in KEYPOINT_NAMES:
+        landmark = landmarks[mp_pose.PoseLandmark[name].value]
+        keypoints[name] = [landmark.x, landmark.y]
+    return keypoints
+
+# Store a Mediapipe result as a (NUM_LANDMARKS, len(LANDMARK_FIELDS)) float32 array
+def landmarks_to_array(pose_landmarks):
+    return np.array(
+        [[getattr(landmark, field) for field in LANDMARK_FIELDS] for landmark in pose_landmarks.landmark],
+        dtype=np.float32,
+    )
+
+# Rebuild a Mediapipe landmark list from a stored array so it can be drawn
+def array_to_landmarks(array):
+    return landmark_pb2.NormalizedLandmarkList(
+        landmark=[landmark_pb2.NormalizedLandmark(**dict(zip(LANDMARK_FIELDS, map(float, row)))) for row in array]
+    )
+
+
+# Text color of each exercise on the annotated video (BGR), in rule order
+EXERCISE_COLORS = [(0, 255, 0), (0, 0, 255), (255, 0, 0), (0, 255, 255), (255, 0, 255)]
+
+# Draw the skeleton, exercise type and counts on the frame
+def annotate_frame(image, pose_landmarks, exercise, counter):
+    mp_drawing.draw_landmarks(image, pose_landmarks, mp_pose.POSE_CONNECTIONS)
+    cv2.putText(image, f"Exercise: {exercise}", (50, 50),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2, cv2.LINE_AA)
+    for i, rule in enumerate(counter.rules.rules):
+        cv2.putText(image, f"{rule.label}: {counter.counts[rule.name]} ({counter.phase(rule.name)})",
+                    (50, 100 + 50 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                    EXERCISE_COLORS[i % len(EXERCISE_COLORS)], 2, cv2.LINE_AA)
+    return image
@@ -0,0 +1,61 @@
+"""
+Images shown by the pages, served from the app's own files instead of remote URLs.
+
+    path = asset_path("logo.png")   # visuals/logo.png
+    path = asset_path("squat.gif")  # cached download, or None until it is available
+
+Images in `visuals/` ship with the app. The exercise GIFs of the Home page are not bundled;
+the first lookup downloads each of them once, on a background thread, into `ASSET_CACHE_DIR`,
+and `asset_path` returns None until the file is there. Without network access the pages
+show their fallback text instead, and never wait on a request.
+"""
+import os
+import tempfile
+import threading
+import urllib.request
+
+VISUALS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "visuals")
+DEFAULT_ASSET_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "fitsmart", "assets")
+
+# Images fetched into the cache when they are not in visuals/
+REMOTE_ASSETS = {
+    "squat.gif": "https://media.giphy.com/media/eVCEGG1uKPPpcaDoFN/giphy.gif",
+    "pushup.gif": "https://media.giphy.com/media/rHGjuFX5FBRxn6AdCU/giphy.gif",
+}
+
+FETCH_TIMEOUT = 10
+
+# Downloads started by this process; a failed one is not retried until the server restarts
+_fetched = set()
+_fetched_lock = threading.Lock()
+
+
+def asset_path(name, cache_dir=DEFAULT_ASSET_CACHE_DIR):
+    """
+    Local path of the image `name`, or None if it is not (yet) available.
+    """
+    for directory in (VISUALS_DIR, cache_dir):
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            return path
+    if name in REMOTE_ASSETS:
+        with _fetched_lock:
+            start = name not in _fetched
+            _fetched.add(name)
+        if start:
+            threading.Thread(target=_fetch, args=(REMOTE_ASSETS[name], os.path.join(cache_dir, name)),
+                             name="fitsmart-asset-fetch", daemon=True).start()
+    return None
+
+
+def _fetch(url, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f, urllib.request.urlopen(url, timeout=FETCH_TIMEOUT) as response:
+            f.write(response.read())
+        os.replace(temp_path, path)
+    except (OSError, ValueError):
+        # Offline or blocked: the pages keep showing their fallback
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,110 @@
+"""
+Storage backends shared by all pages: the workouts table and the per-user rollups table.
+
+    backend = backend_from_secrets(st.secrets)
+    record_workout(backend.workouts, backend.rollups, ...)
+
+`STORAGE_BACKEND` in the secrets picks the implementation:
+
+    "dynamodb"   AWS DynamoDB (default), through one pooled, retrying client per process
+    "sqlite"     an SQLite file (`SQLITE_PATH`), to run and load-test the app without AWS
+    "memory"     in-process tables, emptied when the process exits
+
+Backends are built once per process and configuration and reused by every page, session
+and rerun, so connection setup and TLS handshakes are not paid again on each script run.
+"""
+import os
+import threading
+from dataclasses import dataclass
+
+BACKENDS = ("dynamodb", "sqlite", "memory")
+
+# Connections kept open to DynamoDB; parallel scans and concurrent sessions share them
+DEFAULT_MAX_POOL_CONNECTIONS = 32
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "fitsmart", "fitsmart.db")
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+@dataclass
+class StorageBackend:
+    kind: str
+    workouts: object
+    rollups: object
+
+
+def _dynamodb_backend(region, access_key_id, secret_access_key, table, rollup_table, max_pool_connections):
+    import boto3
+    from botocore.config import Config
+
+    config = Config(
+        max_pool_connections=max_pool_connections,
+        retries={"max_attempts": 5, "mode": "adaptive"},
+        connect_timeout=5,
+        read_timeout=10,
+        tcp_keepalive=True,
+    )
+    session = boto3.session.Session(
+        aws_access_key_id=access_key_id,
+        aws_secret_access_key=secret_access_key,
+        region_name=region,
+    )
+    # Table actions only go through the resource's client, which is thread-safe
+    dynamodb = session.resource("dynamodb", config=config)
+    return StorageBackend("dynamodb", dynamodb.Table(table), dynamodb.Table(rollup_table))
+
+
+def open_backend(kind="dynamodb", table="exercise_records", rollup_table=None, **options):
+    """
+    The process-wide backend for a configuration, created on first use.
+
+    `options` are `region`, `access_key_id`, `secret_access_key` and `max_pool_connections`
+    for "dynamodb", `path` for "sqlite".
+    """
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown storage backend {kind!r}, expected one of {BACKENDS}")
+    rollup_table = rollup_table or f"{table}_rollups"
+    key = (kind, table, rollup_table, tuple(sorted(options.items())))
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            if kind == "dynamodb":
+                backend = _dynamodb_backend(
+                    options.get("region"), options.get("access_key_id"), options.get("secret_access_key"),
+                    table, rollup_table, options.get("max_pool_connections", DEFAULT_MAX_POOL_CONNECTIONS),
+                )
+            elif kind == "sqlite":
+                from fitsmart.localdb import SQLiteTable
+
+                path = options.get("path", DEFAULT_SQLITE_PATH)
+                backend = StorageBackend("sqlite", SQLiteTable(path, table, "username", "datetime"),
+                                         SQLiteTable(path, rollup_table, "bucket", "username"))
+            else:
+                from fitsmart.localdb import InMemoryTable
+
+                backend = StorageBackend("memory", InMemoryTable(table, "username", "datetime"),
+                                         InMemoryTable(rollup_table, "bucket", "username"))
+            _backends[key] = backend
+        return backend
+
+
+def backend_from_secrets(secrets):
+    """
+    The backend configured in Streamlit secrets (or any mapping with the same keys).
+    """
+    kind = secrets.get("STORAGE_BACKEND", "dynamodb")
+    table = secrets.get("DYNAMODB_TABLE", "exercise_records")
+    rollup_table = secrets.get("DYNAMODB_ROLLUP_TABLE")
+    if kind == "dynamodb":
+        return open_backend(
+            kind, table, rollup_table,
+            region=secrets["AWS_REGION"],
+            access_key_id=secrets["AWS_ACCESS_KEY_ID"],
+            secret_access_key=secrets["AWS_SECRET_ACCESS_KEY"],
+            max_pool_connections=int(secrets.get("DYNAMODB_MAX_POOL_CONNECTIONS", DEFAULT_MAX_POOL_CONNECTIONS)),
+        )
+    if kind == "sqlite":
+        return open_backend(kind, table, rollup_table, path=secrets.get("SQLITE_PATH", DEFAULT_SQLITE_PATH))
+    return open_backend(kind, table, rollup_table)
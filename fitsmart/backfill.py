@@ -0,0 +1,40 @@
+"""
+Build the per-user rollup table from the existing workout records (one-off backfill).
+
+    python -m fitsmart.backfill --table exercise_records --region eu-central-1
+
+The rollup table (default: "<table>_rollups") must already exist with the partition key
+"bucket" and the sort key "username", both strings. AWS credentials are taken from the
+usual boto3 sources (environment, ~/.aws, instance role). `--backend sqlite` rebuilds the
+rollups of a local database instead.
+"""
+import argparse
+import sys
+import time
+
+from fitsmart.backend import BACKENDS, DEFAULT_SQLITE_PATH, open_backend
+from fitsmart.storage import backfill_rollups
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the Leaderboard rollups from the workout records.")
+    parser.add_argument("--table", required=True, help="DynamoDB table of the workout records")
+    parser.add_argument("--rollup-table", help="DynamoDB table of the rollups (default: <table>_rollups)")
+    parser.add_argument("--region", help="AWS region of both tables")
+    parser.add_argument("--backend", choices=[kind for kind in BACKENDS if kind != "memory"], default="dynamodb",
+                        help="storage backend holding the tables")
+    parser.add_argument("--sqlite-path", default=DEFAULT_SQLITE_PATH, help="database file of the sqlite backend")
+    args = parser.parse_args(argv)
+
+    if args.backend == "sqlite":
+        backend = open_backend("sqlite", args.table, args.rollup_table, path=args.sqlite_path)
+    else:
+        backend = open_backend("dynamodb", args.table, args.rollup_table, region=args.region)
+    started = time.perf_counter()
+    count = backfill_rollups(backend.workouts, backend.rollups)
+    print(f"Wrote {count} rollup items in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
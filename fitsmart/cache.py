@@ -0,0 +1,125 @@
+"""
+On-disk cache of pose landmark tracks, keyed by the content of the analyzed video.
+
+Re-uploading the same clip, or re-scoring it after a threshold change, then skips pose
+inference and goes straight to rep counting and rendering. The cache is bounded in size:
+the least recently used entries are evicted once it grows past `max_bytes`.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from fitsmart.tracks import LandmarkTrack
+
+# Bump when a change to pose inference or frame preparation invalidates cached landmarks
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "fitsmart", "landmarks")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+# SHA-256 of a file's content, read in chunks
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LandmarkCache:
+    """
+    Size-bounded LRU cache of `LandmarkTrack`s stored as .npz files in `directory`.
+
+    Safe to share between threads; entries are written atomically, so several processes
+    may also use the same directory.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, video_path, digest=None, **params):
+        """
+        Cache key for a video: its content hash plus every parameter that changes the landmarks.
+
+        `digest` is the SHA-256 hex digest of the video if the caller already has it (e.g. of
+        the upload); otherwise the file is hashed.
+        """
+        settings = ",".join(f"{name}={params[name]}" for name in sorted(params))
+        return f"{digest or file_digest(video_path)}-{hashlib.sha256(f'v{CACHE_VERSION}:{settings}'.encode()).hexdigest()[:16]}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    def get(self, key, video_bytes=0):
+        """
+        The cached track for `key`, or None. `video_bytes` is counted as saved on a hit.
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                track = LandmarkTrack(data["frame_counts"], data["landmarks"])
+            # Mark the entry as recently used
+            os.utime(path)
+        except (OSError, KeyError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += video_bytes
+        return track
+
+    def put(self, key, track):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, frame_counts=track.frame_counts, landmarks=track.landmarks)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits in `max_bytes`.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npz"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+            }
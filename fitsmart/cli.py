@@ -0,0 +1,123 @@
+"""
+Analyze every video in a directory without the Streamlit UI.
+
+    python -m fitsmart.cli VIDEO_DIR --workers 4 --output results.jsonl
+
+Writes one JSON line per video with its counts and timings, in completion order.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from fitsmart.cache import DEFAULT_MAX_BYTES, LandmarkCache
+from fitsmart.engine import analyze_video
+from fitsmart.posepool import DEFAULT_MODEL_COMPLEXITY, MODEL_COMPLEXITIES, shared_pose_pool
+from fitsmart.video import ENCODE_PRESETS
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi")
+
+
+# Video files under `directory`, sorted so runs are reproducible
+def find_videos(directory, recursive=False):
+    if recursive:
+        paths = [os.path.join(root, name) for root, _, names in os.walk(directory) for name in names]
+    else:
+        paths = [os.path.join(directory, name) for name in os.listdir(directory)]
+    return sorted(path for path in paths if path.lower().endswith(VIDEO_EXTENSIONS))
+
+
+def analyze_one(video_path, output_dir=None, recorded_on_android=False, mode="sequential", sampling="fixed",
+                decoder="opencv", cache_dir=None, encode_preset="balanced",
+                model_complexity=DEFAULT_MODEL_COMPLEXITY):
+    """
+    Analyze one video and return its JSON record; errors are reported in the record.
+
+    The pose estimator is reused by the next video analyzed in the same worker process.
+    """
+    started = time.perf_counter()
+    cache = LandmarkCache(cache_dir, DEFAULT_MAX_BYTES) if cache_dir else None
+    output_path = None
+    if output_dir:
+        output_path = os.path.join(output_dir, os.path.splitext(os.path.basename(video_path))[0] + "_analyzed.mp4")
+    try:
+        record = analyze_video(video_path, output_path, recorded_on_android, mode=mode,
+                               sampling=sampling, decoder=decoder, cache=cache,
+                               encode_preset=encode_preset,
+                               pose_pool=shared_pose_pool(model_complexity)).to_dict()
+        record["error"] = None
+    except Exception as e:
+        record = {"video_path": video_path, "seconds": time.perf_counter() - started, "error": str(e)}
+    return record
+
+
+def run_batch(videos, out, workers=1, **kwargs):
+    """
+    Analyze `videos` with `workers` processes, writing a JSON line to `out` as each finishes.
+    """
+    failures = 0
+    if workers <= 1:
+        for video in videos:
+            failures += _write_record(out, analyze_one(video, **kwargs))
+        return failures
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(analyze_one, video, **kwargs) for video in videos]
+        for future in as_completed(futures):
+            failures += _write_record(out, future.result())
+    return failures
+
+
+def _write_record(out, record):
+    out.write(json.dumps(record) + "\n")
+    out.flush()
+    return record["error"] is not None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count squats and push-ups in a directory of workout videos.")
+    parser.add_argument("directory", help="directory containing the videos")
+    parser.add_argument("-o", "--output", default="-", help="JSON lines output file (default: stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of videos analyzed in parallel")
+    parser.add_argument("-r", "--recursive", action="store_true", help="also search subdirectories")
+    parser.add_argument("--mode", choices=["sequential", "pipelined"], default="sequential",
+                        help="how each video is processed inside its worker")
+    parser.add_argument("--sampling", choices=["fixed", "adaptive"], default="fixed",
+                        help="analyze every 3rd frame, or sample by motion and closeness to the rep thresholds")
+    parser.add_argument("--decoder", choices=["opencv", "ffmpeg"], default="opencv",
+                        help="ffmpeg decodes only the sampled frames, already rotated and scaled")
+    parser.add_argument("--cache-dir", help="reuse pose landmarks cached in this directory")
+    parser.add_argument("--android", action="store_true", help="videos were recorded with an Android front camera")
+    parser.add_argument("--save-videos", metavar="DIR",
+                        help="also write the annotated videos to DIR (by default only the counts are computed)")
+    parser.add_argument("--preset", choices=list(ENCODE_PRESETS), default="balanced",
+                        help="H.264 speed/quality preset of the saved videos")
+    parser.add_argument("--model-complexity", type=int, choices=MODEL_COMPLEXITIES, default=DEFAULT_MODEL_COMPLEXITY,
+                        help="MediaPipe Pose model: 0 (lite, fastest), 1 (full) or 2 (heavy, most accurate)")
+    args = parser.parse_args(argv)
+
+    videos = find_videos(args.directory, args.recursive)
+    if args.save_videos:
+        os.makedirs(args.save_videos, exist_ok=True)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "a")
+    try:
+        failures = run_batch(videos, out, workers=args.workers, output_dir=args.save_videos,
+                             recorded_on_android=args.android, mode=args.mode, sampling=args.sampling,
+                             decoder=args.decoder, cache_dir=args.cache_dir, encode_preset=args.preset,
+                             model_complexity=args.model_complexity)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Analyzed {len(videos)} videos, {failures} failed", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Precomputed squat/push-up sums per period for the Statistics charts.
+
+    cube = RollupCube(df)                  # once per data load
+    cube.series("Weekly", username="ana")  # a lookup, no groupby
+    downsample(series, max_points=400)     # bounded number of points for Plotly
+
+Periods start on the day, on the Monday of the week (like pandas' "W" periods) and on the
+first of the month. They are computed with numpy datetime64 arithmetic on the whole
+column at once instead of one `Period` object per row.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+# Chart aggregation frequencies
+FREQUENCIES = ("Daily", "Weekly", "Monthly")
+
+COUNT_COLUMNS = ["squat_count", "pushup_count"]
+
+# Points sent to Plotly per chart
+MAX_CHART_POINTS = 400
+
+
+def period_starts(datetimes, frequency):
+    """
+    Start (midnight) of the day, week or month of every timestamp, as datetime64[ns].
+    """
+    days = np.asarray(datetimes, dtype="datetime64[ns]").astype("datetime64[D]")
+    if frequency == "Daily":
+        starts = days
+    elif frequency == "Weekly":
+        # 1970-01-01 was a Thursday; weeks start on Monday
+        starts = days - (days.astype(np.int64) + 3) % 7
+    elif frequency == "Monthly":
+        starts = days.astype("datetime64[M]").astype("datetime64[D]")
+    else:
+        raise ValueError(f"Unknown frequency {frequency!r}, expected one of {FREQUENCIES}")
+    return starts.astype("datetime64[ns]")
+
+
+class RollupCube:
+    """
+    Global and per-user squat/push-up sums at every frequency, built from a workouts DataFrame.
+    """
+
+    def __init__(self, df):
+        self.totals = {}
+        self.per_user = {}
+        for frequency in FREQUENCIES:
+            sums = (
+                df[COUNT_COLUMNS]
+                .assign(username=df["username"].to_numpy(), date=period_starts(df["datetime"], frequency))
+                .groupby(["username", "date"], sort=True)[COUNT_COLUMNS]
+                .sum()
+            )
+            # Sorted (username, date) index: one user's rows are a slice of it
+            self.per_user[frequency] = sums
+            self.totals[frequency] = sums.groupby(level="date").sum().reset_index()
+        self.users = set(df["username"].unique())
+        self._series = {}
+
+    def series(self, frequency, username=None):
+        """
+        Sums per period (columns date, squat_count, pushup_count) for one user or everyone.
+        """
+        if username is None:
+            return self.totals[frequency]
+        key = (frequency, username)
+        series = self._series.get(key)
+        if series is None:
+            if username in self.users:
+                series = self.per_user[frequency].loc[username].reset_index()
+            else:
+                series = pd.DataFrame({"date": pd.Series(dtype="datetime64[ns]"), "squat_count": [], "pushup_count": []})
+            self._series[key] = series
+        return series
+
+
+def downsample(series, max_points=MAX_CHART_POINTS):
+    """
+    Merge consecutive periods so at most `max_points` remain; returns (series, periods per point).
+
+    Counts are summed, so totals stay exact; each point is dated by its first period.
+    """
+    if len(series) <= max_points:
+        return series, 1
+    per_point = math.ceil(len(series) / max_points)
+    groups = np.arange(len(series)) // per_point
+    merged = series.groupby(groups).agg({"date": "first", "squat_count": "sum", "pushup_count": "sum"})
+    return merged.reset_index(drop=True), per_point
@@ -0,0 +1,116 @@
+"""
+In-process workout data shared by all sessions, refreshed incrementally past a watermark.
+
+    cache = WorkoutCache(lambda: load_workouts(table),
+                         lambda since: load_workouts_since(table, rollups, since))
+    df = cache.get()              # full load once, then incremental refreshes every `ttl`
+    df = cache.get(refresh=True)  # "Refresh Data": fetch only what is newer than the watermark
+
+The watermark is the newest "datetime" seen. A refresh fetches the records from a little
+before it (`overlap`, to catch records written late by another server) and merges them into
+the cached DataFrame, dropping duplicates. Concurrent refreshes are merged: whoever waits
+while another session refreshes gets that result instead of fetching again.
+"""
+import datetime
+import threading
+import time
+
+import pandas as pd
+
+from fitsmart.storage import DATETIME_FORMAT, format_datetime
+
+# Workout items are unique by user and timestamp
+RECORD_KEY = ["username", "datetime"]
+
+
+class WorkoutCache:
+    """
+    A DataFrame of workout records, sorted by datetime, kept current by fetching only new records.
+
+    `load_all()` returns every record, `load_since(datetime_text)` the records at or after a
+    stored "datetime" string; both return lists of items.
+    """
+
+    def __init__(self, load_all, load_since, ttl=300, overlap=datetime.timedelta(minutes=5)):
+        self.load_all = load_all
+        self.load_since = load_since
+        self.ttl = ttl
+        self.overlap = overlap
+        self.watermark = None
+        self.full_loads = 0
+        self.incremental_loads = 0
+        self.fetched_records = 0
+        self._frame = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._derived = {}
+        self._refresh_lock = threading.Lock()
+
+    def get(self, refresh=False):
+        """
+        The cached records, refreshed first when `refresh` is set or the data is older than `ttl`.
+        """
+        stale = self._frame is None or time.monotonic() - self._loaded_at > self.ttl
+        if not (refresh or stale):
+            return self._frame
+        generation = self._generation
+        with self._refresh_lock:
+            # Another caller refreshed while this one waited for the lock
+            if self._generation != generation and self._frame is not None:
+                return self._frame
+            if self._frame is None:
+                items = self.load_all()
+                self.full_loads += 1
+                frame = self._to_frame(items)
+            else:
+                items = self.load_since(self._since())
+                self.incremental_loads += 1
+                frame = self._merge(self._frame, self._to_frame(items))
+            self.fetched_records += len(items)
+            if not frame.empty:
+                self.watermark = format_datetime(frame["datetime"].max())
+            self._frame = frame
+            self._loaded_at = time.monotonic()
+            self._generation += 1
+            return frame
+
+    def derive(self, name, build):
+        """
+        `build(frame)` for the current records, computed once per data load and reused until
+        the records change (e.g. the chart rollups of `fitsmart.cube`).
+        """
+        frame = self.get()
+        cached = self._derived.get(name)
+        if cached is None or cached[0] is not frame:
+            cached = self._derived[name] = (frame, build(frame))
+        return cached[1]
+
+    def _since(self):
+        if self.watermark is None:
+            return ""
+        return format_datetime(datetime.datetime.strptime(self.watermark, DATETIME_FORMAT) - self.overlap)
+
+    @staticmethod
+    def _to_frame(items):
+        df = pd.DataFrame(items, columns=RECORD_KEY + ["squat_count", "pushup_count"])
+        df["datetime"] = pd.to_datetime(df["datetime"])
+        df["squat_count"] = df["squat_count"].astype(int)
+        df["pushup_count"] = df["pushup_count"].astype(int)
+        # Kept in datetime order so views never need to sort
+        return df.sort_values("datetime", ignore_index=True)
+
+    @staticmethod
+    def _merge(frame, new):
+        if new.empty:
+            return frame
+        merged = pd.concat([frame, new], ignore_index=True)
+        return merged.drop_duplicates(RECORD_KEY, keep="last").sort_values("datetime", ignore_index=True)
+
+    def stats(self):
+        return {
+            "records": 0 if self._frame is None else len(self._frame),
+            "watermark": self.watermark,
+            "full_loads": self.full_loads,
+            "incremental_loads": self.incremental_loads,
+            "fetched_records": self.fetched_records,
+        }
@@ -0,0 +1,205 @@
+"""
+UI-free entry point for analyzing a single video, shared by the Streamlit page and the CLI.
+"""
+import os
+import time
+from dataclasses import asdict, dataclass, field, replace
+
+from fitsmart.features import RepCounter
+from fitsmart.instrument import NULL_METRICS, current_rss_mb
+from fitsmart.pipeline import FRAME_SKIP, open_frames, process_video
+from fitsmart.posepool import shared_pose_pool
+from fitsmart.sampling import AdaptiveSampler, process_adaptive
+from fitsmart.segments import count_track, extract_landmarks_parallel, render_track
+from fitsmart.tracks import LandmarkTrack, TrackRecorder
+from fitsmart.video import FRAME_SIZE, FFmpegVideoWriter, video_info
+
+# Execution modes of analyze_video
+MODES = ("sequential", "pipelined", "segments")
+# Frame sampling strategies: every FRAME_SKIP-th frame, or motion/angle driven (see fitsmart.sampling)
+SAMPLINGS = ("fixed", "adaptive")
+
+
+@dataclass
+class AnalysisResult:
+    video_path: str
+    squat_count: int
+    pushup_count: int
+    total_frames: int
+    sampled_frames: int
+    seconds: float
+    # Highest resident memory of the analyzing process while the video ran; other jobs in the
+    # same process count too
+    process_peak_rss_mb: float
+    inferences: int = 0
+    cache_hit: bool = False
+    output_path: str = None
+    fps: float = 0.0
+    # Landmarks of the sampled frames, kept when analyze_video is called with keep_track
+    track: LandmarkTrack = field(default=None, repr=False)
+    # fitsmart.rules.RepEvent of every rep, when the reps were counted over the whole track
+    rep_events: list = field(default=None, repr=False)
+
+    @property
+    def inferences_per_rep(self):
+        reps = self.squat_count + self.pushup_count
+        return self.inferences / reps if reps else None
+
+    def to_dict(self):
+        # asdict deep-copies every field: leave the landmark track out before, not after
+        record = asdict(replace(self, track=None))
+        del record["track"]
+        record["inferences_per_rep"] = self.inferences_per_rep
+        return record
+
+
+def analyze_video(video_path, output_path=None, recorded_on_android=False, mode="pipelined",
+                  workers=None, on_progress=None, sampling="fixed", decoder="opencv", cache=None,
+                  metrics=NULL_METRICS, encode_preset="balanced", pose_pool=None, keep_track=False, progress=None,
+                  max_output_bytes=None, video_digest=None):
+    """
+    Count squats and push-ups in a video file.
+
+    When `output_path` is given, the annotated video is encoded there once, as browser-playable
+    H.264 with one of `fitsmart.video.ENCODE_PRESETS`; without it nothing is drawn or encoded
+    (counts only). With `max_output_bytes` the encode stops with `fitsmart.workspace.QuotaExceeded`
+    as soon as the file grows past it. `on_progress(fraction)` is called as frames are
+    processed. `mode` is one of `MODES`; `workers` only applies to "segments". Adaptive
+    `sampling` needs the result of each inference before choosing the next frame, so it always
+    runs sequentially. `decoder` is one of `fitsmart.pipeline.DECODERS`.
+
+    With a `fitsmart.cache.LandmarkCache`, the landmarks of fixed-sampling runs are cached by
+    video content; a repeat of the same video skips pose inference entirely. `video_digest`, the
+    SHA-256 hex digest of the video, saves hashing the file again when the caller has it.
+
+    Pose estimators are checked out of `pose_pool`, a `fitsmart.posepool.PosePool` (default:
+    this process's shared one), so their models are not loaded again for every video.
+
+    With `keep_track`, the landmarks of every frame pose inference ran on are returned as
+    `AnalysisResult.track` (e.g. to save a `fitsmart.traces` trace of the workout).
+
+    A `fitsmart.progress.ProgressChannel` given as `progress` is updated with the running
+    counts, exercise and output frame as the video is processed; it publishes at its own
+    capped rate, so the analysis never waits on whoever reads it.
+
+    Stage timings (decode, pose, draw, encode, ...) are recorded on `metrics`, a
+    `fitsmart.instrument.Metrics`; the caller decides whether to display or emit them.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown analysis mode {mode!r}, expected one of {MODES}")
+    if sampling not in SAMPLINGS:
+        raise ValueError(f"Unknown sampling {sampling!r}, expected one of {SAMPLINGS}")
+    pose_pool = pose_pool or shared_pose_pool()
+
+    started = time.perf_counter()
+    total_frames, fps = video_info(video_path)
+
+    # Without an output video nothing is drawn or encoded; only the counts are computed
+    draw = output_path is not None
+    writer = FFmpegVideoWriter(output_path, preset=encode_preset, max_bytes=max_output_bytes) if draw else None
+
+    sampled_frames = 0
+    process_peak_rss_mb = current_rss_mb()
+    # Counts and exercise as of the frame being output, for `progress`
+    live = RepCounter()
+
+    def on_frame(frame_count, image):
+        nonlocal sampled_frames, process_peak_rss_mb
+        sampled_frames += 1
+        if writer is not None:
+            with metrics.stage("encode"):
+                writer.write(image)
+        process_peak_rss_mb = max(process_peak_rss_mb, current_rss_mb())
+        metrics.observe_memory(process_peak_rss_mb)
+        fraction = min(1.0, max(0.0, frame_count / max(1, total_frames)))
+        if on_progress:
+            on_progress(fraction)
+        if progress is not None:
+            progress.update(fraction, live.counts, live.exercise, image)
+
+    # Counts of a stored track; its frames are only decoded again to draw the output video
+    def finish_track(track):
+        nonlocal sampled_frames
+        with metrics.stage("count", items=len(track)):
+            counts = count_track(track, fps)
+        if draw:
+            render_track(video_path, track, counts, on_frame, recorded_on_android, decoder, metrics, snapshot=live)
+        else:
+            sampled_frames = len(track)
+            if on_progress:
+                on_progress(1.0)
+        return counts
+
+    cache_key = None
+    track = None
+    if cache is not None and sampling == "fixed":
+        with metrics.stage("cache_lookup"):
+            cache_key = cache.key(video_path, video_digest, recorded_on_android=recorded_on_android,
+                                  decoder=decoder, frame_skip=FRAME_SKIP, frame_size=FRAME_SIZE,
+                                  model_complexity=pose_pool.model_complexity)
+            track = cache.get(cache_key, video_bytes=os.path.getsize(video_path))
+    cache_hit = track is not None
+
+    sampler = None
+    try:
+        if cache_hit:
+            counts = finish_track(track)
+        elif sampling == "adaptive":
+            sampler = AdaptiveSampler(fps)
+            recorder = TrackRecorder() if keep_track else None
+            checkout_started = time.perf_counter()
+            with pose_pool.checkout() as pose:
+                metrics.record("pose_checkout", time.perf_counter() - checkout_started, items=1)
+                counts = process_adaptive(video_path, pose, on_frame, recorded_on_android, decoder, counter=live,
+                                          sampler=sampler, recorder=recorder, metrics=metrics, draw=draw)
+            if recorder is not None:
+                track = recorder.track()
+        elif mode == "segments":
+            # Decode and inference overlap in the worker processes; time them as one stage
+            extract_started = time.perf_counter()
+            track = extract_landmarks_parallel(video_path, recorded_on_android, workers, on_progress, decoder,
+                                               pose_pool.model_complexity)
+            metrics.record("pose_parallel", time.perf_counter() - extract_started, items=len(track))
+            counts = finish_track(track)
+        else:
+            recorder = TrackRecorder() if cache_key or keep_track else None
+            checkout_started = time.perf_counter()
+            with open_frames(video_path, recorded_on_android, decoder) as frames, pose_pool.checkout() as pose:
+                metrics.record("pose_checkout", time.perf_counter() - checkout_started, items=1)
+                counts = process_video(frames, pose, on_frame, pipelined=mode == "pipelined", counter=live,
+                                       recorder=recorder, metrics=metrics, draw=draw)
+            if recorder is not None:
+                track = recorder.track()
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+
+    if writer is not None:
+        with metrics.stage("encode_flush", items=writer.frames, sample_memory=True):
+            writer.release()
+        if not writer.frames:
+            output_path = None
+
+    if cache_key and not cache_hit and track is not None:
+        with metrics.stage("cache_store"):
+            cache.put(cache_key, track)
+
+    if progress is not None:
+        progress.update(1.0, counts.totals(), force=True)
+
+    return AnalysisResult(
+        video_path=video_path,
+        squat_count=int(counts.squat_count),
+        pushup_count=int(counts.pushup_count),
+        total_frames=total_frames,
+        sampled_frames=sampled_frames,
+        seconds=time.perf_counter() - started,
+        process_peak_rss_mb=process_peak_rss_mb,
+        inferences=0 if cache_hit else sampler.inferences if sampler else sampled_frames,
+        cache_hit=cache_hit,
+        output_path=output_path,
+        fps=fps,
+        track=track if keep_track else None,
+        rep_events=getattr(counts, "events", None),
+    )
@@ -0,0 +1,72 @@
+"""
+The exercise logic of `fitsmart.rules` over the landmark arrays of a whole video.
+
+Everything here works on a whole video at once: the landmarks of all sampled frames as a
+(frames, landmarks, 2) float32 array of x/y coordinates. Results are identical to running
+`RepCounter`, the per-frame counter of the live pipeline, frame by frame. The module only
+needs numpy, so stored landmark arrays can be re-scored without MediaPipe.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from fitsmart.rules import DEFAULT_RULES, Evaluation, RuleCounter, frame_angles
+from fitsmart.tracks import POSE_LANDMARKS
+
+# Index of each keypoint of the exercise rules in the MediaPipe Pose landmark list
+LANDMARK_INDEX = {name: POSE_LANDMARKS.index(name) for name in DEFAULT_RULES.landmarks}
+
+# Exercise codes used in the classification array
+EXERCISES = DEFAULT_RULES.exercises
+UNKNOWN, SQUAT, PUSHUP = range(len(EXERCISES))
+
+
+@dataclass
+class FrameFeatures(Evaluation):
+    """
+    Per-frame classification, phase and running count arrays for one video (see
+    `fitsmart.rules.Evaluation`), with the squat and push-up totals the app records.
+    """
+
+    @property
+    def squat_count(self):
+        return self.count("squat")
+
+    @property
+    def pushup_count(self):
+        return self.count("push-up")
+
+
+# Turn stored landmark arrays (frames, landmarks, fields) into a compact x/y array
+def to_points(landmarks):
+    return np.ascontiguousarray(landmarks[:, :, :2], dtype=np.float32)
+
+
+def analyze_points(points, frame_counts=None, fps=None, rules=DEFAULT_RULES):
+    """
+    Classification, phases, rep counts and rep events for a (frames, landmarks, 2) landmark array.
+    """
+    return FrameFeatures(**vars(rules.evaluate(points, frame_counts, fps)))
+
+
+class RepCounter(RuleCounter):
+    """
+    Running exercise state for one video: the count and current phase of each exercise.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES):
+        super().__init__(rules)
+
+    def update(self, keypoints):
+        """
+        Classify the frame, advance the matching exercise phase and return the exercise type.
+        """
+        return super().update(frame_angles(keypoints, self.rules.angle_names))
+
+    @property
+    def squat_count(self):
+        return self.counts["squat"]
+
+    @property
+    def pushup_count(self):
+        return self.counts["push-up"]
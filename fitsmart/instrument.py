@@ -0,0 +1,203 @@
+"""
+Lightweight per-stage timing for analysis jobs and page data loads.
+
+    metrics = Metrics("upload", username=username)
+    with metrics.stage("dynamodb_put"):
+        table.put_item(...)
+    for frame in metrics.iterate("decode", frames):
+        ...
+    metrics.emit()
+
+Each stage accumulates wall time, number of calls and items (e.g. frames); the same stage may
+be timed from several threads at once, or nested. Memory figures are the resident memory of
+the whole process, which concurrent jobs share, not of one job. A disabled
+`Metrics` (or `NULL_METRICS`) hands out a shared no-op context manager and returns iterables
+unchanged, so instrumented hot loops cost a method call per frame when metrics are off.
+"""
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+
+logger = logging.getLogger("fitsmart.metrics")
+logger.addHandler(logging.NullHandler())
+
+_logging_configured = threading.Lock()
+
+
+# Current resident memory of this whole process in MB (sampled to report the process peak while a job runs)
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # Fallback for platforms without /proc: lifetime peak of the process
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Send metrics records to stderr as JSON lines (once per process)
+def configure_logging(level=logging.INFO):
+    with _logging_configured:
+        if not any(getattr(handler, "_fitsmart", False) for handler in logger.handlers):
+            handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            handler._fitsmart = True
+            logger.addHandler(handler)
+        logger.setLevel(level)
+
+
+class _Stage:
+    __slots__ = ("name", "seconds", "calls", "items", "rss_mb", "_lock")
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.calls = 0
+        self.items = 0
+        self.rss_mb = None
+        self._lock = threading.Lock()
+
+    def add(self, seconds, calls=1, items=1):
+        with self._lock:
+            self.seconds += seconds
+            self.calls += calls
+            self.items += items
+
+
+class _Timing:
+    """
+    One timed occurrence of a stage; its start lives here, so occurrences may overlap.
+    """
+
+    __slots__ = ("stage", "items", "sample_memory", "started")
+
+    def __init__(self, stage, items, sample_memory):
+        self.stage = stage
+        self.items = items
+        self.sample_memory = sample_memory
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stage.add(time.perf_counter() - self.started, items=self.items)
+        if self.sample_memory:
+            self.stage.rss_mb = current_rss_mb()
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Metrics:
+    """
+    Stage timings of one job. `labels` (e.g. username, mode) are included in the emitted record.
+    """
+
+    def __init__(self, job, enabled=True, **labels):
+        self.job = job
+        self.enabled = enabled
+        self.labels = labels
+        # Highest resident memory of the process seen while the job ran (see current_rss_mb)
+        self.process_peak_rss_mb = None
+        self._stages = {}
+        self._stages_lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def _get(self, name):
+        stage = self._stages.get(name)
+        if stage is None:
+            with self._stages_lock:
+                stage = self._stages.setdefault(name, _Stage(name))
+        return stage
+
+    def stage(self, name, items=1, sample_memory=False):
+        """
+        Context manager timing one occurrence of stage `name` covering `items` items.
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Timing(self._get(name), items, sample_memory)
+
+    def iterate(self, name, iterable):
+        """
+        Yield from `iterable`, timing how long each item takes to produce under stage `name`.
+        """
+        if not self.enabled:
+            return iterable
+        return self._timed_iter(self._get(name), iter(iterable))
+
+    @staticmethod
+    def _timed_iter(stage, iterator):
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                stage.add(time.perf_counter() - started, calls=0, items=0)
+                return
+            stage.add(time.perf_counter() - started)
+            yield item
+
+    def record(self, name, seconds, items=1):
+        """
+        Add a measurement taken elsewhere (e.g. in a worker process).
+        """
+        if self.enabled:
+            self._get(name).add(seconds, items=items)
+
+    def observe_memory(self, rss_mb):
+        if self.enabled:
+            peak = self.process_peak_rss_mb
+            self.process_peak_rss_mb = rss_mb if peak is None else max(peak, rss_mb)
+
+    def rows(self):
+        """
+        One dict per stage, in the order the stages first ran.
+        """
+        return [
+            {
+                "stage": stage.name,
+                "seconds": round(stage.seconds, 4),
+                "calls": stage.calls,
+                "items": stage.items,
+                "ms_per_item": round(1000 * stage.seconds / stage.items, 3) if stage.items else None,
+                "rss_mb": round(stage.rss_mb, 1) if stage.rss_mb is not None else None,
+            }
+            for stage in list(self._stages.values())
+        ]
+
+    def to_record(self):
+        return {
+            "job": self.job,
+            **self.labels,
+            "wall_seconds": round(time.perf_counter() - self._started, 4),
+            "process_peak_rss_mb": (round(self.process_peak_rss_mb, 1)
+                                    if self.process_peak_rss_mb is not None else None),
+            "stages": self.rows(),
+        }
+
+    def emit(self):
+        """
+        Log the job's record as one JSON line on the "fitsmart.metrics" logger.
+        """
+        if self.enabled and logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(self.to_record()))
+
+
+NULL_METRICS = Metrics("disabled", enabled=False)
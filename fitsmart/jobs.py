@@ -0,0 +1,195 @@
+"""
+A local background queue for video analysis jobs.
+
+    queue = JobQueue(max_workers=2, max_queued=16)
+    job = queue.submit(key, analyze, video_path)   # returns at once; the same key is not run twice
+    queue.get(job.id).status, job.progress, queue.position(job)
+
+Jobs run on a fixed pool of worker threads (analysis spends its time in OpenCV, MediaPipe and
+ffmpeg, which release the GIL). The queue outlives the Streamlit script runs: a page submits
+a job, then polls it on later reruns, and reruns never restart a running analysis.
+"""
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+logger = logging.getLogger("fitsmart.jobs")
+
+# Job states
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# Finished jobs are forgotten after this many seconds
+DEFAULT_RETENTION = 3600
+
+
+class QueueFull(Exception):
+    """
+    Raised by `JobQueue.submit` when `max_queued` jobs are already waiting.
+    """
+
+
+@dataclass
+class Job:
+    id: int
+    key: object
+    status: str = QUEUED
+    progress: float = 0.0
+    result: object = None
+    error: str = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float = None
+    finished_at: float = None
+    # Partial results the job's function publishes while it runs, e.g. a fitsmart.progress.ProgressChannel
+    live: object = None
+    # Cleared when the next submission of the same key should run again, e.g. because a step of
+    # the job failed or its output is gone
+    reusable: bool = True
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def report(self, fraction):
+        """
+        Progress callback for the job's function (0.0 - 1.0).
+        """
+        self.progress = fraction
+
+
+# Whether a later submission of the same key may return this job instead of running again
+def _reusable(job):
+    return job is not None and job.status != FAILED and job.reusable
+
+
+class JobQueue:
+    """
+    Runs submitted functions on `max_workers` threads, at most `max_queued` waiting at a time.
+    """
+
+    def __init__(self, max_workers=2, max_queued=16, retention=DEFAULT_RETENTION):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.retention = retention
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fitsmart-job")
+        self._ids = itertools.count(1)
+        self._jobs = {}
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, func, *args, on_finish=None, **kwargs):
+        """
+        Queue `func(job, *args, **kwargs)` and return its `Job`.
+
+        A job with the same `key` that is queued, running or done is returned instead of running
+        `func` again; failed and no longer `reusable` jobs are run again. `on_finish(job)` runs
+        only if this call queued the job. Raises `QueueFull` when the queue is at its depth limit.
+        """
+        return self.submit_or_join(key, func, *args, on_finish=on_finish, **kwargs)[0]
+
+    def submit_or_join(self, key, func, *args, on_finish=None, **kwargs):
+        """
+        Same as `submit`, but returns (job, queued): whether this call queued the job or
+        joined one submitted before.
+        """
+        with self._lock:
+            self._expire()
+            existing = self._jobs.get(self._by_key.get(key))
+            if _reusable(existing):
+                return existing, False
+            if sum(job.status == QUEUED for job in self._jobs.values()) >= self.max_queued:
+                raise QueueFull(f"{self.max_queued} videos are already waiting")
+            job = Job(next(self._ids), key)
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+        self._pool.submit(self._run, job, func, args, kwargs, on_finish)
+        return job, True
+
+    def _run(self, job, func, args, kwargs, on_finish):
+        job.started_at = time.time()
+        job.status = RUNNING
+        try:
+            result = func(job, *args, **kwargs)
+            status, error = DONE, None
+        except Exception as e:
+            result, status, error = None, FAILED, str(e) or type(e).__name__
+        # Finished jobs always have a finish time, so `_expire` can compare it
+        with self._lock:
+            job.result, job.error = result, error
+            if status == DONE:
+                job.progress = 1.0
+            job.finished_at = time.time()
+            job.status = status
+        if on_finish is not None:
+            try:
+                on_finish(job)
+            except Exception:
+                logger.exception("on_finish of job %s failed", job.id)
+
+    def find(self, key):
+        """
+        The queued, running or done job submitted with `key` that may be reused, or None.
+        """
+        with self._lock:
+            job = self._jobs.get(self._by_key.get(key))
+            return job if _reusable(job) else None
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def position(self, job):
+        """
+        Number of queued jobs submitted before `job` (0 when it is next or already running).
+        """
+        with self._lock:
+            return sum(other.status == QUEUED and other.id < job.id for other in self._jobs.values())
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {status: sum(job.status == status for job in jobs) for status in (QUEUED, RUNNING, DONE, FAILED)}
+
+    def _expire(self):
+        now = time.time()
+        for job in [job for job in self._jobs.values() if job.finished_at is not None and now - job.finished_at > self.retention]:
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) == job.id:
+                del self._by_key[job.key]
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+class OnceLog:
+    """
+    Keys of side effects that must happen only once, remembered for `retention` seconds.
+
+        if log.claim(key):      # False if the key was claimed before
+            try:
+                record()
+            except Exception:
+                log.release(key)  # let a later attempt retry
+                raise
+    """
+
+    def __init__(self, retention=DEFAULT_RETENTION):
+        self.retention = retention
+        self._claimed = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key):
+        now = time.time()
+        with self._lock:
+            for old in [old for old, at in self._claimed.items() if now - at > self.retention]:
+                del self._claimed[old]
+            if key in self._claimed:
+                return False
+            self._claimed[key] = now
+            return True
+
+    def release(self, key):
+        with self._lock:
+            self._claimed.pop(key, None)
@@ -0,0 +1,226 @@
+"""
+In-memory leaderboard index over the rollup buckets of `fitsmart.storage`.
+
+    index = shared_index(rollups)
+    index.top("Last 7 days", "total_count", 10)
+    index.rank("Last 7 days", "total_count", "ana")
+
+For every timeframe the index keeps each user's totals over the timeframe's buckets and a
+sorted list of their scores per metric. As time passes the windows slide: buckets leaving a
+window are subtracted, buckets entering it are added. New workouts are added to every
+window they fall in, unless the index was loaded after they were written. Top-K queries select with a heap and rank lookups bisect the sorted
+scores, so neither sorts all users.
+"""
+import bisect
+import datetime
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.dynamodb.conditions import Key
+
+from fitsmart.storage import TIMEFRAMES, hour_bucket, query_all, timeframe_buckets, workout_buckets
+
+# Leaderboard metrics: squats, push-ups, or both combined
+METRICS = ("squat_count", "pushup_count", "total_count")
+
+# Rollup buckets queried in parallel when the index is built
+LOAD_THREADS = 8
+
+
+# Score of a user's [squats, push-ups, workouts] totals for a metric
+def _score(counts, metric):
+    if metric == "squat_count":
+        return counts[0]
+    if metric == "pushup_count":
+        return counts[1]
+    return counts[0] + counts[1]
+
+
+class _Window:
+    __slots__ = ("buckets", "totals", "scores")
+
+    def __init__(self):
+        self.buckets = set()
+        self.totals = {}
+        self.scores = {metric: [] for metric in METRICS}
+
+
+class LeaderboardIndex:
+    """
+    Per-user totals of every timeframe, maintained incrementally; safe to share between threads.
+    """
+
+    def __init__(self, timeframes=TIMEFRAMES, now=None):
+        # Wall-clock time the rollups were loaded from (see build_index); None for an empty index
+        self.built_at = None
+        self._buckets = {}
+        self._windows = {timeframe: _Window() for timeframe in timeframes}
+        self._hour = None
+        self._lock = threading.RLock()
+        self.advance(now)
+
+    def advance(self, now=None):
+        """
+        Slide every window to `now` (default: the current time); a no-op within the same hour.
+        """
+        now = now or datetime.datetime.now()
+        hour = hour_bucket(now)
+        with self._lock:
+            if hour == self._hour:
+                return
+            for timeframe, window in self._windows.items():
+                buckets = set(timeframe_buckets(timeframe, now))
+                for bucket in window.buckets - buckets:
+                    self._apply_bucket(window, bucket, -1)
+                for bucket in buckets - window.buckets:
+                    self._apply_bucket(window, bucket, 1)
+                window.buckets = buckets
+            live = set().union(*(window.buckets for window in self._windows.values()))
+            for bucket in [bucket for bucket in self._buckets if bucket not in live]:
+                del self._buckets[bucket]
+            self._hour = hour
+
+    def add(self, bucket, username, squats, pushups, workouts=1):
+        """
+        Add rollup counts of `username` in `bucket` to the bucket and the windows covering it.
+        """
+        with self._lock:
+            counts = self._buckets.setdefault(bucket, {}).setdefault(username, [0, 0, 0])
+            counts[0] += squats
+            counts[1] += pushups
+            counts[2] += workouts
+            for window in self._windows.values():
+                if bucket in window.buckets:
+                    self._apply_user(window, username, (squats, pushups, workouts))
+
+    def record(self, username, datetime_text, squats, pushups, written_at=None):
+        """
+        Add one newly recorded workout, as `fitsmart.storage.record_workout` does to the rollups.
+
+        `written_at` is the time.time() at which its rollups were written; a workout written
+        before the index was loaded is already counted, so it is skipped (returns False).
+        """
+        if written_at is not None and self.built_at is not None and written_at < self.built_at:
+            return False
+        with self._lock:
+            self.advance()
+            for bucket in workout_buckets(datetime_text):
+                self.add(bucket, username, squats, pushups)
+        return True
+
+    def _apply_bucket(self, window, bucket, sign):
+        for username, counts in self._buckets.get(bucket, {}).items():
+            self._apply_user(window, username, [sign * count for count in counts])
+
+    @staticmethod
+    def _apply_user(window, username, delta):
+        old = window.totals.get(username)
+        new = [a + b for a, b in zip(old or (0, 0, 0), delta)]
+        for metric in METRICS:
+            scores = window.scores[metric]
+            if old is not None:
+                del scores[bisect.bisect_left(scores, _score(old, metric))]
+            if new[2] > 0:
+                bisect.insort(scores, _score(new, metric))
+        if new[2] > 0:
+            window.totals[username] = new
+        else:
+            window.totals.pop(username, None)
+
+    def top(self, timeframe, metric="total_count", k=10, now=None):
+        """
+        The `k` best users of a timeframe by `metric`, as dicts with rank, username and counts.
+        """
+        self.advance(now)
+        with self._lock:
+            best = heapq.nsmallest(k, self._windows[timeframe].totals.items(),
+                                   key=lambda item: (-_score(item[1], metric), item[0]))
+        return [
+            {"rank": rank, "username": username, "total_count": counts[0] + counts[1],
+             "squat_count": counts[0], "pushup_count": counts[1]}
+            for rank, (username, counts) in enumerate(best, start=1)
+        ]
+
+    def rank(self, timeframe, metric, username, now=None):
+        """
+        (rank, number of ranked users) of `username`, or None if they have no workouts in the timeframe.
+
+        Users with equal scores share a rank.
+        """
+        self.advance(now)
+        with self._lock:
+            window = self._windows[timeframe]
+            counts = window.totals.get(username)
+            if counts is None:
+                return None
+            scores = window.scores[metric]
+            return len(scores) - bisect.bisect_right(scores, _score(counts, metric)) + 1, len(scores)
+
+    def size(self, timeframe):
+        with self._lock:
+            return len(self._windows[timeframe].totals)
+
+
+def build_index(rollups, now=None):
+    """
+    A leaderboard index loaded from the rollup buckets covered by any timeframe.
+    """
+    now = now or datetime.datetime.now()
+    index = LeaderboardIndex(now=now)
+    index.built_at = time.time()
+    buckets = sorted({bucket for timeframe in TIMEFRAMES for bucket in timeframe_buckets(timeframe, now)})
+
+    def load(bucket):
+        return bucket, list(query_all(rollups, KeyConditionExpression=Key("bucket").eq(bucket)))
+
+    with ThreadPoolExecutor(max_workers=LOAD_THREADS) as pool:
+        for bucket, items in pool.map(load, buckets):
+            for item in items:
+                index.add(bucket, item["username"], int(item.get("squat_count", 0)),
+                          int(item.get("pushup_count", 0)), int(item.get("workouts", 1)))
+    return index
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+# One lock per rollup table, held while its index is rebuilt (not while it is read)
+_build_locks = {}
+
+
+# The shared (monotonic build time, index) of a rollup table if younger than `max_age` seconds
+def _fresh(rollups, max_age):
+    with _shared_lock:
+        entry = _shared.get(id(rollups))
+    if entry is not None and time.monotonic() - entry[0] <= max_age:
+        return entry
+    return None
+
+
+def shared_index(rollups, max_age=300, create=True):
+    """
+    The process-wide index of a rollup table, rebuilt from the rollups when older than `max_age`
+    seconds (e.g. to pick up workouts recorded by other server processes).
+
+    With `create` off, returns the current index or None without loading anything. A rebuild
+    only blocks other callers that need a fresh index; the new index replaces the old one
+    once it is loaded, and the old one keeps serving until then.
+    """
+    if not create:
+        with _shared_lock:
+            entry = _shared.get(id(rollups))
+        return entry[1] if entry else None
+    entry = _fresh(rollups, max_age)
+    if entry is not None:
+        return entry[1]
+    with _shared_lock:
+        build_lock = _build_locks.setdefault(id(rollups), threading.Lock())
+    with build_lock:
+        # Another caller may have rebuilt it while this one waited
+        entry = _fresh(rollups, max_age)
+        if entry is None:
+            entry = (time.monotonic(), build_index(rollups))
+            with _shared_lock:
+                _shared[id(rollups)] = entry
+        return entry[1]
@@ -0,0 +1,466 @@
+"""
+Local stand-ins for a boto3 DynamoDB `Table`, for tests, development and load tests.
+
+    workouts = InMemoryTable("exercise_records", "username", "datetime")
+    rollups = SQLiteTable("fitsmart.db", "exercise_records_rollups", "bucket", "username")
+    record_workout(workouts, rollups, "ana", "2025-03-14 09:30:00.000", 20, 10)
+
+Both implement the subset of the Table API that `fitsmart.storage` uses: put/get/delete,
+`update_item` with ADD and SET clauses, `query` and `scan` with boto3 `Key`/`Attr`
+conditions, `Limit`/`ExclusiveStartKey` pagination, parallel scan segments,
+`ProjectionExpression` and `batch_writer`. Numbers are stored as `Decimal`, like DynamoDB
+returns them. `page_size` caps the items per response to exercise pagination without a
+megabyte of data.
+"""
+import abc
+import bisect
+import copy
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+from decimal import Decimal
+from operator import itemgetter
+
+# Keys an in-memory read takes from the sorted key list under the lock at a time
+_CHUNK_SIZE = 256
+
+
+class LocalTable(abc.ABC):
+    """
+    The Table API on top of a few storage primitives implemented by subclasses.
+    """
+
+    def __init__(self, name, partition_key, sort_key=None, page_size=None):
+        self.name = name
+        self.partition_key = partition_key
+        self.sort_key = sort_key
+        self.page_size = page_size
+        self.requests = 0
+        self._requests_lock = threading.Lock()
+
+    # ---- storage primitives ----
+
+    @abc.abstractmethod
+    def _locked(self):
+        """
+        Context manager making a read-modify-write atomic.
+        """
+
+    @abc.abstractmethod
+    def _load(self, key):
+        """
+        The item stored under the key tuple `key`, or None.
+        """
+
+    @abc.abstractmethod
+    def _save(self, key, item):
+        """
+        Store `item` under the key tuple `key` (called inside `_locked`).
+        """
+
+    @abc.abstractmethod
+    def _remove(self, key):
+        """
+        Delete the item stored under `key`, if any (called inside `_locked`).
+        """
+
+    @abc.abstractmethod
+    def _ordered(self, partition_value=None, after=None, reverse=False, segment=None):
+        """
+        Iterate over the items of one partition (or of the whole table for None) in key order,
+        descending if `reverse`, starting after the key tuple `after` and keeping only those of
+        the scan `segment` (Segment, TotalSegments), if given.
+        """
+
+    # ---- keys and values ----
+
+    def _key_names(self):
+        return (self.partition_key,) if self.sort_key is None else (self.partition_key, self.sort_key)
+
+    def _key(self, item):
+        try:
+            return tuple(item[name] for name in self._key_names())
+        except KeyError as e:
+            raise ValueError(f"Missing key attribute {e.args[0]!r} for table {self.name}") from None
+
+    def _key_dict(self, item):
+        return dict(zip(self._key_names(), self._key(item)))
+
+    @staticmethod
+    def _store_value(value):
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, int):
+            return Decimal(value)
+        if isinstance(value, float):
+            raise TypeError("Float types are not supported. Use Decimal types instead.")
+        if isinstance(value, dict):
+            return {k: LocalTable._store_value(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [LocalTable._store_value(v) for v in value]
+        return value
+
+    def _count_request(self):
+        with self._requests_lock:
+            self.requests += 1
+
+    # ---- single items ----
+
+    def put_item(self, Item, **kwargs):
+        self._count_request()
+        item = {name: self._store_value(value) for name, value in Item.items()}
+        with self._locked():
+            self._save(self._key(item), item)
+        return {}
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        self._count_request()
+        item = self._load(self._key(Key))
+        if item is None:
+            return {}
+        return {"Item": _project(item, ProjectionExpression, ExpressionAttributeNames)}
+
+    def delete_item(self, Key, **kwargs):
+        self._count_request()
+        with self._locked():
+            self._remove(self._key(Key))
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues=None, ExpressionAttributeNames=None,
+                    ReturnValues="NONE", **kwargs):
+        self._count_request()
+        values = ExpressionAttributeValues or {}
+        names = ExpressionAttributeNames or {}
+        key = self._key(Key)
+        with self._locked():
+            item = self._load(key)
+            if item is None:
+                item = {name: self._store_value(value) for name, value in Key.items()}
+            for action, name, value in _parse_update(UpdateExpression):
+                name = names.get(name, name)
+                value = self._store_value(values[value])
+                if action == "SET" or name not in item:
+                    item[name] = value
+                else:
+                    item[name] = item[name] + value
+            self._save(key, item)
+        if ReturnValues == "ALL_NEW":
+            return {"Attributes": item}
+        return {}
+
+    @contextmanager
+    def batch_writer(self, overwrite_by_pkeys=None):
+        yield self
+
+    # ---- reads ----
+
+    def query(self, KeyConditionExpression, FilterExpression=None, ProjectionExpression=None,
+              ExpressionAttributeNames=None, Limit=None, ExclusiveStartKey=None, ScanIndexForward=True,
+              Select=None, **kwargs):
+        self._count_request()
+        partition_value = _equality(KeyConditionExpression, self.partition_key)
+        if partition_value is None:
+            raise ValueError(f"Query key condition must fix the partition key {self.partition_key!r}")
+        items = self._ordered(self._store_value(partition_value), self._start(ExclusiveStartKey),
+                              reverse=not ScanIndexForward)
+        candidates = (item for item in items if _evaluate(KeyConditionExpression, item))
+        return self._page(candidates, FilterExpression, ProjectionExpression, ExpressionAttributeNames,
+                          Limit, Select)
+
+    def scan(self, FilterExpression=None, ProjectionExpression=None, ExpressionAttributeNames=None, Limit=None,
+             ExclusiveStartKey=None, Segment=None, TotalSegments=None, Select=None, **kwargs):
+        self._count_request()
+        segment = (Segment, TotalSegments) if TotalSegments else None
+        candidates = self._ordered(after=self._start(ExclusiveStartKey), segment=segment)
+        return self._page(candidates, FilterExpression, ProjectionExpression, ExpressionAttributeNames,
+                          Limit, Select)
+
+    # Key tuple a paginated read resumes after (None for the first page)
+    def _start(self, start_key):
+        return self._key(self._store_value(start_key)) if start_key is not None else None
+
+    def _page(self, candidates, filter_expression, projection, attribute_names, limit, select):
+        limits = [n for n in (limit, self.page_size) if n]
+        page_limit = min(limits) if limits else None
+        # One item past the page tells whether there is a next one
+        candidates = list(itertools.islice(candidates, page_limit + 1) if page_limit else candidates)
+        evaluated = candidates[:page_limit] if page_limit else candidates
+
+        items = [item for item in evaluated if filter_expression is None or _evaluate(filter_expression, item)]
+        response = {"Count": len(items), "ScannedCount": len(evaluated)}
+        if select != "COUNT":
+            response["Items"] = [_project(item, projection, attribute_names) for item in items]
+        if page_limit and len(candidates) > page_limit:
+            response["LastEvaluatedKey"] = self._key_dict(evaluated[-1])
+        return response
+
+    def __len__(self):
+        return sum(1 for _ in self._ordered())
+
+
+class InMemoryTable(LocalTable):
+    """
+    One table held in a dict, with its keys in a sorted list; safe to use from several threads.
+    """
+
+    def __init__(self, name, partition_key, sort_key=None, page_size=None):
+        super().__init__(name, partition_key, sort_key, page_size)
+        self._items = {}
+        self._keys = []
+        self._lock = threading.RLock()
+
+    def _locked(self):
+        return self._lock
+
+    def _load(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            return copy.deepcopy(item) if item is not None else None
+
+    def _save(self, key, item):
+        if key not in self._items:
+            bisect.insort(self._keys, key)
+        self._items[key] = copy.deepcopy(item)
+
+    def _remove(self, key):
+        if self._items.pop(key, None) is not None:
+            del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def _ordered(self, partition_value=None, after=None, reverse=False, segment=None):
+        # Stored items are replaced, never changed in place, so they are copied outside the lock
+        while True:
+            with self._lock:
+                chunk = [(key, self._items[key]) for key in self._chunk(partition_value, after, reverse)]
+            if not chunk:
+                return
+            for key, item in chunk:
+                if partition_value is not None and key[0] != partition_value:
+                    return
+                if segment is None or _segment(key[0], segment[1]) == segment[0]:
+                    yield copy.deepcopy(item)
+            after = chunk[-1][0]
+
+    # The next (up to) _CHUNK_SIZE keys in the direction of the read
+    def _chunk(self, partition_value, after, reverse):
+        first = itemgetter(0)
+        if reverse:
+            if after is not None:
+                end = bisect.bisect_left(self._keys, after)
+            elif partition_value is not None:
+                end = bisect.bisect_right(self._keys, partition_value, key=first)
+            else:
+                end = len(self._keys)
+            return self._keys[max(0, end - _CHUNK_SIZE):end][::-1]
+        if after is not None:
+            start = bisect.bisect_right(self._keys, after)
+        elif partition_value is not None:
+            start = bisect.bisect_left(self._keys, partition_value, key=first)
+        else:
+            start = 0
+        return self._keys[start:start + _CHUNK_SIZE]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+
+class SQLiteTable(LocalTable):
+    """
+    One table stored in an SQLite database file, shared by threads and processes.
+
+    Items are kept as JSON next to their key attributes, which are stored as SQLite text or
+    numbers so keys sort like in DynamoDB; each thread uses its own connection, and the
+    database runs in WAL mode so readers never block the writer.
+    """
+
+    def __init__(self, path, name, partition_key, sort_key=None, page_size=None, timeout=30):
+        super().__init__(name, partition_key, sort_key, page_size)
+        if not re.fullmatch(r"[A-Za-z0-9_.-]+", name):
+            raise ValueError(f"Invalid table name {name!r}")
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connection() as db:
+            db.execute(f'CREATE TABLE IF NOT EXISTS "{name}" '
+                       "(pk NOT NULL, sk NOT NULL, item TEXT NOT NULL, PRIMARY KEY (pk, sk))")
+
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.create_function("fitsmart_segment", 2, _segment, deterministic=True)
+            self._local.db = db
+            self._local.depth = 0
+        return db
+
+    @contextmanager
+    def _locked(self):
+        db = self._connection()
+        # Nested use (e.g. update_item's read and write) joins the outer transaction
+        if self._local.depth == 0:
+            db.execute("BEGIN IMMEDIATE")
+        self._local.depth += 1
+        try:
+            yield db
+        except BaseException:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                db.execute("ROLLBACK")
+            raise
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            db.execute("COMMIT")
+
+    @staticmethod
+    def _column(value):
+        # Key columns have no type affinity: numbers are stored as INTEGER/REAL and sort
+        # numerically (negative ones included), strings as TEXT
+        return _plain(value) if isinstance(value, Decimal) else str(value)
+
+    def _columns(self, key):
+        return self._column(key[0]), self._column(key[1]) if len(key) > 1 else ""
+
+    def _load(self, key):
+        row = self._connection().execute(f'SELECT item FROM "{self.name}" WHERE pk = ? AND sk = ?',
+                                         self._columns(key)).fetchone()
+        return _decode(row[0]) if row else None
+
+    def _save(self, key, item):
+        self._connection().execute(f'INSERT OR REPLACE INTO "{self.name}" (pk, sk, item) VALUES (?, ?, ?)',
+                                   (*self._columns(key), _encode(item)))
+
+    def _remove(self, key):
+        self._connection().execute(f'DELETE FROM "{self.name}" WHERE pk = ? AND sk = ?', self._columns(key))
+
+    def _ordered(self, partition_value=None, after=None, reverse=False, segment=None):
+        # Rows are read lazily from the primary key index, so a page decodes only the items it returns
+        clauses, params = [], []
+        if partition_value is not None:
+            clauses.append("pk = ?")
+            params.append(self._column(partition_value))
+        if after is not None:
+            clauses.append("(pk, sk) < (?, ?)" if reverse else "(pk, sk) > (?, ?)")
+            params.extend(self._columns(after))
+        if segment is not None:
+            clauses.append("fitsmart_segment(pk, ?) = ?")
+            params.extend((segment[1], segment[0]))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = " DESC" if reverse else ""
+        rows = self._connection().execute(f'SELECT item FROM "{self.name}"{where} ORDER BY pk{order}, sk{order}',
+                                          params)
+        for item, in rows:
+            yield _decode(item)
+
+    def __len__(self):
+        return self._connection().execute(f'SELECT COUNT(*) FROM "{self.name}"').fetchone()[0]
+
+
+# A stored Decimal as the int or float it holds
+def _plain(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+def _encode(item):
+    return json.dumps(item, default=_plain)
+
+def _decode(text):
+    return json.loads(text, parse_int=Decimal, parse_float=Decimal)
+
+# Project an item onto a comma-separated ProjectionExpression
+def _project(item, projection, attribute_names):
+    if not projection:
+        return copy.deepcopy(item)
+    names = [(attribute_names or {}).get(name.strip(), name.strip()) for name in projection.split(",")]
+    return {name: copy.deepcopy(item[name]) for name in names if name in item}
+
+# Stable segment of a partition key for parallel scans (also called from SQLite on the pk column)
+def _segment(partition_value, total_segments):
+    return zlib.crc32(repr(_plain(partition_value)).encode()) % total_segments
+
+
+_UPDATE_CLAUSE = re.compile(r"\b(SET|ADD)\b", re.IGNORECASE)
+
+
+# (action, attribute, value placeholder) for each clause of an "ADD a :x, b :y SET c = :z" expression
+def _parse_update(expression):
+    parts = _UPDATE_CLAUSE.split(expression)
+    if parts[0].strip():
+        raise NotImplementedError(f"Unsupported update expression: {expression}")
+    actions = []
+    for action, body in zip(parts[1::2], parts[2::2]):
+        action = action.upper()
+        for clause in body.split(","):
+            tokens = clause.replace("=", " ").split()
+            if len(tokens) != 2 or not tokens[1].startswith(":"):
+                raise NotImplementedError(f"Unsupported update clause: {clause.strip()}")
+            actions.append((action, tokens[0], tokens[1]))
+    return actions
+
+
+# The value `name` is compared to with "=" in a key condition (None if it isn't fixed)
+def _equality(condition, name):
+    expression = condition.get_expression()
+    if expression["operator"] == "AND":
+        for value in expression["values"]:
+            found = _equality(value, name)
+            if found is not None:
+                return found
+        return None
+    if expression["operator"] == "=" and expression["values"][0].name == name:
+        return expression["values"][1]
+    return None
+
+
+def _evaluate(condition, item):
+    """
+    Evaluate a boto3 `Key`/`Attr` condition against a stored item.
+    """
+    expression = condition.get_expression()
+    operator, values = expression["operator"], expression["values"]
+    if operator == "AND":
+        return all(_evaluate(value, item) for value in values)
+    if operator == "OR":
+        return any(_evaluate(value, item) for value in values)
+    if operator == "NOT":
+        return not _evaluate(values[0], item)
+
+    name = values[0].name
+    if operator == "attribute_exists":
+        return name in item
+    if operator == "attribute_not_exists":
+        return name not in item
+    if name not in item:
+        return False
+    actual = item[name]
+    operands = [LocalTable._store_value(value) for value in values[1:]]
+    if operator == "=":
+        return actual == operands[0]
+    if operator == "<>":
+        return actual != operands[0]
+    if operator == "<":
+        return actual < operands[0]
+    if operator == "<=":
+        return actual <= operands[0]
+    if operator == ">":
+        return actual > operands[0]
+    if operator == ">=":
+        return actual >= operands[0]
+    if operator == "BETWEEN":
+        return operands[0] <= actual <= operands[1]
+    if operator == "begins_with":
+        return isinstance(actual, str) and actual.startswith(operands[0])
+    if operator == "contains":
+        return operands[0] in actual
+    if operator == "IN":
+        return actual in operands[0]
+    raise NotImplementedError(f"Unsupported condition operator {operator!r}")
@@ -0,0 +1,238 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+import cv2
+
+from fitsmart.analysis import annotate_frame, extract_keypoints, landmarks_to_array
+from fitsmart.features import RepCounter
+from fitsmart.instrument import NULL_METRICS
+from fitsmart.video import FFmpegFrameReader, prepare_frame
+
+# Only every FRAME_SKIP-th frame is analyzed
+FRAME_SKIP = 3
+
+# Frame decoders: OpenCV decodes full frames and drops the skipped ones afterwards, "ffmpeg"
+# lets ffmpeg select, rotate and scale the sampled frames (see fitsmart.video.FFmpegFrameReader)
+DECODERS = ("opencv", "ffmpeg")
+
+# Maximum number of frames waiting between two pipeline stages
+QUEUE_SIZE = 8
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+# Decode the video and yield (frame_count, frame) for every sampled frame, oriented and resized.
+# `start` and `stop` limit decoding to the frames [start, stop) of the video.
+def iter_frames(cap, recorded_on_android=False, frame_skip=FRAME_SKIP, start=0, stop=None):
+    frame_count = start
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    while cap.isOpened() and (stop is None or frame_count < stop):
+        # Skipped frames are only grabbed, never converted to BGR arrays
+        if frame_count % frame_skip != 0:
+            if not cap.grab():
+                break
+            frame_count += 1
+            continue
+
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame_count += 1
+        yield frame_count, prepare_frame(frame, recorded_on_android)
+
+# Decode the video and yield (frame_count, frame) for every frame; the frames whose 0-based index
+# `wanted` rejects are only grabbed and come as None. `wanted` is asked right before each frame.
+def iter_wanted_frames(cap, wanted, recorded_on_android=False):
+    frame_count = 0
+    while cap.isOpened():
+        if not wanted(frame_count):
+            if not cap.grab():
+                break
+            frame_count += 1
+            yield frame_count, None
+            continue
+
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame_count += 1
+        yield frame_count, prepare_frame(frame, recorded_on_android)
+
+# Every frame of an ffmpeg reader, None where `wanted` rejects its 0-based index
+def _keep_wanted(frames, wanted):
+    for frame_count, frame in frames:
+        yield frame_count, frame if wanted(frame_count - 1) else None
+
+
+@contextmanager
+def open_frames(video_path, recorded_on_android=False, decoder="opencv", start=0, stop=None, wanted=None):
+    """
+    Open a video and yield an iterator of (frame_count, frame) for its sampled frames,
+    oriented and resized, as produced by `iter_frames`.
+
+    With `wanted`, every frame of the whole video is yielded instead, as None unless
+    `wanted(index)` holds for its 0-based index (see `iter_wanted_frames`); OpenCV then only
+    grabs the other frames, ffmpeg decodes them all at analysis size.
+    """
+    if decoder == "ffmpeg":
+        if wanted is not None:
+            reader = FFmpegFrameReader(video_path, recorded_on_android, 1)
+        else:
+            reader = FFmpegFrameReader(video_path, recorded_on_android, FRAME_SKIP, start=start, stop=stop)
+        try:
+            yield iter(reader) if wanted is None else _keep_wanted(reader, wanted)
+        finally:
+            reader.close()
+    elif decoder == "opencv":
+        cap = cv2.VideoCapture(video_path)
+        try:
+            if wanted is not None:
+                yield iter_wanted_frames(cap, wanted, recorded_on_android)
+            else:
+                yield iter_frames(cap, recorded_on_android, start=start, stop=stop)
+        finally:
+            cap.release()
+    else:
+        raise ValueError(f"Unknown decoder {decoder!r}, expected one of {DECODERS}")
+
+# Run pose inference on a prepared BGR frame
+def infer_pose(pose, frame):
+    image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    results = pose.process(image)
+    return results.pose_landmarks
+
+# Advance the rep state and, when `draw` is set, annotate the frame in place
+def render_frame(frame, pose_landmarks, counter, draw=True):
+    if pose_landmarks:
+        exercise = counter.update(extract_keypoints(pose_landmarks))
+        if draw:
+            annotate_frame(frame, pose_landmarks, exercise, counter)
+    return frame
+
+# Pass the pose result of a frame to an optional `fitsmart.tracks.TrackRecorder`
+def record_frame(recorder, frame_count, pose_landmarks):
+    if recorder is not None:
+        recorder(frame_count, landmarks_to_array(pose_landmarks) if pose_landmarks else None)
+
+
+def process_sequential(frames, pose, on_frame, counter=None, recorder=None, metrics=NULL_METRICS, draw=True):
+    """
+    Decode, infer and render every sampled frame one after another on the calling thread.
+
+    `frames` yields (frame_count, frame) pairs (see `open_frames`); `on_frame(frame_count, image)`
+    is called for each annotated frame, in order. The landmarks of every frame are passed to
+    `recorder` when given. Decode, pose and draw times are recorded on `metrics`.
+    """
+    counter = counter or RepCounter()
+    for frame_count, frame in metrics.iterate("decode", frames):
+        with metrics.stage("pose"):
+            pose_landmarks = infer_pose(pose, frame)
+        record_frame(recorder, frame_count, pose_landmarks)
+        with metrics.stage("draw"):
+            image = render_frame(frame, pose_landmarks, counter, draw)
+        on_frame(frame_count, image)
+    return counter
+
+
+def process_pipelined(frames, pose, on_frame, counter=None, recorder=None, queue_size=QUEUE_SIZE,
+                      metrics=NULL_METRICS, draw=True):
+    """
+    Same as `process_sequential`, but decoding and pose inference run on their own threads.
+
+    The stages are joined by bounded queues, so at most `queue_size` frames wait between
+    two stages. Rendering, rep counting and `on_frame` stay on the calling thread (Streamlit
+    elements may only be updated from the script thread) and see frames in decode order,
+    so counts are identical to the sequential mode.
+    """
+    counter = counter or RepCounter()
+    decoded = queue.Queue(maxsize=queue_size)
+    inferred = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+
+    def put(q, item):
+        # Give up if the consumer has stopped, instead of blocking forever on a full queue
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(q):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def decode_stage():
+        try:
+            for item in metrics.iterate("decode", frames):
+                if not put(decoded, item):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            put(decoded, _DONE)
+
+    def pose_stage():
+        try:
+            while True:
+                item = get(decoded)
+                if item is _DONE:
+                    break
+                frame_count, frame = item
+                with metrics.stage("pose"):
+                    pose_landmarks = infer_pose(pose, frame)
+                if not put(inferred, (frame_count, frame, pose_landmarks)):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            put(inferred, _DONE)
+
+    threads = [
+        threading.Thread(target=decode_stage, name="fitsmart-decode", daemon=True),
+        threading.Thread(target=pose_stage, name="fitsmart-pose", daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = inferred.get()
+            if item is _DONE:
+                break
+            frame_count, frame, pose_landmarks = item
+            record_frame(recorder, frame_count, pose_landmarks)
+            with metrics.stage("draw"):
+                image = render_frame(frame, pose_landmarks, counter, draw)
+            on_frame(frame_count, image)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    return counter
+
+
+def process_video(frames, pose, on_frame, pipelined=False, counter=None, recorder=None, metrics=NULL_METRICS,
+                  draw=True):
+    """
+    Analyze the sampled frames of a video and return the final `RepCounter`.
+
+    With `draw` off the frames passed to `on_frame` are left unannotated (counts only).
+    """
+    if pipelined:
+        return process_pipelined(frames, pose, on_frame, counter=counter, recorder=recorder, metrics=metrics,
+                                 draw=draw)
+    return process_sequential(frames, pose, on_frame, counter=counter, recorder=recorder, metrics=metrics,
+                              draw=draw)
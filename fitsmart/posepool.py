@@ -0,0 +1,160 @@
+"""
+A process-wide pool of initialized MediaPipe Pose estimators.
+
+    pool = PosePool(size=2, model_complexity=1)
+    pool.warm()                  # load the models up front (optional)
+    with pool.checkout() as pose:
+        pose.process(image)      # returned and reset for the next video on exit
+
+Creating a `Pose` loads and initializes its model graph, which delays the first frame of
+every video. The pool keeps up to `size` estimators alive and hands them out one job at a
+time; at most `size` exist, so their memory is capped. Between videos an estimator is
+reset, so landmark tracking never carries over from one video to the next.
+"""
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+# MediaPipe Pose model: 0 (lite), 1 (full) or 2 (heavy)
+MODEL_COMPLEXITIES = (0, 1, 2)
+DEFAULT_MODEL_COMPLEXITY = 1
+
+# Seconds between checks for a free estimator while all are in use
+ACQUIRE_POLL = 0.1
+
+
+class PosePool:
+    """
+    Up to `size` reusable `mp_pose.Pose` estimators; safe to share between threads.
+    """
+
+    def __init__(self, size=1, model_complexity=DEFAULT_MODEL_COMPLEXITY, min_detection_confidence=0.5,
+                 min_tracking_confidence=0.5):
+        if model_complexity not in MODEL_COMPLEXITIES:
+            raise ValueError(f"Unknown model complexity {model_complexity!r}, expected one of {MODEL_COMPLEXITIES}")
+        self.size = max(1, size)
+        self.model_complexity = model_complexity
+        self.min_detection_confidence = min_detection_confidence
+        self.min_tracking_confidence = min_tracking_confidence
+        self.created = 0
+        self.checkouts = 0
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def _create(self):
+        # MediaPipe is imported with the first estimator, so creating a pool costs nothing
+        from fitsmart.analysis import mp_pose
+
+        return mp_pose.Pose(model_complexity=self.model_complexity,
+                            min_detection_confidence=self.min_detection_confidence,
+                            min_tracking_confidence=self.min_tracking_confidence)
+
+    def warm(self, count=None):
+        """
+        Create idle estimators until `count` (default: `size`) exist.
+        """
+        count = min(self.size, self.size if count is None else count)
+        while True:
+            with self._lock:
+                if self.created >= count:
+                    return
+                self.created += 1
+            try:
+                pose = self._create()
+            except BaseException:
+                # Give the slot back, or the pool would stay an estimator short for good
+                with self._lock:
+                    self.created -= 1
+                raise
+            self._idle.put(pose)
+
+    def _acquire(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                create = self.created < self.size
+                if create:
+                    self.created += 1
+            if create:
+                try:
+                    return self._create()
+                except BaseException:
+                    with self._lock:
+                        self.created -= 1
+                    raise
+            # Every estimator is in use: wait for one to be returned (or discarded)
+            wait = ACQUIRE_POLL if deadline is None else min(ACQUIRE_POLL, deadline - time.monotonic())
+            if wait <= 0:
+                raise queue.Empty
+            try:
+                return self._idle.get(timeout=wait)
+            except queue.Empty:
+                pass
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """
+        An estimator for one video, reset and returned to the pool when the block exits.
+
+        Blocks while all `size` estimators are in use (raises `queue.Empty` after `timeout`
+        seconds). An estimator whose video raised is closed rather than reused.
+        """
+        pose = self._acquire(timeout)
+        with self._lock:
+            self.checkouts += 1
+        try:
+            yield pose
+        except BaseException:
+            self._discard(pose)
+            raise
+        try:
+            # Drop the landmark tracking state of this video
+            pose.reset()
+        except Exception:
+            self._discard(pose)
+            return
+        self._idle.put(pose)
+
+    def _discard(self, pose):
+        with self._lock:
+            self.created -= 1
+        try:
+            pose.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """
+        Close the idle estimators.
+        """
+        while True:
+            try:
+                pose = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(pose)
+
+    def stats(self):
+        with self._lock:
+            return {"size": self.size, "created": self.created, "idle": self._idle.qsize(),
+                    "checkouts": self.checkouts, "model_complexity": self.model_complexity}
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_pose_pool(model_complexity=DEFAULT_MODEL_COMPLEXITY):
+    """
+    A one-estimator pool per model for this process, e.g. for each batch worker of `fitsmart.cli`.
+    """
+    with _shared_lock:
+        pool = _shared.get(model_complexity)
+        if pool is None:
+            pool = _shared[model_complexity] = PosePool(model_complexity=model_complexity)
+        return pool
@@ -0,0 +1,93 @@
+"""
+Live progress of a running analysis: counts so far, the current exercise and a preview.
+
+    channel = ProgressChannel()
+    analyze_video(path, progress=channel)   # the analysis thread calls channel.update(...)
+    snapshot = channel.snapshot()           # the page polls the latest one
+
+The analysis calls `update` for every output frame, but only one snapshot per
+`PUBLISH_INTERVAL` is built (with a small JPEG of the frame); the others return after a
+clock check. Nothing here touches Streamlit: the page polls `snapshot()` at the same
+interval, so the analysis never waits on the UI and a job sends at most one progress
+update and one thumbnail per interval to the browser, however many frames it has.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+
+# Seconds between published snapshots (and between page polls)
+PUBLISH_INTERVAL = 1.0
+# Preview thumbnail width (pixels) and JPEG quality
+THUMBNAIL_WIDTH = 180
+THUMBNAIL_QUALITY = 70
+
+
+@dataclass
+class ProgressSnapshot:
+    """
+    What the analysis had reached when the snapshot was published.
+
+    `counts` maps exercise names to running rep counts (see `fitsmart.rules`), `thumbnail`
+    holds JPEG bytes of the latest output frame (annotated unless counts only), or None.
+    """
+
+    progress: float = 0.0
+    counts: dict = field(default_factory=dict)
+    exercise: str = None
+    thumbnail: bytes = None
+    frames: int = 0
+    elapsed: float = 0.0
+    version: int = 0
+
+
+# A JPEG of `frame` (BGR) scaled down to `width` pixels wide
+def encode_thumbnail(frame, width=THUMBNAIL_WIDTH, quality=THUMBNAIL_QUALITY):
+    import cv2
+
+    height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+    small = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return encoded.tobytes() if ok else None
+
+
+class ProgressChannel:
+    """
+    The latest `ProgressSnapshot` of one analysis; written by one thread, read by any.
+    """
+
+    def __init__(self, interval=PUBLISH_INTERVAL, thumbnail_width=THUMBNAIL_WIDTH):
+        self.interval = interval
+        self.thumbnail_width = thumbnail_width
+        self.started = time.monotonic()
+        self.frames = 0
+        self._next_publish = self.started
+        self._snapshot = ProgressSnapshot()
+        self._lock = threading.Lock()
+
+    def update(self, progress, counts=None, exercise=None, frame=None, force=False):
+        """
+        Report the analysis state after a frame; a snapshot is published at most once per
+        `interval` (or when `force` is set, e.g. for the final counts).
+        """
+        self.frames += 1
+        now = time.monotonic()
+        if not force and now < self._next_publish:
+            return False
+        self._next_publish = now + self.interval
+        thumbnail = encode_thumbnail(frame, self.thumbnail_width) if frame is not None else None
+        with self._lock:
+            previous = self._snapshot
+            self._snapshot = ProgressSnapshot(
+                progress=progress,
+                counts=dict(counts) if counts is not None else previous.counts,
+                exercise=exercise if exercise is not None else previous.exercise,
+                thumbnail=thumbnail if thumbnail is not None else previous.thumbnail,
+                frames=self.frames,
+                elapsed=now - self.started,
+                version=previous.version + 1,
+            )
+        return True
+
+    def snapshot(self):
+        with self._lock:
+            return self._snapshot
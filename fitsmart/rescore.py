@@ -0,0 +1,83 @@
+"""
+Recount the reps of stored workout traces with the current rep logic, without the videos.
+
+    python -m fitsmart.rescore ~/.cache/fitsmart/traces --changed-only --output changes.jsonl
+
+Writes one JSON line per trace with the counts recorded at analysis time and the new ones.
+Traces are memory-mapped and scored in batches of up to --batch-frames frames, each in a
+single vectorized pass, so neither MediaPipe nor OpenCV is loaded. Nothing is written back
+to the workout records.
+"""
+import argparse
+import json
+import sys
+import time
+
+from fitsmart.traces import DEFAULT_TRACE_DIR, TraceStore, read_trace, rescore
+
+# Frames scored per vectorized pass (about 0.5 GB of intermediate arrays)
+DEFAULT_BATCH_FRAMES = 2_000_000
+# Traces memory-mapped at once, well under the usual open-file limit
+MAX_BATCH_TRACES = 256
+
+
+def iter_batches(paths, batch_frames=DEFAULT_BATCH_FRAMES):
+    """
+    Yield lists of (path, trace) holding up to `batch_frames` frames (at least one trace).
+    """
+    batch, frames = [], 0
+    for path in paths:
+        trace = read_trace(path)
+        if batch and (frames + len(trace) > batch_frames or len(batch) >= MAX_BATCH_TRACES):
+            yield batch
+            batch, frames = [], 0
+        batch.append((path, trace))
+        frames += len(trace)
+    if batch:
+        yield batch
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recount squats and push-ups from stored landmark traces.")
+    parser.add_argument("directory", nargs="?", default=DEFAULT_TRACE_DIR,
+                        help=f"trace store directory (default: {DEFAULT_TRACE_DIR})")
+    parser.add_argument("-o", "--output", default="-", help="JSON lines output file (default: stdout)")
+    parser.add_argument("--changed-only", action="store_true", help="only report traces whose counts changed")
+    parser.add_argument("--batch-frames", type=int, default=DEFAULT_BATCH_FRAMES,
+                        help="frames scored per vectorized pass")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    traces = frames = changed = 0
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        for batch in iter_batches(TraceStore(args.directory).paths(), args.batch_frames):
+            for (path, trace), (squats, pushups) in zip(batch, rescore([trace for _, trace in batch])):
+                meta = trace.meta
+                is_changed = (squats, pushups) != (meta.get("squat_count"), meta.get("pushup_count"))
+                traces += 1
+                frames += len(trace)
+                changed += is_changed
+                if is_changed or not args.changed_only:
+                    out.write(json.dumps({
+                        "path": path,
+                        "username": meta.get("username"),
+                        "datetime": meta.get("datetime"),
+                        "frames": len(trace),
+                        "recorded_squat_count": meta.get("squat_count"),
+                        "recorded_pushup_count": meta.get("pushup_count"),
+                        "squat_count": squats,
+                        "pushup_count": pushups,
+                    }) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    seconds = time.perf_counter() - started
+    print(f"Re-scored {traces} traces ({frames} frames) in {seconds:.2f}s "
+          f"({frames / max(seconds, 1e-9) / 1e6:.1f}M frames/s), {changed} changed", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
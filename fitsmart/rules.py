@@ -0,0 +1,374 @@
+"""
+Declarative exercise rules, evaluated over the angles of a whole video at once.
+
+    LUNGE = ExerciseRule("lunge", "Lunges", classify=["stand < 40", "knees > 30"],
+                         down=["knee < 100"], hysteresis=5, min_frames=2)
+    rules = RuleSet([LUNGE] + DEFAULT_RULES.rules)       # before squats, which also stand
+    evaluation = rules.evaluate(points, frame_counts, fps)   # phases, counts and rep events
+    counter = rules.counter()                                # the same rules, frame by frame
+
+Conditions compare a joint angle of `ANGLES` (degrees) with a threshold. A frame belongs to
+the first rule whose `classify` conditions all hold. The phase of that exercise goes "down"
+when all its `down` conditions hold and back "up" only once one of them is missed by more
+than `hysteresis` degrees, so landmarks jittering around a threshold don't flip it back and
+forth. A new phase must also last `min_frames` frames of the exercise before it is taken
+(debounce), and a rep is counted on every down -> up change.
+
+`RuleSet.evaluate` runs a fixed number of numpy operations per rule over all frames, so more
+exercises cost a few array passes rather than per-frame branching. `RuleCounter` applies the
+same rules one frame at a time for the live overlay, with identical results. Only numpy is
+needed.
+"""
+import operator
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from fitsmart.tracks import POSE_LANDMARKS
+
+# Stands for the point one unit above the vertex, for angles against the vertical
+VERTICAL = "VERTICAL"
+
+# Joint angles the rules can use: name -> (point, vertex, point)
+ANGLES = {
+    "torso": ("RIGHT_SHOULDER", "RIGHT_HIP", VERTICAL),
+    "knee": ("RIGHT_HIP", "RIGHT_KNEE", "RIGHT_ANKLE"),
+    "hip": ("RIGHT_KNEE", "RIGHT_HIP", "RIGHT_SHOULDER"),
+    "elbow": ("RIGHT_SHOULDER", "RIGHT_ELBOW", "RIGHT_WRIST"),
+    "stand": ("RIGHT_SHOULDER", "RIGHT_ANKLE", VERTICAL),
+    "knee_shoulder": ("RIGHT_SHOULDER", "RIGHT_KNEE", VERTICAL),
+    "left_knee": ("LEFT_HIP", "LEFT_KNEE", "LEFT_ANKLE"),
+    "left_hip": ("LEFT_KNEE", "LEFT_HIP", "LEFT_SHOULDER"),
+    "left_elbow": ("LEFT_SHOULDER", "LEFT_ELBOW", "LEFT_WRIST"),
+    "knees": ("RIGHT_KNEE", "RIGHT_HIP", "LEFT_KNEE"),
+}
+
+OPERATORS = {"<": operator.lt, ">": operator.gt}
+
+
+# Angle at b (degrees, 0-180) for (frames, 2) arrays of points
+def angle_between(a, b, c):
+    radians = np.arctan2(c[:, 1] - b[:, 1], c[:, 0] - b[:, 0]) - np.arctan2(a[:, 1] - b[:, 1], a[:, 0] - b[:, 0])
+    angle = np.abs(radians * 180.0 / np.pi)
+    return np.where(angle > 180.0, 360 - angle, angle)
+
+
+# Point one unit above p, the vertical reference of the torso, stand and knee/shoulder angles
+def _above(p):
+    return np.stack([p[:, 0], p[:, 1] - 1], axis=1)
+
+
+def _angles_from(points, names):
+    angles = {}
+    for name in names:
+        a, vertex, c = (points[point] if point != VERTICAL else None for point in ANGLES[name])
+        angles[name] = angle_between(a, vertex, _above(vertex) if c is None else c)
+    return angles
+
+
+def _landmarks_of(angle_names):
+    return sorted({point for name in angle_names for point in ANGLES[name] if point != VERTICAL},
+                  key=POSE_LANDMARKS.index)
+
+
+def compute_angles(points, names=tuple(ANGLES)):
+    """
+    The angles `names` for every frame of a (frames, landmarks, 2) x/y array, in one pass.
+
+    Frames without a detected pose (NaN landmarks) get NaN angles.
+    """
+    landmarks = _landmarks_of(names)
+    # Only the landmarks used are gathered and converted, in one pass over the array
+    keypoints = np.take(points, [POSE_LANDMARKS.index(name) for name in landmarks], axis=1)
+    if keypoints.dtype == np.float16:
+        # Exact, and much faster than converting float16 straight to float64
+        keypoints = keypoints.astype(np.float32)
+    # float64 like the per-frame code, so thresholds compare identically
+    keypoints = np.ascontiguousarray(keypoints.transpose(1, 0, 2), dtype=np.float64)
+    return _angles_from(dict(zip(landmarks, keypoints)), names)
+
+
+def frame_angles(keypoints, names=tuple(ANGLES)):
+    """
+    The angles `names` of one frame, from a {landmark name: [x, y]} dict.
+    """
+    points = {name: np.array([keypoints[name]], dtype=np.float64) for name in _landmarks_of(names)}
+    return {name: float(angle[0]) for name, angle in _angles_from(points, names).items()}
+
+
+@dataclass(frozen=True)
+class Condition:
+    """
+    `angle op threshold`, e.g. "knee < 90"; `slack` degrees loosen the threshold.
+    """
+
+    angle: str
+    op: str
+    threshold: float
+
+    @classmethod
+    def parse(cls, text):
+        angle, op, threshold = text.split()
+        if angle not in ANGLES:
+            raise ValueError(f"Unknown angle {angle!r} in {text!r}, expected one of {tuple(ANGLES)}")
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown operator {op!r} in {text!r}, expected one of {tuple(OPERATORS)}")
+        return cls(angle, op, float(threshold))
+
+    def holds(self, angles, slack=0.0):
+        threshold = self.threshold + slack if self.op == "<" else self.threshold - slack
+        return OPERATORS[self.op](angles[self.angle], threshold)
+
+
+@dataclass
+class ExerciseRule:
+    """
+    One exercise: when a frame shows it, when it is "down", and how jitter is filtered.
+
+    `classify` and `down` are condition strings ("angle < degrees" or "angle > degrees")
+    that must all hold. `hysteresis` is how many degrees past its threshold a `down`
+    condition has to fail before the phase goes back "up"; `min_frames` is how many frames
+    of the exercise a new phase must last before it is taken (1 takes it at once).
+    """
+
+    name: str
+    label: str
+    classify: list
+    down: list
+    hysteresis: float = 0.0
+    min_frames: int = 1
+
+    def __post_init__(self):
+        self.classify = [Condition.parse(c) if isinstance(c, str) else c for c in self.classify]
+        self.down = [Condition.parse(c) if isinstance(c, str) else c for c in self.down]
+        self.min_frames = max(1, int(self.min_frames))
+
+    # Whether the "down" phase may start (enter) and may continue (stay) on these angles
+    def phase_conditions(self, angles):
+        enter = np.logical_and.reduce([c.holds(angles) for c in self.down])
+        stay = np.logical_and.reduce([c.holds(angles, self.hysteresis) for c in self.down])
+        return enter, stay
+
+
+@dataclass
+class RepEvent:
+    """
+    A counted rep: the sampled frame `index` where the exercise came back up, its frame
+    number and time in the video (seconds, None without an fps).
+    """
+
+    exercise: str
+    index: int
+    frame_count: int
+    time: float = None
+
+
+@dataclass
+class Evaluation:
+    """
+    Per-frame results of a `RuleSet` over one video.
+
+    `exercise` holds an index into `exercises` (0 is "unknown") for every frame; `down[name]`
+    the phase of each exercise after the frame ("down" when True) and `counts[name]` its
+    running count after the frame. `events` lists the reps in order.
+    """
+
+    exercises: tuple
+    exercise: np.ndarray
+    down: dict
+    counts: dict
+    events: list = field(default_factory=list)
+
+    def count(self, name):
+        counts = self.counts[name]
+        return int(counts[-1]) if len(counts) else 0
+
+    def totals(self):
+        return {name: self.count(name) for name in self.counts}
+
+
+# Take the decisive values (0 or 1) of a sequence and hold them over the undecided ones (-1);
+# every run starting at `starts` begins "up" (0)
+def _hold(decisive, starts):
+    decisive = np.where(starts & (decisive < 0), 0, decisive)
+    last = np.maximum.accumulate(np.where(decisive >= 0, np.arange(len(decisive)), 0))
+    return decisive[last] == 1
+
+
+def _phases(rule, angles, starts):
+    """
+    Confirmed phase ("down" as True) of `rule` over the frames of its exercise.
+
+    `angles` holds the angles of those frames only; `starts` marks the frames that begin a
+    new video (the first one at least), where the phase restarts from "up".
+    """
+    enter, stay = rule.phase_conditions(angles)
+    # Schmitt trigger: go down on enter, up once even the loosened thresholds fail, else hold
+    down = _hold(np.where(enter, 1, np.where(stay, -1, 0)), starts)
+    if rule.min_frames > 1:
+        # Debounce: a phase is only taken once it has lasted min_frames frames
+        positions = np.arange(len(down))
+        changed = starts.copy()
+        changed[1:] |= down[1:] != down[:-1]
+        run_start = np.maximum.accumulate(np.where(changed, positions, 0))
+        settled = positions - run_start >= rule.min_frames - 1
+        down = _hold(np.where(settled, down.astype(np.int8), -1), starts)
+    return down
+
+
+# The "down" angles of a rule at the frames `index`
+def _select(angles, rule, index):
+    return {c.angle: angles[c.angle][index] for c in rule.down}
+
+
+# Down -> up changes of a phase sequence, not across video starts
+def _reps(down, starts):
+    previous = np.concatenate(([False], down[:-1]))
+    previous[starts] = False
+    return previous & ~down
+
+
+class RuleSet:
+    """
+    Exercise rules compiled into one vectorized evaluation; the first matching rule wins.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.names = tuple(rule.name for rule in self.rules)
+        self.exercises = ("unknown",) + self.names
+        conditions = [c for rule in self.rules for c in rule.classify + rule.down]
+        self.angle_names = tuple(dict.fromkeys(c.angle for c in conditions))
+        # Landmarks the rules read, e.g. for `fitsmart.analysis.extract_keypoints`
+        self.landmarks = _landmarks_of(self.angle_names)
+
+    def rule(self, name):
+        return self.rules[self.names.index(name)]
+
+    def thresholds(self):
+        """
+        {angle: threshold} of every "down" condition, e.g. for `fitsmart.sampling`.
+        """
+        return {c.angle: c.threshold for rule in self.rules for c in rule.down}
+
+    def classify(self, angles):
+        """
+        An array of exercise codes (indexes into `exercises`) for arrays of angles.
+        """
+        exercise = np.zeros(len(angles[self.angle_names[0]]), dtype=np.int8)
+        for code, rule in reversed(list(enumerate(self.rules, 1))):
+            matches = np.logical_and.reduce([c.holds(angles) for c in rule.classify])
+            exercise[matches] = code
+        return exercise
+
+    def evaluate(self, points, frame_counts=None, fps=None):
+        """
+        Classification, phases, running counts and rep events for a (frames, landmarks, 2)
+        landmark array; `frame_counts` and `fps` date the events.
+        """
+        angles = compute_angles(points, self.angle_names)
+        exercise = self.classify(angles)
+        frames = len(exercise)
+        frame_counts = np.arange(frames) if frame_counts is None else np.asarray(frame_counts)
+        down, counts, events = {}, {}, []
+        for code, rule in enumerate(self.rules, 1):
+            active = exercise == code
+            active_idx = np.flatnonzero(active)
+            starts = np.zeros(len(active_idx), dtype=bool)
+            starts[:1] = True
+            active_down = _phases(rule, _select(angles, rule, active_idx), starts)
+            reps = _reps(active_down, starts)
+
+            rule_counts = np.zeros(frames, dtype=np.int32)
+            rule_counts[active_idx] = np.cumsum(reps)
+            counts[rule.name] = np.maximum.accumulate(rule_counts)
+            # Carry the phase of the last frame of the exercise forward
+            phases = np.zeros(frames, dtype=bool)
+            phases[active_idx] = active_down
+            down[rule.name] = phases[np.maximum.accumulate(np.where(active, np.arange(frames), 0))]
+
+            for index in active_idx[reps]:
+                frame_count = int(frame_counts[index])
+                events.append(RepEvent(rule.name, int(index), frame_count, frame_count / fps if fps else None))
+        events.sort(key=lambda event: event.index)
+        return Evaluation(self.exercises, exercise, down, counts, events)
+
+    def final_counts(self, points, segments, num_segments):
+        """
+        {exercise: final count of each video} for several videos laid end to end.
+
+        `segments[i]` is the video (0 .. num_segments - 1) of frame i, in non-decreasing
+        order; each video counts as if `evaluate` ran on it alone.
+        """
+        angles = compute_angles(points, self.angle_names)
+        exercise = self.classify(angles)
+        counts = {}
+        for code, rule in enumerate(self.rules, 1):
+            active_idx = np.flatnonzero(exercise == code)
+            active_segments = segments[active_idx]
+            # The first frame of the exercise in each video starts from "up"
+            starts = np.concatenate(([True], active_segments[1:] != active_segments[:-1]))[:len(active_idx)]
+            reps = _reps(_phases(rule, _select(angles, rule, active_idx), starts), starts)
+            counts[rule.name] = np.bincount(active_segments[reps], minlength=num_segments).astype(np.int32)
+        return counts
+
+    def counter(self):
+        return RuleCounter(self)
+
+
+class RuleCounter:
+    """
+    Running state of a `RuleSet` for one video, advanced one frame at a time.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.counts = dict.fromkeys(rules.names, 0)
+        # Confirmed phase of each exercise ("down" as True), the raw phase and how long it has lasted
+        self.down = dict.fromkeys(rules.names, False)
+        self._raw = dict.fromkeys(rules.names, False)
+        self._run = dict.fromkeys(rules.names, 0)
+        # "Down" angles of the last classified frame, e.g. {"knee": 95.2, "hip": 120.4}
+        self.angles = {}
+        # Exercise of the last frame with a pose (None before the first one)
+        self.exercise = None
+
+    def update(self, angles):
+        """
+        Classify a frame from its angles, advance that exercise and return its name.
+        """
+        for rule in self.rules.rules:
+            if all(c.holds(angles) for c in rule.classify):
+                break
+        else:
+            self.angles = {}
+            self.exercise = "unknown"
+            return self.exercise
+
+        name = rule.name
+        enter, stay = rule.phase_conditions(angles)
+        raw = bool(enter or (self._raw[name] and stay))
+        self._run[name] = self._run[name] + 1 if raw == self._raw[name] or not self._run[name] else 1
+        self._raw[name] = raw
+        if self._run[name] >= rule.min_frames and raw != self.down[name]:
+            if self.down[name]:
+                self.counts[name] += 1
+            self.down[name] = raw
+        self.angles = {c.angle: angles[c.angle] for c in rule.down}
+        self.exercise = name
+        return name
+
+    def phase(self, name):
+        return "down" if self.down[name] else "up"
+
+    def totals(self):
+        return dict(self.counts)
+
+
+# Angle thresholds of the app's exercises; the hysteresis and debounce absorb landmark jitter
+DEFAULT_RULES = RuleSet([
+    ExerciseRule("squat", "Squats", classify=["stand < 40"], down=["knee < 90", "hip < 100"],
+                 hysteresis=5, min_frames=2),
+    ExerciseRule("push-up", "Push-Ups", classify=["torso > 45", "hip > 100"],
+                 down=["elbow < 100", "knee_shoulder > 65"], hysteresis=5, min_frames=2),
+])
@@ -0,0 +1,124 @@
+"""
+Adaptive frame sampling: run pose inference only as often as the motion in the video needs.
+
+Instead of analyzing every FRAME_SKIP-th frame, the sampler
+- skips inference while a cheap frame-difference check sees no movement (setting up the
+  phone, resting between sets),
+- samples densely while the tracked joint angles are close to a down/up threshold, where a
+  missed frame could miss a rep, and sparsely while they are far from every threshold.
+Sampling rates are given in Hz, so 30 and 60 fps videos are treated alike.
+"""
+import cv2
+
+from fitsmart.analysis import PHASE_THRESHOLDS, annotate_frame, extract_keypoints
+from fitsmart.features import RepCounter
+from fitsmart.instrument import NULL_METRICS
+from fitsmart.pipeline import FRAME_SKIP, infer_pose, open_frames, record_frame
+from fitsmart.video import video_info
+
+# Sampling rates (inferences per second of video)
+DENSE_HZ = 30       # an angle is within NEAR_DEGREES of its threshold
+NORMAL_HZ = 10      # no exercise recognized yet, or angles in between
+SPARSE_HZ = 5       # every angle is further than FAR_DEGREES from its threshold
+IDLE_HZ = 2         # nothing moves
+
+NEAR_DEGREES = 15
+FAR_DEGREES = 40
+
+# Mean absolute gray-level difference (0-255) below which a frame counts as static
+MOTION_THRESHOLD = 2.0
+# Size of the thumbnail the motion check runs on
+MOTION_THUMBNAIL = (32, 56)
+
+
+class AdaptiveSampler:
+    """
+    Decides, frame by frame, when the next pose inference is due.
+    """
+
+    def __init__(self, fps, motion_threshold=MOTION_THRESHOLD):
+        fps = fps if fps and fps > 0 else 30
+        self.strides = {
+            "dense": max(1, round(fps / DENSE_HZ)),
+            "normal": max(1, round(fps / NORMAL_HZ)),
+            "sparse": max(1, round(fps / SPARSE_HZ)),
+            "idle": max(1, round(fps / IDLE_HZ)),
+        }
+        self.motion_threshold = motion_threshold
+        self.inferences = 0
+        self.static_skips = 0
+        self._reference = None
+
+    def _thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, MOTION_THUMBNAIL, interpolation=cv2.INTER_AREA)
+
+    def is_static(self, frame):
+        """
+        True when the frame barely differs from the last frame pose inference ran on.
+        """
+        thumbnail = self._thumbnail(frame)
+        if self._reference is not None and cv2.absdiff(thumbnail, self._reference).mean() < self.motion_threshold:
+            self.static_skips += 1
+            return True
+        self._reference = thumbnail
+        return False
+
+    def next_stride(self, angles):
+        """
+        Frames until the next inference, given the phase angles of the last analyzed frame.
+        """
+        self.inferences += 1
+        if not angles:
+            return self.strides["normal"]
+        margin = min(abs(angle - PHASE_THRESHOLDS[name]) for name, angle in angles.items())
+        if margin < NEAR_DEGREES:
+            return self.strides["dense"]
+        if margin > FAR_DEGREES:
+            return self.strides["sparse"]
+        return self.strides["normal"]
+
+
+def process_adaptive(video_path, pose, on_frame, recorded_on_android=False, decoder="opencv", counter=None,
+                     sampler=None, recorder=None, metrics=NULL_METRICS, draw=True):
+    """
+    Analyze a video with adaptive sampling; runs sequentially on the calling thread.
+
+    The output keeps the fixed FRAME_SKIP grid: every FRAME_SKIP-th frame is passed to
+    `on_frame`, annotated with the latest pose and counts (unless `draw` is off), whether or
+    not inference ran on it. Without `draw` only the frames inference is due on are decoded
+    and prepared; the other output frames are passed as None. `decoder` is one of
+    `fitsmart.pipeline.DECODERS`.
+    The landmarks of the frames inference ran on are passed to `recorder` when given.
+    Returns the final counter; inference statistics are kept on `sampler`.
+    """
+    counter = counter or RepCounter()
+    sampler = sampler or AdaptiveSampler(video_info(video_path)[1])
+    next_inference = 0
+    pose_landmarks, exercise = None, None
+
+    # Frames to decode: those inference is due on, and the output frames when they are drawn
+    def wanted(index):
+        return index >= next_inference or (draw and index % FRAME_SKIP == 0)
+
+    with open_frames(video_path, recorded_on_android, decoder, wanted=wanted) as frames:
+        for frame_count, frame in metrics.iterate("decode", frames):
+            index = frame_count - 1
+            if index >= next_inference:
+                if sampler.is_static(frame):
+                    next_inference = index + sampler.strides["idle"]
+                else:
+                    with metrics.stage("pose"):
+                        pose_landmarks = infer_pose(pose, frame)
+                    record_frame(recorder, frame_count, pose_landmarks)
+                    if pose_landmarks:
+                        exercise = counter.update(extract_keypoints(pose_landmarks))
+                    next_inference = index + sampler.next_stride(counter.angles if pose_landmarks else {})
+
+            if index % FRAME_SKIP == 0:
+                if pose_landmarks and draw:
+                    with metrics.stage("draw"):
+                        annotate_frame(frame, pose_landmarks, exercise, counter)
+                on_frame(frame_count, frame)
+
+    return counter
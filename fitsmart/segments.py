@@ -0,0 +1,107 @@
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from fitsmart.analysis import annotate_frame, array_to_landmarks, landmarks_to_array, mp_pose
+from fitsmart.features import RepCounter, analyze_points, to_points
+from fitsmart.instrument import NULL_METRICS
+from fitsmart.pipeline import FRAME_SKIP, infer_pose, open_frames
+from fitsmart.tracks import LandmarkTrack, TrackRecorder
+from fitsmart.video import video_info
+
+# Videos shorter than this (in frames) are not worth splitting
+MIN_SEGMENT_FRAMES = 600
+
+
+# Split [0, total_frames) into about `segments` ranges aligned to the sampling grid
+def split_segments(total_frames, segments, frame_skip=FRAME_SKIP):
+    length = math.ceil(total_frames / max(1, segments))
+    length = max(frame_skip, math.ceil(length / frame_skip) * frame_skip)
+    return [(start, min(start + length, total_frames)) for start in range(0, total_frames, length)]
+
+
+def extract_segment(video_path, start, stop, recorded_on_android=False, decoder="opencv", model_complexity=1):
+    """
+    Run pose estimation on the sampled frames in [start, stop) with a fresh Pose instance.
+
+    Runs in a worker process; returns a `LandmarkTrack` for the segment.
+    """
+    recorder = TrackRecorder()
+    with open_frames(video_path, recorded_on_android, decoder, start, stop) as frames, \
+            mp_pose.Pose(model_complexity=model_complexity, min_detection_confidence=0.5,
+                         min_tracking_confidence=0.5) as pose:
+        for frame_count, frame in frames:
+            pose_landmarks = infer_pose(pose, frame)
+            recorder(frame_count, landmarks_to_array(pose_landmarks) if pose_landmarks else None)
+    return recorder.track()
+
+
+def extract_landmarks_parallel(video_path, recorded_on_android=False, workers=None, on_progress=None,
+                               decoder="opencv", model_complexity=1):
+    """
+    Estimate poses for a whole video, one time segment per worker process, and stitch the
+    per-segment tracks back together in timeline order.
+    """
+    total_frames, _ = video_info(video_path)
+
+    workers = workers or os.cpu_count() or 1
+    segments = min(workers, max(1, total_frames // MIN_SEGMENT_FRAMES))
+    ranges = split_segments(total_frames, segments)
+    if len(ranges) <= 1:
+        # Nothing to parallelize; the frame count may also be unknown (0) for some containers
+        track = extract_segment(video_path, 0, None, recorded_on_android, decoder, model_complexity)
+        if on_progress:
+            on_progress(1.0)
+        return track
+
+    tracks = [None] * len(ranges)
+    # "spawn" keeps workers independent of the threads of the parent (e.g. the Streamlit server)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=context) as pool:
+        futures = {
+            pool.submit(extract_segment, video_path, start, stop, recorded_on_android, decoder, model_complexity): i
+            for i, (start, stop) in enumerate(ranges)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            tracks[futures[future]] = future.result()
+            if on_progress:
+                on_progress(done / len(ranges))
+
+    return LandmarkTrack.concatenate(tracks)
+
+
+def count_track(track, fps=None):
+    """
+    Run the rep logic over a merged landmark track in one vectorized pass, so reps crossing
+    a segment boundary are counted exactly once.
+
+    Returns the `FrameFeatures` of every sampled frame (see `fitsmart.features`); its rep
+    events are timed with `fps`.
+    """
+    return analyze_points(to_points(track.landmarks), track.frame_counts, fps)
+
+
+def render_track(video_path, track, features, on_frame, recorded_on_android=False, decoder="opencv",
+                 metrics=NULL_METRICS, snapshot=None):
+    """
+    Decode the video again and annotate each sampled frame from the stored landmarks.
+
+    `snapshot`, a `RepCounter`, is set to the counts and phases of each frame as it is drawn.
+    """
+    snapshot = snapshot or RepCounter()
+    detected = track.detected()
+    with open_frames(video_path, recorded_on_android, decoder) as frames:
+        for i, (frame_count, frame) in enumerate(metrics.iterate("decode", frames)):
+            if i >= len(track):
+                break
+            if detected[i]:
+                for name in features.counts:
+                    snapshot.counts[name] = int(features.counts[name][i])
+                    snapshot.down[name] = bool(features.down[name][i])
+                snapshot.exercise = features.exercises[features.exercise[i]]
+                with metrics.stage("draw"):
+                    annotate_frame(frame, array_to_landmarks(track.landmarks[i]),
+                                   snapshot.exercise, snapshot)
+            on_frame(frame_count, frame)
+
@@ -0,0 +1,237 @@
+"""
+Workout records and the per-user rollups the Leaderboard reads.
+
+Every workout is one item of the workouts table (username, datetime, counts). Next to it,
+per-user aggregates live in a rollup table keyed by (bucket, username):
+
+    "total"                  all-time totals of each user
+    "day#2025-03-14"         totals of each user active that day
+    "hour#2025-03-14 09"     totals of each user active in that hour
+
+`record_workout` updates them with atomic ADD counters when a workout is stored, so a
+leaderboard costs one Query per bucket, sized by the number of users in it rather than by
+the whole workout history. `backfill_rollups` rebuilds them from existing workouts.
+"""
+import datetime
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.dynamodb.conditions import Attr, Key
+
+# Format of the "datetime" attribute of workout items, e.g. "2025-03-14 09:30:12.345"
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+# Rollup bucket of the all-time totals
+TOTAL_BUCKET = "total"
+
+# Counters summed in every rollup item
+ROLLUP_COUNTERS = ("squat_count", "pushup_count", "workouts")
+
+# Attributes of a workout item shown on the pages ("datetime" aliased, as it is close to reserved words)
+WORKOUT_PROJECTION = {
+    "ProjectionExpression": "username, #dt, squat_count, pushup_count",
+    "ExpressionAttributeNames": {"#dt": "datetime"},
+}
+
+# Parallel scan segments used to read every workout
+SCAN_SEGMENTS = 4
+
+# Leaderboard timeframes, resolved to whole rollup buckets (see timeframe_buckets)
+TIMEFRAMES = ("Today", "Last 24 hours", "Last 7 days", "Last 30 days", "All Time")
+
+
+# Workout timestamp as stored in the table (millisecond precision)
+def format_datetime(when):
+    return when.strftime(DATETIME_FORMAT)[:-3]
+
+def day_bucket(when):
+    return f"day#{when:%Y-%m-%d}"
+
+def hour_bucket(when):
+    return f"hour#{when:%Y-%m-%d %H}"
+
+# Rollup buckets a workout stored with `datetime_text` counts towards
+def workout_buckets(datetime_text):
+    return [TOTAL_BUCKET, f"day#{datetime_text[:10]}", f"hour#{datetime_text[:13]}"]
+
+
+def timeframe_buckets(timeframe, now=None):
+    """
+    Rollup buckets covering a Leaderboard timeframe.
+
+    Windows are rounded to whole buckets: "Last 24 hours" is the current hour and the 23
+    before it, "Last 7 days" is today and the 6 days before it.
+    """
+    now = now or datetime.datetime.now()
+    if timeframe == "Today":
+        return [day_bucket(now)]
+    if timeframe == "Last 24 hours":
+        return [hour_bucket(now - datetime.timedelta(hours=h)) for h in range(24)]
+    if timeframe == "Last 7 days":
+        return [day_bucket(now - datetime.timedelta(days=d)) for d in range(7)]
+    if timeframe == "Last 30 days":
+        return [day_bucket(now - datetime.timedelta(days=d)) for d in range(30)]
+    if timeframe == "All Time":
+        return [TOTAL_BUCKET]
+    raise ValueError(f"Unknown timeframe {timeframe!r}, expected one of {TIMEFRAMES}")
+
+
+class RollupUpdateFailed(Exception):
+    """
+    Raised by `record_workout` when the workout was stored but its rollups were not updated.
+
+    `item` is the stored workout: recording it again would store a duplicate, while
+    `backfill_rollups` brings the aggregates back in line.
+    """
+
+    def __init__(self, message, item):
+        super().__init__(message)
+        self.item = item
+
+
+def record_workout(table, rollups, username, datetime_text, squat_count, pushup_count):
+    """
+    Store one workout and add its counts to the user's rollups.
+
+    The workout item is written first; if a rollup update fails afterwards the workout is
+    kept and `RollupUpdateFailed` is raised, so callers can tell it apart from a workout that
+    was not stored.
+    """
+    item = {
+        "username": username,
+        "datetime": datetime_text,
+        "squat_count": squat_count,
+        "pushup_count": pushup_count,
+    }
+    table.put_item(Item=item)
+    if rollups is not None:
+        try:
+            for bucket in workout_buckets(datetime_text):
+                rollups.update_item(
+                    Key={"bucket": bucket, "username": username},
+                    UpdateExpression="ADD squat_count :squats, pushup_count :pushups, workouts :one "
+                                     "SET last_datetime = :datetime",
+                    ExpressionAttributeValues={
+                        ":squats": squat_count,
+                        ":pushups": pushup_count,
+                        ":one": 1,
+                        ":datetime": datetime_text,
+                    },
+                )
+        except Exception as e:
+            raise RollupUpdateFailed(f"workout stored, but its leaderboard totals were not updated: {e}", item) from e
+    return item
+
+
+# Every item of a table, following LastEvaluatedKey across pages
+def scan_all(table, **kwargs):
+    while True:
+        response = table.scan(**kwargs)
+        yield from response.get("Items", [])
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+# Every item of a Query, following LastEvaluatedKey across pages
+def query_all(table, **kwargs):
+    while True:
+        response = table.query(**kwargs)
+        yield from response.get("Items", [])
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def parallel_scan(table, segments=SCAN_SEGMENTS, **kwargs):
+    """
+    Every item of a table, read as `segments` parallel scan segments on a thread pool.
+
+    Each segment follows its own pagination; items are returned segment by segment.
+    """
+    if segments <= 1:
+        return list(scan_all(table, **kwargs))
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        parts = pool.map(lambda segment: list(scan_all(table, Segment=segment, TotalSegments=segments, **kwargs)),
+                         range(segments))
+        return [item for part in parts for item in part]
+
+
+def load_workouts(table, username=None, segments=SCAN_SEGMENTS):
+    """
+    Workout items with the attributes the pages display.
+
+    For one user this is a key Query on the "username" partition key; otherwise the whole
+    table is read with a parallel scan.
+    """
+    if username is not None:
+        return list(query_all(table, KeyConditionExpression=Key("username").eq(username), **WORKOUT_PROJECTION))
+    return parallel_scan(table, segments, **WORKOUT_PROJECTION)
+
+
+def load_workouts_since(table, rollups, since, username=None):
+    """
+    Workout items recorded at or after `since` (a stored "datetime" string).
+
+    The all-time rollups' `last_datetime` tells which users have new workouts; only their
+    partitions are queried, from `since` on, so the cost follows the number of users and new
+    workouts rather than the size of the table.
+    """
+    if username is not None:
+        condition = Key("username").eq(username) & Key("datetime").gte(since)
+        return list(query_all(table, KeyConditionExpression=condition, **WORKOUT_PROJECTION))
+    active = query_all(rollups, KeyConditionExpression=Key("bucket").eq(TOTAL_BUCKET),
+                       FilterExpression=Attr("last_datetime").gte(since), ProjectionExpression="username")
+    return [item for user in active for item in load_workouts_since(table, rollups, since, user["username"])]
+
+
+# Usernames with at least one workout, from the all-time rollups (one item per user)
+def list_users(rollups):
+    items = query_all(rollups, KeyConditionExpression=Key("bucket").eq(TOTAL_BUCKET), ProjectionExpression="username")
+    return sorted(item["username"] for item in items)
+
+
+def leaderboard_rows(rollups, buckets):
+    """
+    Per-user totals over `buckets`: one dict per user with username and the rollup counters.
+    """
+    totals = defaultdict(lambda: dict.fromkeys(ROLLUP_COUNTERS, 0))
+    for bucket in buckets:
+        for item in query_all(rollups, KeyConditionExpression=Key("bucket").eq(bucket)):
+            user = totals[item["username"]]
+            for counter in ROLLUP_COUNTERS:
+                user[counter] += int(item.get(counter, 0))
+    return [{"username": username, **counters} for username, counters in totals.items()]
+
+
+def rollup_workouts(items):
+    """
+    Aggregate workout items into rollup items, as `record_workout` would have built them.
+    """
+    rollups = {}
+    for item in items:
+        for bucket in workout_buckets(item["datetime"]):
+            key = (bucket, item["username"])
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollup = rollups[key] = {"bucket": bucket, "username": item["username"],
+                                         **dict.fromkeys(ROLLUP_COUNTERS, 0), "last_datetime": item["datetime"]}
+            rollup["squat_count"] += int(item.get("squat_count", 0))
+            rollup["pushup_count"] += int(item.get("pushup_count", 0))
+            rollup["workouts"] += 1
+            rollup["last_datetime"] = max(rollup["last_datetime"], item["datetime"])
+    return list(rollups.values())
+
+
+def backfill_rollups(table, rollups):
+    """
+    Rebuild the rollup table from every workout in `table`; returns the number of rollup items.
+
+    Rollup items are overwritten with absolute values, so the backfill can be re-run. Workouts
+    recorded while it runs may be counted twice or missed; run it before switching the
+    Leaderboard over, or re-run it once writes have settled.
+    """
+    items = rollup_workouts(parallel_scan(table, **WORKOUT_PROJECTION))
+    with rollups.batch_writer(overwrite_by_pkeys=["bucket", "username"]) as batch:
+        for item in items:
+            batch.put_item(Item=item)
+    return len(items)
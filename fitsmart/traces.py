@@ -0,0 +1,186 @@
+"""
+Compact landmark traces saved with every workout, so it can be re-scored without the video.
+
+    store = TraceStore(root)
+    store.save(username, datetime_text, track, fps, squat_count=12, pushup_count=0)
+    trace = read_trace(path)   # memory-mapped: nothing is read until used
+    rescore([trace, ...])      # counts with the current rep logic, for many traces at once
+
+A trace file holds a small JSON header followed by raw little-endian arrays, each starting
+on a 64-byte boundary: the frame number of every sampled frame (uint32), the x/y of all 33
+landmarks (float16, NaN when no pose was detected) and their visibility (uint8, 0-255).
+That is 169 bytes per sampled frame, about a hundredth of the video it came from. Stored
+raw, the arrays are memory-mapped on read; `compress=True` deflates them instead, for
+archives, at the cost of decoding on read.
+"""
+import json
+import os
+import struct
+import urllib.parse
+import zlib
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from fitsmart.rules import DEFAULT_RULES
+from fitsmart.tracks import LANDMARK_FIELDS, NUM_LANDMARKS
+
+MAGIC = b"FSTRACE\0"
+TRACE_VERSION = 1
+TRACE_SUFFIX = ".fstrace"
+ALIGNMENT = 64
+
+DEFAULT_TRACE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "fitsmart", "traces")
+
+# Stored arrays: name -> dtype and shape per frame
+TRACE_ARRAYS = {
+    "frame_counts": ("<u4", ()),
+    "points": ("<f2", (NUM_LANDMARKS, 2)),
+    "visibility": ("u1", (NUM_LANDMARKS,)),
+}
+
+_VISIBILITY = LANDMARK_FIELDS.index("visibility")
+
+
+@dataclass
+class Trace:
+    """
+    The landmarks of one analyzed video, as stored in a trace file.
+
+    `meta` is the header: fps, frame count and the counts reported when the video was
+    analyzed, plus the username and workout datetime of traces saved by a `TraceStore`.
+    """
+
+    frame_counts: np.ndarray
+    points: np.ndarray
+    visibility: np.ndarray
+    meta: dict = field(default_factory=dict)
+
+    def __len__(self):
+        return len(self.frame_counts)
+
+    @property
+    def timestamps(self):
+        """
+        Seconds from the start of the video of every sampled frame.
+        """
+        return self.frame_counts / (self.meta.get("fps") or 1.0)
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_trace(path, track, fps, compress=False, **meta):
+    """
+    Write a `fitsmart.tracks.LandmarkTrack` to `path` as a trace; `meta` goes into the header.
+    """
+    landmarks = track.landmarks
+    arrays = {
+        "frame_counts": np.asarray(track.frame_counts, dtype="<u4"),
+        "points": np.ascontiguousarray(landmarks[:, :, :2], dtype="<f2"),
+        "visibility": np.round(np.nan_to_num(landmarks[:, :, _VISIBILITY], nan=0.0).clip(0, 1) * 255).astype("u1"),
+    }
+    blobs, layout, offset = [], {}, 0
+    for name, array in arrays.items():
+        blob = zlib.compress(array.tobytes(), 6) if compress else array.tobytes()
+        layout[name] = [offset, len(blob)]
+        blobs.append((offset, blob))
+        offset = _aligned(offset + len(blob))
+
+    header = dict(meta, version=TRACE_VERSION, frames=len(track), fps=float(fps),
+                  codec="zlib" if compress else "raw", arrays=layout)
+    header_bytes = json.dumps(header).encode()
+    data_start = _aligned(len(MAGIC) + 4 + len(header_bytes))
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+        for blob_offset, blob in blobs:
+            f.seek(data_start + blob_offset)
+            f.write(blob)
+        f.truncate(data_start + offset)
+    os.replace(temp_path, path)
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a landmark trace")
+        (length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(length))
+    if header.get("version") != TRACE_VERSION:
+        raise ValueError(f"{path} has unsupported trace version {header.get('version')}")
+    header["data_start"] = _aligned(len(MAGIC) + 4 + length)
+    return header
+
+
+def read_trace(path):
+    """
+    The `Trace` in `path`; raw traces are memory-mapped rather than read into memory.
+    """
+    header = read_header(path)
+    frames = header["frames"]
+    # One mapping of the whole file (one file descriptor), viewed as each array
+    raw = np.memmap(path, dtype="u1", mode="r") if header["codec"] == "raw" else None
+    arrays = {}
+    for name, (dtype, shape) in TRACE_ARRAYS.items():
+        offset, nbytes = header["arrays"][name]
+        start = header["data_start"] + offset
+        if raw is not None:
+            data = raw[start:start + nbytes]
+        else:
+            with open(path, "rb") as f:
+                f.seek(start)
+                data = zlib.decompress(f.read(nbytes))
+        arrays[name] = np.frombuffer(data, dtype=dtype).reshape((frames,) + shape)
+    meta = {key: value for key, value in header.items() if key not in ("arrays", "codec", "data_start", "version")}
+    return Trace(arrays["frame_counts"], arrays["points"], arrays["visibility"], meta)
+
+
+def rescore(traces, rules=DEFAULT_RULES):
+    """
+    (squat_count, pushup_count) of every trace with the current exercise rules (`fitsmart.rules`).
+
+    All traces are scored in one vectorized pass over their concatenated landmarks; each
+    counts as if `analyze_points` ran on it alone.
+    """
+    if not traces:
+        return []
+    lengths = np.array([len(trace) for trace in traces])
+    points = np.concatenate([trace.points for trace in traces])
+    segments = np.repeat(np.arange(len(traces)), lengths)
+
+    counts = rules.final_counts(points, segments, len(traces))
+    return list(zip(counts["squat"].tolist(), counts["push-up"].tolist()))
+
+
+class TraceStore:
+    """
+    Trace files of recorded workouts under `root`, one per (username, workout datetime).
+    """
+
+    def __init__(self, root=DEFAULT_TRACE_DIR, compress=False):
+        self.root = root
+        self.compress = compress
+
+    def path(self, username, datetime_text):
+        # Usernames are free text: quote them so every user gets exactly one directory under root
+        user_dir = "u_" + urllib.parse.quote(username, safe="")
+        return os.path.join(self.root, user_dir, datetime_text.replace(" ", "T").replace(":", "-") + TRACE_SUFFIX)
+
+    def save(self, username, datetime_text, track, fps, squat_count, pushup_count):
+        path = self.path(username, datetime_text)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_trace(path, track, fps, compress=self.compress, username=username, datetime=datetime_text,
+                    squat_count=int(squat_count), pushup_count=int(pushup_count))
+        return path
+
+    def paths(self):
+        """
+        Every trace file in the store, in a stable order.
+        """
+        found = []
+        for directory, _, names in os.walk(self.root):
+            found.extend(os.path.join(directory, name) for name in names if name.endswith(TRACE_SUFFIX))
+        return sorted(found)
@@ -0,0 +1,83 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+# Per-landmark values kept when a pose result is stored as an array
+LANDMARK_FIELDS = ("x", "y", "visibility", "presence")
+# Names of the landmarks in a MediaPipe Pose result, in order (mp_pose.PoseLandmark)
+POSE_LANDMARKS = (
+    "NOSE", "LEFT_EYE_INNER", "LEFT_EYE", "LEFT_EYE_OUTER", "RIGHT_EYE_INNER", "RIGHT_EYE",
+    "RIGHT_EYE_OUTER", "LEFT_EAR", "RIGHT_EAR", "MOUTH_LEFT", "MOUTH_RIGHT",
+    "LEFT_SHOULDER", "RIGHT_SHOULDER", "LEFT_ELBOW", "RIGHT_ELBOW", "LEFT_WRIST", "RIGHT_WRIST",
+    "LEFT_PINKY", "RIGHT_PINKY", "LEFT_INDEX", "RIGHT_INDEX", "LEFT_THUMB", "RIGHT_THUMB",
+    "LEFT_HIP", "RIGHT_HIP", "LEFT_KNEE", "RIGHT_KNEE", "LEFT_ANKLE", "RIGHT_ANKLE",
+    "LEFT_HEEL", "RIGHT_HEEL", "LEFT_FOOT_INDEX", "RIGHT_FOOT_INDEX",
+)
+# Number of landmarks in a MediaPipe Pose result
+NUM_LANDMARKS = len(POSE_LANDMARKS)
+
+
+@dataclass
+class LandmarkTrack:
+    """
+    Pose landmarks of every sampled frame of a video.
+
+    `frame_counts[i]` is the frame count reported for the i-th sampled frame (as passed to
+    `on_frame`), and `landmarks[i]` its (NUM_LANDMARKS, len(LANDMARK_FIELDS)) landmark array,
+    all NaN when no pose was detected.
+    """
+
+    frame_counts: np.ndarray
+    landmarks: np.ndarray
+
+    def __len__(self):
+        return len(self.frame_counts)
+
+    @property
+    def nbytes(self):
+        return self.frame_counts.nbytes + self.landmarks.nbytes
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            np.zeros(0, dtype=np.int32),
+            np.zeros((0, NUM_LANDMARKS, len(LANDMARK_FIELDS)), dtype=np.float32),
+        )
+
+    @classmethod
+    def concatenate(cls, tracks):
+        tracks = [track for track in tracks if len(track)]
+        if not tracks:
+            return cls.empty()
+        return cls(
+            np.concatenate([track.frame_counts for track in tracks]),
+            np.concatenate([track.landmarks for track in tracks]),
+        )
+
+    def detected(self):
+        """
+        Boolean mask of the frames in which a pose was detected.
+        """
+        return ~np.isnan(self.landmarks[:, 0, 0])
+
+
+class TrackRecorder:
+    """
+    Collects landmark arrays frame by frame while a video is analyzed.
+
+    Call it with (frame_count, landmark_array_or_None) for every sampled frame, in order.
+    """
+
+    def __init__(self):
+        self._frame_counts = []
+        self._landmarks = []
+        self._missing = np.full((NUM_LANDMARKS, len(LANDMARK_FIELDS)), np.nan, dtype=np.float32)
+
+    def __call__(self, frame_count, landmarks):
+        self._frame_counts.append(frame_count)
+        self._landmarks.append(self._missing if landmarks is None else landmarks)
+
+    def track(self):
+        if not self._frame_counts:
+            return LandmarkTrack.empty()
+        return LandmarkTrack(np.array(self._frame_counts, dtype=np.int32), np.stack(self._landmarks))
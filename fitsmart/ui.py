@@ -0,0 +1,52 @@
+"""
+Streamlit widgets shared by the pages.
+"""
+import math
+
+import streamlit as st
+
+from fitsmart.assets import asset_path
+
+# Rows per page of a paginated table
+PAGE_SIZE = 25
+
+
+def asset_image(name, fallback=None, **image_kwargs):
+    """
+    Show a local image of `fitsmart.assets`, or the `fallback` text while it is unavailable.
+    """
+    path = asset_path(name)
+    if path is not None:
+        st.image(path, **image_kwargs)
+    elif fallback:
+        st.caption(fallback)
+
+
+def paginated_table(fetch_rows, total_rows, key, page_size=PAGE_SIZE, **to_html_kwargs):
+    """
+    Render one page of a table with previous/next controls.
+
+    `fetch_rows(start, stop)` returns a DataFrame of the rows [start, stop) and is only
+    called for the page on screen, so the rendered HTML and the payload sent to the browser
+    stay one page long however many rows there are. The page number is kept in
+    `st.session_state[key]`; `to_html_kwargs` are passed to `DataFrame.to_html`.
+    """
+    pages = max(1, math.ceil(total_rows / page_size))
+    page = min(st.session_state.get(key, 0), pages - 1)
+
+    previous_col, label_col, next_col = st.columns([1, 3, 1])
+    with previous_col:
+        if st.button("◀ Previous", key=f"{key}_previous", disabled=page == 0):
+            page -= 1
+    with next_col:
+        if st.button("Next ▶", key=f"{key}_next", disabled=page >= pages - 1):
+            page += 1
+    st.session_state[key] = page
+
+    start = page * page_size
+    stop = min(start + page_size, total_rows)
+    with label_col:
+        st.caption(f"Rows {start + 1 if total_rows else 0}–{stop} of {total_rows} · page {page + 1} of {pages}")
+
+    rows = fetch_rows(start, stop)
+    st.markdown(rows.to_html(index=False, **to_html_kwargs), unsafe_allow_html=True)
@@ -0,0 +1,246 @@
+import json
+import math
+import os
+import subprocess
+
+import cv2
+import numpy as np
+
+from fitsmart.workspace import QuotaExceeded
+
+# Size (width, height) every sampled frame is resized to before pose inference
+FRAME_SIZE = (240, 426)
+
+# Frame rate of the annotated output video
+OUTPUT_FPS = 10
+
+
+# Number of frames and frame rate of a video, read from the container without decoding
+def video_info(video_path):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video {video_path}")
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS)
+    finally:
+        cap.release()
+
+# Ensure the video is in vertical orientation by rotating frames if needed.
+def fix_video_orientation(frame, recorded_on_android=False):
+    height, width = frame.shape[:2]
+    if width > height:
+        frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
+    if recorded_on_android:
+        frame = cv2.rotate(frame, cv2.ROTATE_180)
+    return frame
+
+# Orient and resize a decoded frame for pose inference
+def prepare_frame(frame, recorded_on_android=False):
+    frame = fix_video_orientation(frame, recorded_on_android)
+    # Resize frame for performance
+    return cv2.resize(frame, FRAME_SIZE)
+
+# Display size (width, height) and frame rate of a video's first video stream, via ffprobe
+def probe_video(video_path):
+    result = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=width,height,avg_frame_rate:stream_tags=rotate:stream_side_data=rotation",
+            "-of", "json", video_path,
+        ],
+        capture_output=True, text=True, check=True,
+    )
+    streams = json.loads(result.stdout).get("streams")
+    if not streams:
+        raise ValueError(f"No video stream found in {video_path}")
+    stream = streams[0]
+
+    rotation = stream.get("tags", {}).get("rotate")
+    for side_data in stream.get("side_data_list", []):
+        rotation = side_data.get("rotation", rotation)
+    width, height = stream["width"], stream["height"]
+    # ffmpeg applies the rotation metadata while decoding, like OpenCV does
+    if rotation is not None and abs(int(float(rotation))) % 180 == 90:
+        width, height = height, width
+
+    numerator, _, denominator = stream.get("avg_frame_rate", "0/1").partition("/")
+    fps = float(numerator) / float(denominator or 1) if float(denominator or 1) else 0.0
+    return width, height, fps
+
+# libx264 speed/quality trade-offs for the annotated output video
+ENCODE_PRESETS = {
+    "fast": {"preset": "veryfast", "crf": 30},
+    "balanced": {"preset": "faster", "crf": 28},
+    "quality": {"preset": "medium", "crf": 23},
+}
+
+
+class FFmpegVideoWriter:
+    """
+    Encodes annotated frames straight to browser-playable H.264 through an ffmpeg pipe.
+
+    Raw BGR frames are written to ffmpeg's stdin as they are rendered and encoded once,
+    to yuv420p with the moov atom at the front (`+faststart`) so the browser can start
+    playing before the whole file has loaded. ffmpeg is started on the first frame, once
+    the frame size is known; `preset` is one of `ENCODE_PRESETS`.
+
+    With `max_bytes`, the output file is checked after every frame: once it grows past the
+    limit, ffmpeg is stopped and `fitsmart.workspace.QuotaExceeded` is raised, so a long
+    upload cannot fill the disk before its job's quota is checked.
+    """
+
+    def __init__(self, path, fps=OUTPUT_FPS, preset="balanced", threads=0, max_bytes=None):
+        if preset not in ENCODE_PRESETS:
+            raise ValueError(f"Unknown encode preset {preset!r}, expected one of {tuple(ENCODE_PRESETS)}")
+        self.path = path
+        self.fps = fps
+        self.preset = preset
+        self.threads = threads
+        self.max_bytes = max_bytes
+        self.frames = 0
+        # Set once ffmpeg has been stopped; restarting it would overwrite the file
+        self.closed = False
+        self._process = None
+
+    def _start(self, width, height):
+        settings = ENCODE_PRESETS[self.preset]
+        command = [
+            "ffmpeg", "-y", "-v", "error", "-nostdin",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(self.fps), "-i", "pipe:0",
+            "-an", "-c:v", "libx264", "-preset", settings["preset"], "-crf", str(settings["crf"]),
+            "-threads", str(self.threads), "-pix_fmt", "yuv420p", "-movflags", "+faststart",
+            self.path,
+        ]
+        # With -v error ffmpeg only prints on failure, so stderr can't fill the pipe while encoding
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def write(self, image):
+        if self.closed:
+            raise RuntimeError(f"{self.path} is already finished")
+        if self._process is None:
+            height, width, _ = image.shape
+            self._start(width, height)
+        try:
+            self._process.stdin.write(np.ascontiguousarray(image).data)
+        except BrokenPipeError:
+            self._finish()
+            raise RuntimeError(f"ffmpeg stopped reading frames for {self.path}") from None
+        self.frames += 1
+        if self.max_bytes is not None:
+            self._check_size()
+
+    def _check_size(self):
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return
+        if size > self.max_bytes:
+            self.abort()
+            raise QuotaExceeded(f"the annotated video is over the {self.max_bytes / 1e6:.0f} MB left in the job quota")
+
+    def _finish(self):
+        self.closed = True
+        process, self._process = self._process, None
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        error = process.stderr.read().decode(errors="replace").strip()
+        process.stderr.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to encode {self.path}: {error or process.returncode}")
+
+    def release(self):
+        if self._process is not None:
+            self._finish()
+        self.closed = True
+
+    def abort(self):
+        """
+        Stop encoding without finishing the file, e.g. after an analysis error.
+        """
+        self.closed = True
+        if self._process is not None:
+            process, self._process = self._process, None
+            process.kill()
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            process.stderr.close()
+            process.wait()
+
+
+class FFmpegFrameReader:
+    """
+    Decodes only the sampled frames of a video, already oriented and at analysis size.
+
+    ffmpeg selects every `frame_skip`-th frame, rotates it upright (and by 180 degrees for
+    Android front cameras) and scales it to FRAME_SIZE before converting to BGR, so the
+    rejected frames never leave the decoder and full-resolution frames are never converted
+    or copied into Python. Iterating yields the same (frame_count, frame) pairs as
+    `fitsmart.pipeline.iter_frames`.
+    """
+
+    def __init__(self, video_path, recorded_on_android=False, frame_skip=3, start=0, stop=None, threads=0):
+        self.video_path = video_path
+        self.frame_skip = frame_skip
+        self.start = start
+        self.stop = stop
+        width, height, self.fps = probe_video(video_path)
+
+        filters = [f"select=not(mod(n\\,{frame_skip}))"]
+        if width > height:
+            filters.append("transpose=clock")
+        if recorded_on_android:
+            filters.append("hflip,vflip")
+        # Bilinear like cv2.resize's default
+        filters.append(f"scale={FRAME_SIZE[0]}:{FRAME_SIZE[1]}:flags=bilinear")
+
+        command = ["ffmpeg", "-v", "error", "-nostdin", "-threads", str(threads)]
+        if start:
+            command += ["-ss", f"{start / (self.fps or 30):.6f}"]
+        # -vsync rather than -fps_mode, which only exists since ffmpeg 5.1
+        command += ["-i", video_path, "-an", "-vf", ",".join(filters), "-vsync", "passthrough"]
+        if stop is not None:
+            command += ["-frames:v", str(math.ceil((stop - start) / frame_skip))]
+        command += ["-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"]
+        self.command = command
+        self._process = None
+
+    def __iter__(self):
+        width, height = FRAME_SIZE
+        frame_bytes = width * height * 3
+        # With -v error ffmpeg only prints on failure, so stderr can't fill the pipe while decoding
+        self._process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                         bufsize=frame_bytes * 4)
+        frame_count = self.start
+        while True:
+            data = self._process.stdout.read(frame_bytes)
+            if len(data) < frame_bytes:
+                break
+            frame = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3).copy()
+            yield frame_count + 1, frame
+            frame_count += self.frame_skip
+        self._finish()
+
+    def _finish(self):
+        # Reached the end of the output: a failed decode must not pass for a video without frames
+        process, self._process = self._process, None
+        process.stdout.close()
+        error = process.stderr.read().decode(errors="replace").strip()
+        process.stderr.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to decode {self.video_path}: {error or process.returncode}")
+
+    def close(self):
+        """
+        Stop decoding, e.g. when the consumer stops early; nothing is checked.
+        """
+        if self._process is not None:
+            process, self._process = self._process, None
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.stderr.close()
+            process.wait()
@@ -0,0 +1,246 @@
+"""
+Per-job working directories for uploaded videos and annotated outputs, with bounded disk use.
+
+    workspaces = WorkspaceManager(quota=512 * 1024 * 1024, max_bytes=4 * 1024 ** 3)
+    workspaces.start_sweeper()
+    workspace = workspaces.create(owner=session_id)
+    video_path = workspace.spool(uploaded_file, "upload.mp4")  # copied in chunks
+    ...
+    workspace.keep_for(3600)  # job done: keep the output for an hour, then delete it
+    workspace.close()         # or delete it now
+
+Every running job's workspace reserves `quota` bytes of the `max_bytes` budget of its root
+directory, so at most `max_bytes // quota` jobs run at once and disk use stays bounded however
+many uploads arrive; once `keep_for` marks a job done, only the size of the files it kept
+stays reserved. A sweeper thread deletes workspaces whose time is up or whose owning
+session has ended, and directories left behind by a crashed or restarted server.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+DEFAULT_WORKSPACE_ROOT = os.path.join(tempfile.gettempdir(), "fitsmart-jobs")
+DEFAULT_WORKSPACE_QUOTA = 512 * 1024 * 1024
+DEFAULT_WORKSPACE_MAX_BYTES = 4 * 1024 * 1024 * 1024
+
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+# Directories under the root that no live workspace owns are deleted after this many seconds
+ORPHAN_AGE = 6 * 3600
+SWEEP_INTERVAL = 60
+
+WORKSPACE_PREFIX = "job-"
+
+
+class QuotaExceeded(Exception):
+    """
+    Raised when a file would not fit in a workspace's quota.
+    """
+
+
+class WorkspaceFull(Exception):
+    """
+    Raised by `WorkspaceManager.create` when every byte of `max_bytes` is reserved.
+    """
+
+
+# Total size of the files under a directory
+def directory_size(path):
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                pass
+    return total
+
+
+class Workspace:
+    """
+    A job's working directory, created by `WorkspaceManager.create`.
+    """
+
+    def __init__(self, manager, path, quota, owner=None):
+        self.manager = manager
+        self.path = path
+        self.quota = quota
+        # Bytes held against the manager's max_bytes: the quota while the job runs, then what it kept
+        self.reserved = quota
+        self.owner = owner
+        self.created_at = time.time()
+        self.expires_at = None
+        self.closed = False
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def spool(self, source, name, chunk_size=SPOOL_CHUNK_SIZE):
+        """
+        Copy the file-like `source` into the workspace in `chunk_size` reads; returns its path.
+
+        Raises `QuotaExceeded` (and removes the partial file) once the workspace would go
+        over its quota.
+        """
+        path = self.file(name)
+        budget = self.quota - self.usage()
+        written = 0
+        try:
+            with open(path, "wb") as f:
+                for chunk in iter(lambda: source.read(chunk_size), b""):
+                    written += len(chunk)
+                    if written > budget:
+                        raise QuotaExceeded(f"{name} is larger than the {self.quota / 1e6:.0f} MB job quota")
+                    f.write(chunk)
+        except BaseException:
+            self.discard(name)
+            raise
+        return path
+
+    def usage(self):
+        return directory_size(self.path)
+
+    def check_quota(self):
+        """
+        Raise `QuotaExceeded` if the files written so far (e.g. by ffmpeg) exceed the quota.
+        """
+        usage = self.usage()
+        if usage > self.quota:
+            raise QuotaExceeded(f"the job wrote {usage / 1e6:.0f} MB, over its {self.quota / 1e6:.0f} MB quota")
+
+    def discard(self, name):
+        try:
+            os.remove(self.file(name))
+        except FileNotFoundError:
+            pass
+
+    def keep_for(self, seconds):
+        """
+        Let the sweeper delete the workspace `seconds` from now, or once its owner's session ends.
+
+        The job is done writing, so only the files it kept stay reserved.
+        """
+        self.expires_at = time.time() + seconds
+        self.manager.shrink(self)
+
+    def close(self):
+        self.manager.close(self)
+
+
+class WorkspaceManager:
+    """
+    Creates workspaces under `root` and deletes them; safe to share between threads.
+
+    `session_alive(owner)`, when given, tells whether the session that owns a workspace is
+    still connected; finished workspaces of ended sessions are deleted without waiting for
+    their `keep_for` time.
+    """
+
+    def __init__(self, root=DEFAULT_WORKSPACE_ROOT, quota=DEFAULT_WORKSPACE_QUOTA,
+                 max_bytes=DEFAULT_WORKSPACE_MAX_BYTES, orphan_age=ORPHAN_AGE, session_alive=None):
+        self.root = root
+        self.quota = quota
+        self.max_bytes = max_bytes
+        self.orphan_age = orphan_age
+        self.session_alive = session_alive
+        self.removed = 0
+        self._live = {}
+        self._lock = threading.Lock()
+        self._sweeper = None
+        os.makedirs(root, exist_ok=True)
+
+    def create(self, owner=None):
+        """
+        A new, empty workspace. Raises `WorkspaceFull` when its quota cannot be reserved.
+        """
+        with self._lock:
+            full = self._reserved() + self.quota > self.max_bytes
+        if full:
+            self.sweep()
+        with self._lock:
+            if self._reserved() + self.quota > self.max_bytes:
+                raise WorkspaceFull(f"{len(self._live)} jobs already use the {self.max_bytes / 1e9:.1f} GB workspace")
+            path = tempfile.mkdtemp(prefix=WORKSPACE_PREFIX, dir=self.root)
+            workspace = self._live[path] = Workspace(self, path, self.quota, owner)
+        return workspace
+
+    def _reserved(self):
+        return sum(workspace.reserved for workspace in self._live.values())
+
+    def shrink(self, workspace):
+        """
+        Reduce the reservation of a finished workspace to the bytes it actually holds.
+        """
+        usage = workspace.usage()
+        with self._lock:
+            workspace.reserved = min(workspace.reserved, usage)
+
+    def close(self, workspace):
+        with self._lock:
+            if workspace.closed:
+                return
+            workspace.closed = True
+            self._live.pop(workspace.path, None)
+        shutil.rmtree(workspace.path, ignore_errors=True)
+        self.removed += 1
+
+    def sweep(self):
+        """
+        Delete expired workspaces, finished workspaces of ended sessions and orphaned directories.
+        """
+        now = time.time()
+        with self._lock:
+            live = list(self._live.values())
+        for workspace in live:
+            if workspace.expires_at is None:
+                continue
+            owner_gone = (workspace.owner is not None and self.session_alive is not None
+                          and not self.session_alive(workspace.owner))
+            if now >= workspace.expires_at or owner_gone:
+                workspace.close()
+
+        for entry in os.scandir(self.root):
+            if not entry.name.startswith(WORKSPACE_PREFIX):
+                continue
+            with self._lock:
+                if entry.path in self._live:
+                    continue
+            try:
+                if now - entry.stat().st_mtime < self.orphan_age:
+                    continue
+            except FileNotFoundError:
+                continue
+            shutil.rmtree(entry.path, ignore_errors=True)
+            self.removed += 1
+
+    def start_sweeper(self, interval=SWEEP_INTERVAL):
+        """
+        Run `sweep` every `interval` seconds on a daemon thread (once per manager).
+        """
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_forever, args=(interval,),
+                                             name="fitsmart-workspace-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def _sweep_forever(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.sweep()
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            live = list(self._live.values())
+            reserved = self._reserved()
+        return {
+            "workspaces": len(live),
+            "reserved_bytes": reserved,
+            "used_bytes": sum(workspace.usage() for workspace in live),
+            "removed": self.removed,
+        }
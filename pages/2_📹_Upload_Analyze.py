@@ -1,95 +1,199 @@
 import streamlit as st
-import cv2
-import mediapipe as mp
-import numpy as np
-import tempfile
-import subprocess
 import datetime
-import boto3
-
-# Load AWS credentials from Streamlit secrets
-AWS_ACCESS_KEY_ID = st.secrets["AWS_ACCESS_KEY_ID"]
-AWS_SECRET_ACCESS_KEY = st.secrets["AWS_SECRET_ACCESS_KEY"]
-AWS_REGION = st.secrets["AWS_REGION"]
-DYNAMODB_TABLE = st.secrets["DYNAMODB_TABLE"]
-
-# Initialize DynamoDB client
-dynamodb = boto3.resource(
-    "dynamodb",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION,
-)
-table = dynamodb.Table(DYNAMODB_TABLE)
-
-# Initialize Mediapipe Pose
-mp_pose = mp.solutions.pose
-mp_drawing = mp.solutions.drawing_utils
-
-# Function to calculate angle
-def calculate_angle(a, b, c):
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
-    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-    angle = np.abs(radians * 180.0 / np.pi)
-    if angle > 180.0:
-        angle = 360 - angle
-    return angle
-
-# Function to detect exercise type
-def detect_exercise_type(keypoints):
-    shoulder = keypoints["RIGHT_SHOULDER"]
-    hip = keypoints["RIGHT_HIP"]
-    knee = keypoints["RIGHT_KNEE"]
-    wrist = keypoints["RIGHT_WRIST"]
-    ankle = keypoints["RIGHT_ANKLE"]
-
-    torso_angle = calculate_angle(shoulder, hip, [hip[0], hip[1] - 1])
-    knee_angle = calculate_angle(hip, knee, ankle)
-    hip_angle = calculate_angle(knee, hip, shoulder)
-    elbow_angle = calculate_angle(shoulder, wrist, hip)
-    stand_angle = calculate_angle(shoulder, ankle, [ankle[0], ankle[1] - 1])
-    plank_angle = calculate_angle(shoulder, hip, ankle)
-
-    if stand_angle < 40:
-        return "squat"
-    if torso_angle > 45 and hip_angle > 100:
-        return "push-up"
-    return "unknown"
-
-# Function to count reps
-def count_reps(current_phase, prev_phase, count):
-    if prev_phase == "down" and current_phase == "up":
-        return count + 1, current_phase
-    return count, current_phase
-
-# Ensure the video is in vertical orientation by rotating frames if needed.
-def fix_video_orientation(frame, recorded_on_android=False):
-    height, width = frame.shape[:2]
-    if width > height:
-        frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
-    if recorded_on_android:
-        frame = cv2.rotate(frame, cv2.ROTATE_180)
-    return frame
-
-# Re-encode the video with FFmpeg
-def reencode_video(input_path, output_path):
-    subprocess.run([
-        "ffmpeg", "-y", "-i", input_path, "-vcodec", "libx264", "-crf", "28", output_path
-    ])
+import hashlib
+import importlib
+import os
+import threading
+import time
+
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Only light modules are imported by the page script: OpenCV, MediaPipe and boto3 are
+# loaded by the analysis jobs, and preloaded in the background (see get_pose_pool)
+from fitsmart.backend import backend_from_secrets
+from fitsmart.cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, LandmarkCache
+from fitsmart.instrument import Metrics, configure_logging
+from fitsmart.jobs import FAILED, JobQueue, OnceLog, QueueFull
+from fitsmart.posepool import DEFAULT_MODEL_COMPLEXITY, PosePool
+from fitsmart.progress import PUBLISH_INTERVAL, ProgressChannel
+from fitsmart.traces import DEFAULT_TRACE_DIR, TraceStore
+from fitsmart.ui import asset_image
+from fitsmart.workspace import (DEFAULT_WORKSPACE_MAX_BYTES, DEFAULT_WORKSPACE_QUOTA, DEFAULT_WORKSPACE_ROOT,
+                                QuotaExceeded, WorkspaceFull, WorkspaceManager)
+
+# Modules the analysis jobs import, loaded ahead of the first upload
+PRELOAD_MODULES = ("fitsmart.engine", "fitsmart.storage", "fitsmart.leaderboard")
+
+# "pipelined" runs decoding and pose inference on their own threads, "segments" splits the
+# video into time segments analyzed by ANALYSIS_WORKERS processes, "sequential" does neither
+ANALYSIS_MODE = st.secrets.get("ANALYSIS_MODE", "pipelined")
+ANALYSIS_WORKERS = st.secrets.get("ANALYSIS_WORKERS", os.cpu_count())
+# "adaptive" skips pose inference on static stretches and samples densely near rep thresholds
+FRAME_SAMPLING = st.secrets.get("FRAME_SAMPLING", "fixed")
+# "ffmpeg" decodes only the sampled frames, rotated and scaled to the analysis size by ffmpeg
+VIDEO_DECODER = st.secrets.get("VIDEO_DECODER", "ffmpeg")
+# libx264 speed/quality trade-off of the annotated video: "fast", "balanced" or "quality"
+ENCODE_PRESET = st.secrets.get("ENCODE_PRESET", "balanced")
+# Per-stage timings are shown under the results and logged to stderr as JSON lines
+METRICS_ENABLED = st.secrets.get("METRICS_ENABLED", True)
+if METRICS_ENABLED:
+    configure_logging()
+
+# Landmark cache shared by all sessions, so re-uploads of the same clip skip pose inference
+@st.cache_resource
+def get_landmark_cache():
+    return LandmarkCache(
+        st.secrets.get("LANDMARK_CACHE_DIR", DEFAULT_CACHE_DIR),
+        max_bytes=st.secrets.get("LANDMARK_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES),
+    )
+
+# Landmark traces of every recorded workout, so the counts can be recomputed after a change
+# to the rep logic without the video (`python -m fitsmart.rescore`); SAVE_TRACES turns them off
+@st.cache_resource
+def get_trace_store():
+    if not st.secrets.get("SAVE_TRACES", True):
+        return None
+    return TraceStore(st.secrets.get("TRACE_DIR", DEFAULT_TRACE_DIR))
+
+# Analyses run as background jobs on a worker pool shared by all sessions: at most
+# ANALYSIS_CONCURRENCY at a time, with up to ANALYSIS_QUEUE_DEPTH uploads waiting
+@st.cache_resource
+def get_job_queue():
+    return JobQueue(
+        max_workers=st.secrets.get("ANALYSIS_CONCURRENCY", 2),
+        max_queued=st.secrets.get("ANALYSIS_QUEUE_DEPTH", 16),
+    )
+
+# Clips already recorded as a workout, by (username, upload sha256): analyzing the same clip
+# again with other settings (e.g. counts only) shows its counts without recording it twice
+RECORD_DEDUP_SECONDS = 24 * 3600
+
+@st.cache_resource
+def get_recorded_uploads():
+    return OnceLog(retention=RECORD_DEDUP_SECONDS)
+
+# Import the analysis modules, connect to the workout storage and load the pose models.
+# Jobs that start meanwhile wait on the same imports, then load their own estimator
+def preload_analysis(pool):
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
+    backend_from_secrets(st.secrets)
+    pool.warm()
+
+# Pose estimators kept loaded between uploads (one per concurrent analysis by default) and
+# loaded in the background on startup, so a new upload starts on its first frame at once.
+# POSE_MODEL_COMPLEXITY: 0 (lite, fastest), 1 (full) or 2 (heavy, most accurate)
+@st.cache_resource
+def get_pose_pool():
+    pool = PosePool(
+        size=st.secrets.get("POSE_POOL_SIZE", st.secrets.get("ANALYSIS_CONCURRENCY", 2)),
+        model_complexity=st.secrets.get("POSE_MODEL_COMPLEXITY", DEFAULT_MODEL_COMPLEXITY),
+    )
+    threading.Thread(target=preload_analysis, args=(pool,), name="fitsmart-preload", daemon=True).start()
+    return pool
+
+get_pose_pool()
+
+# Whether a browser session is still connected to this server
+def session_alive(session_id):
+    return runtime.exists() and runtime.get_instance().is_active_session(session_id)
+
+# Every job gets its own directory with a WORKSPACE_QUOTA_BYTES quota, and all of them
+# together stay under WORKSPACE_MAX_BYTES; see fitsmart.workspace
+@st.cache_resource
+def get_workspaces():
+    workspaces = WorkspaceManager(
+        st.secrets.get("WORKSPACE_DIR", DEFAULT_WORKSPACE_ROOT),
+        quota=st.secrets.get("WORKSPACE_QUOTA_BYTES", DEFAULT_WORKSPACE_QUOTA),
+        max_bytes=st.secrets.get("WORKSPACE_MAX_BYTES", DEFAULT_WORKSPACE_MAX_BYTES),
+        session_alive=session_alive,
+    )
+    workspaces.start_sweeper()
+    return workspaces
+
+def analyze_and_record(job, workspace, output_path, username, upload_hash, recorded_on_android, cache, pose_pool,
+                       trace_store, metrics):
+    """
+    Job body, run on a worker thread: analyze the upload and record the workout.
+
+    Runs once per job, so page reruns neither restart the analysis nor record it twice, and
+    records a clip only once per user (see get_recorded_uploads). A job whose record step
+    failed is not reused, so uploading the clip again retries it.
+    """
+    from fitsmart.engine import analyze_video
+    from fitsmart.leaderboard import shared_index
+    from fitsmart.storage import RollupUpdateFailed, record_workout
+
+    # Workout storage (DynamoDB by default) shared by all pages and sessions; see fitsmart.backend
+    storage = backend_from_secrets(st.secrets)
+    # Running counts and a preview for the page to poll (see show_job_progress below)
+    job.live = ProgressChannel()
+    # The annotated video may use what the upload left of the quota; the encode stops beyond it
+    result = analyze_video(workspace.file("upload.mp4"), output_path, recorded_on_android, mode=ANALYSIS_MODE,
+                           workers=ANALYSIS_WORKERS, on_progress=job.report,
+                           sampling=FRAME_SAMPLING, decoder=VIDEO_DECODER, cache=cache,
+                           metrics=metrics, encode_preset=ENCODE_PRESET, pose_pool=pose_pool,
+                           keep_track=trace_store is not None, progress=job.live,
+                           max_output_bytes=workspace.quota - workspace.usage(), video_digest=upload_hash)
+    workspace.check_quota()
+
+    # ✅ Insert into DynamoDB
+    # current_time = datetime.datetime.now() #.isoformat()
+    current_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+    record_error = rollup_error = None
+    recorded_uploads = get_recorded_uploads()
+    record_key = (username, upload_hash)
+    already_recorded = not recorded_uploads.claim(record_key)
+    if not already_recorded:
+        try:
+            with metrics.stage("dynamodb_put"):
+                record_workout(storage.workouts, storage.rollups, username, current_time,
+                               result.squat_count, result.pushup_count)
+            written_at = time.time()
+            # Keep this server's leaderboard index current without waiting for its next rebuild
+            # (an index loaded after the write already counts the workout)
+            leaderboard = shared_index(storage.rollups, create=False)
+            if leaderboard is not None:
+                leaderboard.record(username, current_time, result.squat_count, result.pushup_count,
+                                   written_at=written_at)
+        except RollupUpdateFailed as e:
+            # The workout is stored: it must not be recorded again, only the leaderboard lags
+            rollup_error = str(e)
+        except Exception as e:
+            record_error = str(e)
+            recorded_uploads.release(record_key)
+            job.reusable = False
+
+    if trace_store is not None and not already_recorded and record_error is None and result.track is not None:
+        try:
+            with metrics.stage("trace_store", items=len(result.track)):
+                trace_store.save(username, current_time, result.track, result.fps,
+                                 result.squat_count, result.pushup_count)
+        except OSError:
+            # Without its trace the workout only cannot be re-scored later
+            pass
+
+    metrics.emit()
+    return {"result": result, "record_error": record_error, "rollup_error": rollup_error,
+            "already_recorded": already_recorded,
+            "metrics": metrics.rows() if metrics.enabled else None}
+
+# When a job ends its upload is deleted; an annotated video is kept while the job is remembered
+def release_workspace(job, workspace, keep_seconds):
+    workspace.discard("upload.mp4")
+    if job.status == FAILED or job.result["result"].output_path is None:
+        workspace.close()
+    else:
+        workspace.keep_for(keep_seconds)
 
 # Streamlit UI
 st.title("📹 Upload & Analyze")
 
 st.info("Example screenshots of exercises being performed:")
 
-image_urls = [
-    "https://raw.githubusercontent.com/darigain/fitsmart/main/visuals/squat_down.png",  # Replace with actual image path or URL
-    "https://raw.githubusercontent.com/darigain/fitsmart/main/visuals/squat_up.png",
-    "https://raw.githubusercontent.com/darigain/fitsmart/main/visuals/pushup_down.png",
-    "https://raw.githubusercontent.com/darigain/fitsmart/main/visuals/pushup_up.png"
-]
+# Bundled in visuals/ (see fitsmart.assets)
+image_names = ["squat_down.png", "squat_up.png", "pushup_down.png", "pushup_up.png"]
 
 with st.expander("👉Click to view images👈", expanded=False):
     # Create two main columns for the 2x2 layout
@@ -97,18 +201,18 @@ with st.expander("👉Click to view images👈", expanded=False):
     
     # Display images in the first row
     with col1:
-        st.image(image_urls[0], use_container_width=True)  # First image in the first column
+        asset_image(image_names[0], use_container_width=True)  # First image in the first column
     with col2:
-        st.image(image_urls[1], use_container_width=True)  # Second image in the second column
+        asset_image(image_names[1], use_container_width=True)  # Second image in the second column
     
     # Create another two columns for the second row
     col3, col4 = st.columns(2)
     
     # Display images in the second row
     with col3:
-        st.image(image_urls[2], use_container_width=True)  # Third image in the first column
+        asset_image(image_names[2], use_container_width=True)  # Third image in the first column
     with col4:
-        st.image(image_urls[3], use_container_width=True)  # Fourth image in the second column
+        asset_image(image_names[3], use_container_width=True)  # Fourth image in the second column
 
 st.markdown("""
 💡 **The easiest way to start:**  
@@ -124,130 +228,146 @@ st.markdown("""
 # Username input
 username = st.text_input("Enter your username:")
 recorded_on_android = st.checkbox("Recorded using an Android front camera? (If video is upside down)")
+counts_only = st.checkbox("Counts only (faster, skips the annotated video)")
 
 # Upload video
 uploaded_file = st.file_uploader("Upload a video file", type=["mp4", "mov", "avi"])
 
 if username and uploaded_file:
-    # Save file temporarily
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-    temp_file.write(uploaded_file.read())
-    video_path = temp_file.name
-
-    cap = cv2.VideoCapture(video_path)
-
-    # Progress bar in Streamlit
-    progress_bar = st.progress(0)
-
-    squat_count, pushup_count = 0, 0
-    squat_phase, pushup_phase = "up", "up"
-    frame_count, frame_skip = 0, 3
-    processed_frames = []
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-    with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Skip frames for performance
-            if frame_count % frame_skip != 0:
-                frame_count += 1
-                continue
-            frame_count += 1
-            
-            frame = fix_video_orientation(frame, recorded_on_android)
-            
-            # Resize frame for performance
-            frame = cv2.resize(frame, (240, 426)) # (480, 640)
-
-            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = pose.process(image)
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-
-            if results.pose_landmarks:
-                mp_drawing.draw_landmarks(image, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
-
-                landmarks = results.pose_landmarks.landmark
-                keypoints = {
-                    "RIGHT_SHOULDER": [landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].x,
-                                       landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].y],
-                    "RIGHT_HIP": [landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value].x,
-                                  landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value].y],
-                    "RIGHT_KNEE": [landmarks[mp_pose.PoseLandmark.RIGHT_KNEE.value].x,
-                                   landmarks[mp_pose.PoseLandmark.RIGHT_KNEE.value].y],
-                    "RIGHT_WRIST": [landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value].x,
-                                    landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value].y],
-                    "RIGHT_ANKLE": [landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE.value].x,
-                                    landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE.value].y],
-                    "RIGHT_ELBOW": [landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW.value].x,
-                                    landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW.value].y]
-                }
-
-                exercise = detect_exercise_type(keypoints)
-
-                if exercise == "squat":
-                    knee_angle = calculate_angle(keypoints["RIGHT_HIP"], keypoints["RIGHT_KNEE"], keypoints["RIGHT_ANKLE"])
-                    hip_angle = calculate_angle(keypoints["RIGHT_KNEE"], keypoints["RIGHT_HIP"], keypoints["RIGHT_SHOULDER"])
-                    current_phase = "down" if (knee_angle < 90) & (hip_angle < 100) else "up"
-                    squat_count, squat_phase = count_reps(current_phase, squat_phase, squat_count)
-
-                elif exercise == "push-up":
-                    elbow_angle = calculate_angle(keypoints["RIGHT_SHOULDER"], keypoints["RIGHT_ELBOW"], keypoints["RIGHT_WRIST"])
-                    knee_shoulder_angle = calculate_angle(keypoints["RIGHT_SHOULDER"], keypoints["RIGHT_KNEE"], 
-                                                  [keypoints["RIGHT_KNEE"][0], keypoints["RIGHT_KNEE"][1] - 1])
-                    current_phase = "down" if (elbow_angle < 100) & (knee_shoulder_angle > 65) else "up"
-                    pushup_count, pushup_phase = count_reps(current_phase, pushup_phase, pushup_count)
-
-                # Draw exercise type and counts on the frame
-                cv2.putText(image, f"Exercise: {exercise}", (50, 50),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2, cv2.LINE_AA)
-                cv2.putText(image, f"Squats: {squat_count} ({squat_phase})", (50, 100),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2, cv2.LINE_AA)
-                cv2.putText(image, f"Push-Ups: {pushup_count} ({pushup_phase})", (50, 150),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2, cv2.LINE_AA)
-            
-            progress_value = min(1.0, max(0.0, frame_count / max(1, total_frames)))
-            progress_bar.progress(progress_value)
-            processed_frames.append(image)
-
-    cap.release()
+    queue = get_job_queue()
+    # One job per upload and settings; its id survives reruns of this session
+    jobs = st.session_state.setdefault("analysis_jobs", {})
+    upload_key = (username, uploaded_file.file_id, recorded_on_android, counts_only)
+    job = queue.get(jobs.get(upload_key))
+
+    if job is None:
+        metrics = Metrics("upload", enabled=METRICS_ENABLED, username=username, mode=ANALYSIS_MODE,
+                          sampling=FRAME_SAMPLING, decoder=VIDEO_DECODER)
+
+        # The same clip uploaded again with the same settings joins the existing job
+        upload_hash = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+        job_key = (username, upload_hash, recorded_on_android, counts_only, ANALYSIS_MODE, FRAME_SAMPLING,
+                   VIDEO_DECODER, ENCODE_PRESET)
+        job = queue.find(job_key)
+
+        if job is None:
+            workspaces = get_workspaces()
+            try:
+                workspace = workspaces.create(owner=get_script_run_ctx().session_id)
+            except WorkspaceFull:
+                st.warning("The server is busy analyzing other videos. Please try again in a few minutes.")
+                st.stop()
+
+            # Copy the upload to the job's directory in chunks, without another copy in memory
+            try:
+                with metrics.stage("upload_spool", items=uploaded_file.size):
+                    uploaded_file.seek(0)
+                    workspace.spool(uploaded_file, "upload.mp4")
+            except QuotaExceeded as e:
+                workspace.close()
+                st.error(f"Could not analyze the video: {e}")
+                st.stop()
+
+            final_video_path = None if counts_only else workspace.file("annotated.mp4")
+            try:
+                job, queued = queue.submit_or_join(
+                    job_key, analyze_and_record, workspace, final_video_path, username, upload_hash,
+                    recorded_on_android, get_landmark_cache(), get_pose_pool(), get_trace_store(), metrics,
+                    on_finish=lambda job: release_workspace(job, workspace, queue.retention))
+            except QueueFull:
+                workspace.close()
+                st.warning("The server is busy analyzing other videos. Please try again in a few minutes.")
+                st.stop()
+            # Another session submitted the same clip meanwhile: its job (and workspace) is used
+            if not queued:
+                workspace.close()
+
+        jobs[upload_key] = job.id
+
+    if not job.finished:
+        # Poll the job without blocking the page, at the rate its progress is published; rerun the
+        # page once it is done
+        @st.fragment(run_every=PUBLISH_INTERVAL)
+        def show_job_progress():
+            if job.finished:
+                st.rerun()
+            position = queue.position(job)
+            if position:
+                st.info(f"⏳ Waiting for a free worker: {position} video{'s' if position > 1 else ''} ahead of yours.")
+            else:
+                st.info("⚙️ Analyzing your video...")
+            # Progress bar in Streamlit
+            st.progress(job.progress)
+
+            # Partial results, so a badly framed video shows within seconds
+            snapshot = job.live.snapshot() if job.live is not None else None
+            if snapshot is None or not snapshot.version:
+                return
+            preview_col, counts_col = st.columns([1, 2])
+            with preview_col:
+                if snapshot.thumbnail is not None:
+                    st.image(snapshot.thumbnail, caption="Live preview")
+            with counts_col:
+                st.write(f"**🏋️ Squats so far:** {snapshot.counts.get('squat', 0)}")
+                st.write(f"**💪 Push-Ups so far:** {snapshot.counts.get('push-up', 0)}")
+                if snapshot.exercise is None:
+                    st.warning("No person detected yet. Film the whole body from the side, in vertical orientation.")
+                elif snapshot.exercise == "unknown":
+                    st.caption("Person detected, no squat or push-up recognized yet.")
+                else:
+                    st.caption(f"Current exercise: {snapshot.exercise}")
+
+        show_job_progress()
+        st.stop()
+
+    if job.status == FAILED:
+        st.error(f"Could not analyze the video: {job.error}")
+        st.stop()
+
+    result = job.result["result"]
+    squat_count, pushup_count = result.squat_count, result.pushup_count
 
     st.success("Processing Complete!")
     st.write(f"**🏋️ Total Squats:** {squat_count}")
     st.write(f"**💪 Total Push-Ups:** {pushup_count}")
-
-    # ✅ Insert into DynamoDB
-    # current_time = datetime.datetime.now() #.isoformat()
-    current_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3] 
-    try:
-        table.put_item(
-            Item={
-                "username": username,
-                "datetime": current_time,
-                "squat_count": squat_count,
-                "pushup_count": pushup_count
-            }
-        )
+    job_stats = f"Frames written: {result.sampled_frames} · Pose inferences: {result.inferences}"
+    if result.inferences_per_rep is not None:
+        job_stats += f" ({result.inferences_per_rep:.1f} per rep)"
+    st.caption(f"{job_stats} · Server process peak memory: {result.process_peak_rss_mb:.0f} MB")
+    cache_stats = get_landmark_cache().stats()
+    st.caption(f"Landmark cache: {'hit' if result.cache_hit else 'miss'} · "
+               f"hit rate {cache_stats['hit_rate']:.0%} · {cache_stats['bytes_saved'] / 1e6:.1f} MB of video not re-analyzed")
+
+    if job.result["record_error"] is not None:
+        st.error(f"Error inserting record into DynamoDB: {job.result['record_error']}. "
+                 "Upload the clip again to retry.")
+    elif job.result["rollup_error"] is not None:
+        st.warning(f"Record inserted into DynamoDB, but the leaderboard totals were not updated: "
+                   f"{job.result['rollup_error']}. Your workout is saved, no need to upload it again.")
+    elif job.result["already_recorded"]:
+        st.info("This clip was already recorded as a workout; it was not added again.")
+    else:
         st.success("Record inserted into DynamoDB successfully!")
-    except Exception as e:
-        st.error(f"Error inserting record into DynamoDB: {e}")
-
-    # Save the video and re-encode it
-    temp_output_path = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4").name
-    final_video_path = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4").name
-
-    # Save the video using OpenCV
-    height, width, _ = processed_frames[0].shape
-    out = cv2.VideoWriter(temp_output_path, cv2.VideoWriter_fourcc(*'mp4v'), 10, (width, height))
-    for frame in processed_frames:
-        out.write(frame)
-    out.release()
-
-    # Re-encode with FFmpeg
-    reencode_video(temp_output_path, final_video_path)
 
-    # Display the re-encoded video
-    st.video(final_video_path)
+    if job.result["metrics"] is not None:
+        with st.expander("⏱️ Performance breakdown", expanded=False):
+            st.table(job.result["metrics"])
+
+    if not counts_only:
+        if result.output_path is None:
+            st.warning("No frames could be read from the uploaded video.")
+            st.stop()
+
+        if not os.path.exists(result.output_path):
+            # Deleted by the workspace sweeper: forget the job so the clip is analyzed again
+            # (it is not recorded twice, see get_recorded_uploads)
+            job.reusable = False
+            jobs.pop(upload_key, None)
+            st.warning("The annotated video has been deleted from the server.")
+            if st.button("🔁 Analyze the clip again"):
+                st.rerun()
+            st.stop()
+
+        # Display the annotated video
+        st.video(result.output_path)
     st.info("👈 Use the sidebar to find your last submission on the 📊 Statistics page, or check your position on the 🏆 Leaderboard page!")
@@ -1,104 +1,111 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import datetime
-import boto3
-
-# Load credentials from Streamlit secrets
-AWS_ACCESS_KEY_ID = st.secrets["AWS_ACCESS_KEY_ID"]
-AWS_SECRET_ACCESS_KEY = st.secrets["AWS_SECRET_ACCESS_KEY"]
-AWS_REGION = st.secrets["AWS_REGION"]
-DYNAMODB_TABLE = st.secrets["DYNAMODB_TABLE"]
-
-# Initialize DynamoDB client
-dynamodb = boto3.resource(
-    "dynamodb",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION,
-)
-table = dynamodb.Table(DYNAMODB_TABLE)
 
-# DATA LOADING FUNCTION (from DynamoDB)
-@st.cache_data(show_spinner=False)
-def load_data():
+from fitsmart.backend import backend_from_secrets
+from fitsmart.instrument import Metrics, configure_logging
+from fitsmart.cube import FREQUENCIES, RollupCube, downsample
+from fitsmart.datacache import WorkoutCache
+from fitsmart.storage import list_users, load_workouts, load_workouts_since
+from fitsmart.ui import paginated_table
+
+# Workout storage (DynamoDB by default) shared by all pages and sessions; see fitsmart.backend
+storage = backend_from_secrets(st.secrets)
+table = storage.workouts
+# Per-user rollups (see fitsmart.storage); the all-time bucket lists every user
+rollups = storage.rollups
+
+# Number of parallel scan segments used to read all users' records
+SCAN_SEGMENTS = st.secrets.get("SCAN_SEGMENTS", 4)
+
+# Cached records are refreshed incrementally after this many seconds
+DATA_TTL_SECONDS = st.secrets.get("DATA_TTL_SECONDS", 300)
+
+# Load timings are logged to stderr as JSON lines
+METRICS_ENABLED = st.secrets.get("METRICS_ENABLED", True)
+if METRICS_ENABLED:
+    configure_logging()
+
+# DATA LOADING FUNCTIONS (from DynamoDB)
+@st.cache_data(show_spinner=False, ttl=DATA_TTL_SECONDS)
+def load_users():
+    """
+    Usernames for the user filter, one rollup item per user.
+    """
+    try:
+        return list_users(rollups)
+    except Exception as e:
+        st.error(f"Error retrieving users from DynamoDB: {e}")
+        return []
+
+# Users whose records (and their cube) stay cached, besides everyone's, and for how many seconds
+CACHED_USERS = st.secrets.get("CACHED_USERS", 16)
+USER_CACHE_SECONDS = st.secrets.get("USER_CACHE_SECONDS", 3600)
+
+# Records of one user (or of everyone, for None) shared by all sessions; see fitsmart.datacache
+@st.cache_resource(max_entries=CACHED_USERS + 1, ttl=USER_CACHE_SECONDS)
+def get_workout_cache(username=None):
+    return WorkoutCache(
+        lambda: load_workouts(table, username, SCAN_SEGMENTS),
+        lambda since: load_workouts_since(table, rollups, since, username),
+        ttl=DATA_TTL_SECONDS,
+    )
+
+def load_data(username=None, refresh=False):
     """
     Connect to DynamoDB and load exercise_records data into a DataFrame.
+
+    A single user's records are read with a key Query, all records with a parallel scan. After
+    the first load only records newer than the cached ones are fetched.
     """
+    metrics = Metrics("statistics_load", enabled=METRICS_ENABLED, user_query=username is not None,
+                      refresh=refresh)
     try:
-        response = table.scan()  # Fetch all records from DynamoDB
-        items = response.get("Items", [])
-        if not items:
-            return pd.DataFrame()  # Return an empty DataFrame if no records exist
-
-        df = pd.DataFrame(items)
-        if "datetime" in df.columns:
-            df["datetime"] = pd.to_datetime(df["datetime"])  # Ensure datetime format
+        with metrics.stage("load_records"):
+            df = get_workout_cache(username).get(refresh)
+        metrics.emit()
         return df
 
     except Exception as e:
         st.error(f"Error retrieving data from DynamoDB: {e}")
         return pd.DataFrame()
 
+# Day/week/month sums of the loaded records; see fitsmart.cube
+def load_cube(username=None):
+    return get_workout_cache(username).derive("cube", RollupCube)
+
 st.title("Exercise Statistics")
 st.write("Are you a push-up or squat hero? 🏋️‍♀️💪 Check it out! 🔍")
 
 # ------------------------------
 # Refresh Button
 # ------------------------------
-if st.button("Refresh Data"):
-    st.cache_data.clear()
-    st.rerun()  # Force a rerun to load fresh data
-
-# Load the full data from DynamoDB
-data_full = load_data()
-
-if data_full.empty:
-    st.warning("No data found in the database.")
-    st.stop()
+# Fetches only the records added since the last load
+refresh = st.button("Refresh Data")
+if refresh:
+    load_users.clear()
 
 # Sidebar widget for filtering by user
-user_options = sorted(data_full['username'].unique().tolist())
+user_options = load_users()
 selected_user = st.selectbox("Select a user", ["All Users"] + user_options)
 
-# Filter the data based on the selected user.
-if selected_user != "All Users":
-    df_filtered = data_full[data_full['username'] == selected_user].copy()
-else:
-    df_filtered = data_full.copy()
+# Load the selected user's records (or everyone's) from DynamoDB
+df_filtered = load_data(None if selected_user == "All Users" else selected_user, refresh)
 
-# Sidebar widget for aggregation frequency.
-frequency = st.selectbox("Select aggregation frequency", ["Daily", "Weekly", "Monthly"])
+if df_filtered.empty:
+    st.warning("No data found in the database.")
+    st.stop()
 
-# Prepare data for plotting based on the selected frequency.
-df_chart = df_filtered.copy()  # Work on a copy so as not to alter the original filtered data.
+# Sidebar widget for aggregation frequency.
+frequency = st.selectbox("Select aggregation frequency", list(FREQUENCIES))
 
-if frequency == "Daily":
-    df_chart['date'] = df_chart['datetime'].dt.date
-    df_grouped = (
-        df_chart.groupby("date")[["squat_count", "pushup_count"]]
-                .sum()
-                .reset_index()
-    )
-    df_grouped['date'] = pd.to_datetime(df_grouped['date'])
-elif frequency == "Weekly":
-    df_chart['week'] = df_chart['datetime'].dt.to_period('W').apply(lambda r: r.start_time)
-    df_grouped = (
-        df_chart.groupby("week")[["squat_count", "pushup_count"]]
-                .sum()
-                .reset_index()
-                .rename(columns={'week': 'date'})
-    )
-elif frequency == "Monthly":
-    df_chart['month'] = df_chart['datetime'].dt.to_period('M').apply(lambda r: r.start_time)
-    df_grouped = (
-        df_chart.groupby("month")[["squat_count", "pushup_count"]]
-                .sum()
-                .reset_index()
-                .rename(columns={'month': 'date'})
-    )
-else:
-    df_grouped = df_chart.copy()
+# Look up the sums per period, precomputed once per data load for every frequency.
+cube = load_cube(None if selected_user == "All Users" else selected_user)
+# Long histories are merged into at most MAX_CHART_POINTS points before plotting.
+df_grouped, periods_per_point = downsample(cube.series(frequency))
+chart_title = f"Exercise Counts ({frequency} Aggregation)"
+if periods_per_point > 1:
+    chart_title = f"Exercise Counts ({frequency} Aggregation, {periods_per_point} periods per point)"
 
 # Create an interactive line plot with two lines (one for squat_count, one for pushup_count).
 fig = px.line(
@@ -107,7 +114,7 @@ fig = px.line(
     y=["squat_count", "pushup_count"],
     markers=True,
     labels={"value": "Count", "date": "Date", "variable": "Exercise"},
-    title=f"Exercise Counts ({frequency} Aggregation)"
+    title=chart_title
 )
 
 st.plotly_chart(fig, use_container_width=True)
@@ -116,8 +123,8 @@ st.plotly_chart(fig, use_container_width=True)
 # NEW FEATURE: HTML Table "Recent User's Data"
 # --------------------------------------------------------------------------
 st.subheader("Recent User's Data")
-# Sort the filtered data by datetime in descending order.
-df_recent = df_filtered.sort_values(by="datetime", ascending=False)
-# Convert the DataFrame to an HTML table without the default index.
-html_table = df_recent.to_html(index=False, classes="table table-striped")
-st.markdown(html_table, unsafe_allow_html=True)
+# Records are cached in datetime order; reverse the view (no copy) for newest first.
+df_recent = df_filtered.iloc[::-1]
+# Convert only the page on screen to an HTML table without the default index.
+paginated_table(lambda start, stop: df_recent.iloc[start:stop], len(df_recent),
+                key=f"recent_page_{selected_user}", classes="table table-striped")
@@ -1,62 +1,53 @@
 import streamlit as st
-import boto3
 import pandas as pd
 import plotly.express as px
-import datetime
-
-# AWS Credentials (Using Streamlit Secrets)
-AWS_ACCESS_KEY_ID = st.secrets["AWS_ACCESS_KEY_ID"]
-AWS_SECRET_ACCESS_KEY = st.secrets["AWS_SECRET_ACCESS_KEY"]
-AWS_REGION = st.secrets["AWS_REGION"]
-DYNAMODB_TABLE = st.secrets["DYNAMODB_TABLE"]
-
-# Connect to DynamoDB
-dynamodb = boto3.resource(
-    "dynamodb",
-    region_name=AWS_REGION,
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-)
 
-table = dynamodb.Table(DYNAMODB_TABLE)
+from fitsmart.backend import backend_from_secrets
+from fitsmart.instrument import Metrics, configure_logging
+from fitsmart.leaderboard import shared_index
+from fitsmart.storage import TIMEFRAMES
+from fitsmart.ui import paginated_table
+
+# Workout storage (DynamoDB by default) shared by all pages and sessions; see fitsmart.backend
+storage = backend_from_secrets(st.secrets)
+# Per-user totals and daily/hourly buckets, maintained when workouts are recorded
+rollups = storage.rollups
+
+# Rollups are re-read after this many seconds (or on "Refresh Data")
+DATA_TTL_SECONDS = st.secrets.get("DATA_TTL_SECONDS", 300)
+
+# Load timings are logged to stderr as JSON lines
+METRICS_ENABLED = st.secrets.get("METRICS_ENABLED", True)
+if METRICS_ENABLED:
+    configure_logging()
+
+# Leaderboard metric of each exercise filter option
+EXERCISE_METRICS = {"All": "total_count", "Squats": "squat_count", "Push-ups": "pushup_count"}
 
 # DATA LOADING FUNCTION
-@st.cache_data(show_spinner=False)
-def load_data():
+def load_index(refresh=False):
     """
-    Connects to DynamoDB and loads data from the exercise_records table into a DataFrame.
+    The in-memory leaderboard index shared by all sessions, built from the rollups.
+
+    It is rebuilt from DynamoDB when older than DATA_TTL_SECONDS or on refresh; workouts
+    recorded by this server are added to it as they are stored.
     """
+    metrics = Metrics("leaderboard_load", enabled=METRICS_ENABLED, refresh=refresh)
     try:
-        response = table.scan()
-        items = response.get("Items", [])
-        
-        if not items:
-            return pd.DataFrame(columns=["username", "datetime", "squat_count", "pushup_count"])
-
-        df = pd.DataFrame(items)
-        df["datetime"] = pd.to_datetime(df["datetime"])  # Convert datetime to pandas format
-        df["squat_count"] = df["squat_count"].astype(int)
-        df["pushup_count"] = df["pushup_count"].astype(int)
-        
-        return df
+        with metrics.stage("leaderboard_index"):
+            index = shared_index(rollups, max_age=0 if refresh else DATA_TTL_SECONDS)
+        metrics.emit()
+        return index
     except Exception as e:
         st.error(f"Error retrieving data: {e}")
-        return pd.DataFrame()
+        st.stop()
 
 st.title("Leaderboard")
 st.write("🏆 Champions, you are absolutely crushing it! 🌟")
 
 # Refresh button (in the main area)
-if st.button("Refresh Data"):
-    load_data.clear()  # Clear the cache for load_data
-    st.rerun()  # Force a rerun to load fresh data
-
-# Load data from DynamoDB.
-df = load_data()
-
-if df.empty:
-    st.warning("No data available from the database.")
-    st.stop()
+# Only the rollups are re-read (one item per user and bucket), never the workout records
+refresh = st.button("Refresh Data")
 
 # ------------------------------
 # EXERCISE FILTER SELECTION
@@ -72,42 +63,29 @@ exercise_filter = st.selectbox(
 # ------------------------------
 timeframe = st.selectbox(
     "Select Timeframe",
-    options=["Today", "Last 24 hours", "Last 7 days", "Last 30 days", "All Time"],
+    options=list(TIMEFRAMES),
     index=1
 )
 
-# ------------------------------
-# APPLY TIMEFRAME FILTER
-# ------------------------------
-now = datetime.datetime.now()
-today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)  # Start of today
-if timeframe == "Today":
-    df = df[df["datetime"] >= today_start]
-elif timeframe == "Last 24 hours":
-    threshold = now - datetime.timedelta(hours=24)
-    df = df[df["datetime"] >= threshold]
-elif timeframe == "Last 7 days":
-    threshold = now - datetime.timedelta(days=7)
-    df = df[df["datetime"] >= threshold]
-elif timeframe == "Last 30 days":
-    threshold = now - datetime.timedelta(days=30)
-    df = df[df["datetime"] >= threshold]
-# For "All Time", no filtering is applied.
+# Best users of the selected timeframe (rounded to whole hours/days) from the leaderboard index.
+index = load_index(refresh)
+metric = EXERCISE_METRICS[exercise_filter]
 
-# ------------------------------
-# AGGREGATE DATA BY USER
-# ------------------------------
-agg_df = df.groupby("username", as_index=False)[["squat_count", "pushup_count"]].sum()
+def top_users(start, stop):
+    """
+    Rows [start, stop) of the leaderboard, ranked by the selected exercise.
+    """
+    df = pd.DataFrame(index.top(timeframe, metric, k=stop)[start:],
+                      columns=["rank", "username", "total_count", "squat_count", "pushup_count"])
+    # Apply exercise filter:
+    df["total_count"] = df[metric]
+    return df
 
-# Apply exercise filter:
-if exercise_filter == "Squats":
-    agg_df["total_count"] = agg_df["squat_count"]
-elif exercise_filter == "Push-ups":
-    agg_df["total_count"] = agg_df["pushup_count"]
-else:  # All
-    agg_df["total_count"] = agg_df["squat_count"] + agg_df["pushup_count"]
+agg_df = top_users(0, 10)
 
-agg_df = agg_df.sort_values(by="total_count", ascending=False)
+if agg_df.empty:
+    st.warning("No data available from the database.")
+    st.stop()
 
 # ------------------------------
 # VISUALIZATION: TOP 10 USERS HORIZONTAL BAR CHART
@@ -157,12 +135,18 @@ st.plotly_chart(fig, use_container_width=True)
 # ------------------------------
 # TABLE: TOP 100 USERS LEADERBOARD
 # ------------------------------
-top100 = agg_df.head(100).copy()
-top100 = top100.reset_index(drop=True)
-top100["Rank"] = top100.index + 1
-# Rearranging columns: Rank, username, total_count, squat_count, pushup_count.
-top100 = top100[["Rank", "username", "total_count", "squat_count", "pushup_count"]]
-
 st.subheader("Top 100 Users Leaderboard")
-html_table = top100.to_html(index=False)
-st.markdown(html_table, unsafe_allow_html=True)
+# Only the rows of the page on screen are fetched from the index and rendered.
+paginated_table(lambda start, stop: top_users(start, stop).rename(columns={"rank": "Rank"}),
+                min(100, index.size(timeframe)), key=f"top100_page_{timeframe}_{exercise_filter}")
+
+# ------------------------------
+# RANK LOOKUP
+# ------------------------------
+my_username = st.text_input("Find your rank (username):")
+if my_username:
+    my_rank = index.rank(timeframe, metric, my_username)
+    if my_rank is None:
+        st.info(f"No workouts from {my_username} in this timeframe yet.")
+    else:
+        st.success(f"{my_username} is #{my_rank[0]} of {my_rank[1]}!")
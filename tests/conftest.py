@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import make_trace
+from fitsmart.features import LANDMARK_INDEX, to_points
+
+
+@pytest.fixture
+def trace_points():
+    """
+    Factory of (frames, landmarks, 2) landmark arrays of a deterministic synthetic workout,
+    with every 37th frame missing its pose (all NaN).
+    """
+    def make(noise, frames=3000, seed=0):
+        points = to_points(make_trace(frames=frames, noise=noise, seed=seed).landmarks)
+        points[::37] = np.nan
+        return points
+    return make
+
+
+@pytest.fixture
+def pose_frames():
+    """
+    Turns a landmark array into the input of the per-frame counters: (index, keypoints) for
+    every frame, keypoints being a {landmark name: [x, y]} dict, or None without a pose.
+    """
+    def frames(points):
+        for i, row in enumerate(points):
+            if np.isnan(row).any():
+                yield i, None
+            else:
+                yield i, {name: [float(row[j, 0]), float(row[j, 1])] for name, j in LANDMARK_INDEX.items()}
+    return frames
@@ -0,0 +1,22 @@
+import pytest
+
+from fitsmart.features import EXERCISES, RepCounter, analyze_points
+
+
+@pytest.mark.parametrize("noise", [0.002, 0.01])
+def test_analyze_points_matches_rep_counter(trace_points, pose_frames, noise):
+    points = trace_points(noise, seed=1)
+    features = analyze_points(points)
+
+    counter = RepCounter()
+    for i, keypoints in pose_frames(points):
+        # The live pipeline only passes frames with a detected pose to the counter
+        if keypoints is not None:
+            assert counter.update(keypoints) == EXERCISES[features.exercise[i]]
+        assert (counter.squat_count, counter.pushup_count) == (features.counts["squat"][i],
+                                                               features.counts["push-up"][i])
+        assert counter.phase("squat") == ("down" if features.down["squat"][i] else "up")
+        assert counter.phase("push-up") == ("down" if features.down["push-up"][i] else "up")
+
+    assert (counter.squat_count, counter.pushup_count) == (features.squat_count, features.pushup_count)
+    assert features.squat_count > 0 and features.pushup_count > 0
@@ -0,0 +1,25 @@
+import threading
+import time
+
+from fitsmart.instrument import Metrics
+
+
+def test_nested_and_concurrent_stages_keep_their_own_start():
+    metrics = Metrics("test")
+
+    def work():
+        for _ in range(20):
+            with metrics.stage("pose"):
+                with metrics.stage("pose", items=0):
+                    time.sleep(0.001)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    (row,) = metrics.rows()
+    assert (row["calls"], row["items"]) == (160, 80)
+    # Every occurrence covers at least its own sleep; a shared start would lose most of them
+    assert row["seconds"] >= 160 * 0.001
@@ -0,0 +1,23 @@
+import logging
+
+from fitsmart.jobs import DONE, FAILED, JobQueue
+
+
+def test_finished_jobs_have_finish_time_and_failing_on_finish_is_logged(caplog):
+    queue = JobQueue(max_workers=1)
+
+    def broken_on_finish(job):
+        raise ValueError("cleanup failed")
+
+    def fail(job):
+        raise RuntimeError("no pose")
+
+    with caplog.at_level(logging.ERROR, logger="fitsmart.jobs"):
+        done = queue.submit("a", lambda job: 42, on_finish=broken_on_finish)
+        failed = queue.submit("b", fail)
+        queue.shutdown()
+
+    assert (done.status, done.result, done.progress) == (DONE, 42, 1.0)
+    assert (failed.status, failed.error) == (FAILED, "no pose")
+    assert done.finished_at is not None and failed.finished_at is not None
+    assert "on_finish of job 1 failed" in caplog.text
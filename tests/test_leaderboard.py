@@ -0,0 +1,55 @@
+import datetime
+import threading
+import time
+
+from fitsmart import leaderboard
+from fitsmart.leaderboard import build_index, shared_index
+from fitsmart.localdb import InMemoryTable
+from fitsmart.storage import record_workout
+
+
+def now_text():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.000")
+
+
+def make_tables():
+    return (InMemoryTable("exercise_records", "username", "datetime"),
+            InMemoryTable("exercise_records_rollups", "bucket", "username"))
+
+
+def test_record_skips_workouts_the_index_was_loaded_with():
+    workouts, rollups = make_tables()
+    record_workout(workouts, rollups, "ana", now_text(), 10, 5)
+    written_at = time.time()
+    index = build_index(rollups)
+    assert not index.record("ana", now_text(), 10, 5, written_at=written_at)
+    assert index.top("All Time")[0]["total_count"] == 15
+
+    # A workout written after the index was loaded is added to it
+    record_workout(workouts, rollups, "ana", now_text(), 3, 0)
+    assert index.record("ana", now_text(), 3, 0, written_at=time.time())
+    assert index.top("All Time")[0]["total_count"] == 18
+
+
+def test_rebuild_does_not_block_readers_of_the_current_index(monkeypatch):
+    workouts, rollups = make_tables()
+    record_workout(workouts, rollups, "ana", now_text(), 10, 5)
+    current = shared_index(rollups)
+
+    loading, release = threading.Event(), threading.Event()
+    real_build = leaderboard.build_index
+
+    def slow_build(table, now=None):
+        loading.set()
+        release.wait(5)
+        return real_build(table, now)
+
+    monkeypatch.setattr(leaderboard, "build_index", slow_build)
+    rebuild = threading.Thread(target=shared_index, args=(rollups,), kwargs={"max_age": 0})
+    rebuild.start()
+    assert loading.wait(5)
+    # The upload worker still gets the old index while the new one loads
+    assert shared_index(rollups, create=False) is current
+    release.set()
+    rebuild.join(5)
+    assert shared_index(rollups, create=False) is not current
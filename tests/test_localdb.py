@@ -0,0 +1,110 @@
+import pytest
+from boto3.dynamodb.conditions import Key
+
+from fitsmart.localdb import InMemoryTable, LocalTable, SQLiteTable
+from fitsmart.storage import (TOTAL_BUCKET, backfill_rollups, load_workouts_since, parallel_scan, query_all,
+                              record_workout, scan_all)
+
+WORKOUTS = [
+    ("ana", "2025-03-14 09:30:00.000", 20, 10),
+    ("ana", "2025-03-15 18:05:00.000", 12, 0),
+    ("ben", "2025-03-14 11:00:00.000", 0, 25),
+    ("cleo", "2025-03-16 07:45:00.000", 30, 30),
+]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_table(request, tmp_path):
+    def make(name, partition_key, sort_key=None, page_size=2):
+        if request.param == "memory":
+            return InMemoryTable(name, partition_key, sort_key, page_size=page_size)
+        return SQLiteTable(str(tmp_path / "fitsmart.db"), name, partition_key, sort_key, page_size=page_size)
+    return make
+
+
+@pytest.fixture
+def tables(make_table):
+    workouts = make_table("exercise_records", "username", "datetime")
+    rollups = make_table("exercise_records_rollups", "bucket", "username")
+    for workout in WORKOUTS:
+        record_workout(workouts, rollups, *workout)
+    return workouts, rollups
+
+
+def test_local_table_is_abstract():
+    with pytest.raises(TypeError):
+        LocalTable("table", "id")
+
+
+def test_record_workout_updates_rollups(tables):
+    workouts, rollups = tables
+    assert len(workouts) == len(WORKOUTS)
+    total = rollups.get_item(Key={"bucket": TOTAL_BUCKET, "username": "ana"})["Item"]
+    assert (total["squat_count"], total["pushup_count"], total["workouts"]) == (32, 10, 2)
+    assert total["last_datetime"] == "2025-03-15 18:05:00.000"
+    day = rollups.get_item(Key={"bucket": "day#2025-03-14", "username": "ana"})["Item"]
+    assert (day["squat_count"], day["pushup_count"], day["workouts"]) == (20, 10, 1)
+
+
+def test_load_workouts_since(tables):
+    workouts, rollups = tables
+    items = load_workouts_since(workouts, rollups, "2025-03-15 00:00:00.000")
+    assert sorted((item["username"], item["datetime"]) for item in items) == [
+        ("ana", "2025-03-15 18:05:00.000"),
+        ("cleo", "2025-03-16 07:45:00.000"),
+    ]
+    assert load_workouts_since(workouts, rollups, "2025-03-17 00:00:00.000") == []
+    items = load_workouts_since(workouts, rollups, "2025-03-14 10:00:00.000", username="ana")
+    assert [item["datetime"] for item in items] == ["2025-03-15 18:05:00.000"]
+
+
+def test_backfill_rebuilds_recorded_rollups(tables, make_table):
+    workouts, rollups = tables
+    rebuilt = make_table("rebuilt_rollups", "bucket", "username")
+    assert backfill_rollups(workouts, rebuilt) == len(rollups)
+
+    counters = ("squat_count", "pushup_count", "workouts")
+
+    def by_key(table):
+        return {(item["bucket"], item["username"]): tuple(item[name] for name in counters)
+                for item in scan_all(table)}
+
+    assert by_key(rebuilt) == by_key(rollups)
+
+
+def test_numeric_sort_keys_sort_numerically(make_table):
+    table = make_table("readings", "sensor", "offset")
+    for offset in (3, -1, -5, 0, -12, 7):
+        table.put_item(Item={"sensor": "a", "offset": offset})
+    table.put_item(Item={"sensor": "b", "offset": -3})
+
+    # Pages of two items, resumed from LastEvaluatedKey
+    items = list(query_all(table, KeyConditionExpression=Key("sensor").eq("a")))
+    assert [int(item["offset"]) for item in items] == [-12, -5, -1, 0, 3, 7]
+
+    response = table.query(KeyConditionExpression=Key("sensor").eq("a") & Key("offset").between(-6, -1), Limit=10)
+    assert [int(item["offset"]) for item in response["Items"]] == [-5, -1]
+
+
+def test_pagination_resumes_in_key_order(make_table):
+    # More items than an in-memory read takes under the lock at once
+    table = make_table("readings", "sensor", "offset", page_size=7)
+    for sensor in "abc":
+        for offset in range(300):
+            table.put_item(Item={"sensor": sensor, "offset": offset})
+
+    offsets = [int(item["offset"]) for item in query_all(table, KeyConditionExpression=Key("sensor").eq("b"))]
+    assert offsets == list(range(300))
+    backwards = query_all(table, KeyConditionExpression=Key("sensor").eq("b"), ScanIndexForward=False)
+    assert [int(item["offset"]) for item in backwards] == list(range(299, -1, -1))
+
+    keys = [(item["sensor"], int(item["offset"])) for item in scan_all(table)]
+    assert keys == sorted(keys) and len(keys) == 900
+    assert sorted((item["sensor"], int(item["offset"])) for item in parallel_scan(table, segments=4)) == keys
+
+    # A page resumes after its last key even if that item is deleted in between
+    page = table.query(KeyConditionExpression=Key("sensor").eq("a"))
+    table.delete_item(Key=page["LastEvaluatedKey"])
+    page = table.query(KeyConditionExpression=Key("sensor").eq("a"), ExclusiveStartKey=page["LastEvaluatedKey"])
+    assert [int(item["offset"]) for item in page["Items"]] == list(range(7, 14))
+    assert len(table) == 899
@@ -0,0 +1,26 @@
+import pytest
+
+from fitsmart.posepool import PosePool
+
+
+class FlakyPool(PosePool):
+    """
+    A pool whose first estimator fails to load (e.g. a model download error).
+    """
+
+    failures = 1
+
+    def _create(self):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("model download failed")
+        return object()
+
+
+def test_failed_warm_up_keeps_the_pool_capacity():
+    pool = FlakyPool(size=2)
+    with pytest.raises(OSError):
+        pool.warm()
+    assert pool.created == 0
+    pool.warm()
+    assert pool.created == 2
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import make_trace
+from fitsmart.features import to_points
+from fitsmart.rules import DEFAULT_RULES, ExerciseRule, RuleSet, compute_angles, frame_angles
+
+# The default rules without hysteresis or debounce: the original per-frame logic
+PLAIN_RULES = RuleSet([ExerciseRule(rule.name, rule.label, rule.classify, rule.down)
+                       for rule in DEFAULT_RULES.rules])
+
+
+def legacy_counts(points):
+    """
+    Running (squat, push-up) counts of the if-branch logic the rules replaced, frame by frame.
+    """
+    angles = compute_angles(points)
+    squats = pushups = 0
+    squat_phase = pushup_phase = "up"
+    counts = []
+    for i in range(len(points)):
+        a = {name: values[i] for name, values in angles.items()}
+        if not np.isnan(a["stand"]):
+            if a["stand"] < 40:
+                phase = "down" if a["knee"] < 90 and a["hip"] < 100 else "up"
+                squats += squat_phase == "down" and phase == "up"
+                squat_phase = phase
+            elif a["torso"] > 45 and a["hip"] > 100:
+                phase = "down" if a["elbow"] < 100 and a["knee_shoulder"] > 65 else "up"
+                pushups += pushup_phase == "down" and phase == "up"
+                pushup_phase = phase
+        counts.append((squats, pushups))
+    return np.array(counts)
+
+
+@pytest.mark.parametrize("noise", [0.002, 0.01, 0.02])
+def test_plain_rules_match_legacy_logic(trace_points, noise):
+    points = trace_points(noise)
+    evaluation = PLAIN_RULES.evaluate(points)
+    expected = legacy_counts(points)
+    np.testing.assert_array_equal(evaluation.counts["squat"], expected[:, 0])
+    np.testing.assert_array_equal(evaluation.counts["push-up"], expected[:, 1])
+
+
+@pytest.mark.parametrize("rules", [PLAIN_RULES, DEFAULT_RULES], ids=["plain", "default"])
+@pytest.mark.parametrize("noise", [0.002, 0.02])
+def test_counter_matches_evaluate(trace_points, pose_frames, rules, noise):
+    points = trace_points(noise)
+    evaluation = rules.evaluate(points)
+    counter = rules.counter()
+    for i, keypoints in pose_frames(points):
+        if keypoints is not None:
+            counter.update(frame_angles(keypoints, rules.angle_names))
+        for name in rules.names:
+            assert counter.counts[name] == evaluation.counts[name][i]
+            assert counter.down[name] == evaluation.down[name][i]
+
+
+def test_final_counts_match_evaluate_per_video(trace_points):
+    points = trace_points(0.01)
+    bounds = [0, 700, 701, 1900, 3000]
+    segments = np.repeat(np.arange(len(bounds) - 1), np.diff(bounds))
+    counts = DEFAULT_RULES.final_counts(points, segments, len(bounds) - 1)
+    for video, (start, stop) in enumerate(zip(bounds, bounds[1:])):
+        evaluation = DEFAULT_RULES.evaluate(points[start:stop])
+        for name in DEFAULT_RULES.names:
+            assert counts[name][video] == evaluation.count(name)
+
+
+def test_events_are_timed():
+    trace = make_trace(frames=1000, noise=0.002)
+    evaluation = DEFAULT_RULES.evaluate(to_points(trace.landmarks), trace.frame_counts, fps=30.0)
+    assert len(evaluation.events) == sum(evaluation.totals().values())
+    for event in evaluation.events:
+        assert event.frame_count == trace.frame_counts[event.index]
+        assert event.time == pytest.approx(event.frame_count / 30.0)
+        assert evaluation.counts[event.exercise][event.index] > evaluation.counts[event.exercise][event.index - 1]
+
+
+def test_jittery_landmarks_are_counted_once(trace_points):
+    # 16 squats and 15 push-up sets plus 2 reps, as the schedule of make_trace lays them out
+    points = trace_points(0.01, frames=10_000)
+    totals = DEFAULT_RULES.evaluate(points).totals()
+    assert totals == {"squat": 160, "push-up": 152}
+    assert PLAIN_RULES.evaluate(points).totals()["push-up"] > 152
+
+
+def squat_angles(knee):
+    return {"stand": 10.0, "torso": 10.0, "knee": knee, "hip": 80.0, "elbow": 160.0, "knee_shoulder": 10.0}
+
+
+def run_counter(rules, knees):
+    counter = rules.counter()
+    for knee in knees:
+        counter.update(squat_angles(knee))
+    return counter.counts["squat"]
+
+
+def test_hysteresis_ignores_jitter_around_threshold():
+    rules = RuleSet([ExerciseRule("squat", "Squats", ["stand < 40"], ["knee < 90", "hip < 100"], hysteresis=5)])
+    knees = [150, 88, 91, 89, 92, 88, 150]
+    assert run_counter(PLAIN_RULES, knees) == 3
+    assert run_counter(rules, knees) == 1
+    # Back up only once the knee opens past threshold + hysteresis
+    assert run_counter(rules, [150, 88, 94, 94]) == 0
+    assert run_counter(rules, [150, 88, 96]) == 1
+
+
+def test_debounce_ignores_single_frame_spikes():
+    rules = RuleSet([ExerciseRule("squat", "Squats", ["stand < 40"], ["knee < 90", "hip < 100"], min_frames=2)])
+    assert run_counter(PLAIN_RULES, [150, 80, 150, 150]) == 1
+    assert run_counter(rules, [150, 80, 150, 150]) == 0
+    assert run_counter(rules, [150, 80, 80, 150, 150]) == 1
+    # A one-frame glitch back up in the middle of a rep doesn't count it
+    assert run_counter(rules, [150, 80, 80, 150, 80, 80, 150, 150]) == 1